@@ -0,0 +1,69 @@
+import os
+import random
+import tempfile
+from typing import Dict, List, Tuple
+
+# Made up smogon stats in the same format as <month>/<tier>-1500.txt and <month>/moveset/<tier>-1500.txt, so the
+# benchmarks never fetch anything. Run them from server/, e.g. python -m benchmarks.parse_movesets
+TIERS = ["gen8ou", "gen8uu", "gen8ru", "gen8nu"]
+SEPARATOR = " +----------------------------------------+ "
+RULE = " + ---- + ------------------ + --------- + ------ + ------- + ------ + ------- + "
+
+def makeNames (tier: int, count: int, rng: random.Random) -> List[Tuple[str, float]]:
+    names = [(f"Mon{tier}-{i}", rng.uniform(0.01, 0.4)) for i in range(count)]
+    names.sort(key=lambda i: -i[1])
+
+    return names
+
+def usageText (names: List[Tuple[str, float]]) -> str:
+    lines = [" Total battles: 1000", " Avg. weight/team: 0.5", RULE, " | Rank | Pokemon            | Usage %   | Raw    | %       | Real   | %       | ", RULE]
+    for i, (name, usage) in enumerate(names):
+        lines.append(f" | {i + 1:<4} | {name:<18} | {usage * 100:.5f}% | 1      | 1%      | 1      | 1%      | ")
+    lines.append(RULE)
+
+    return "\n".join(lines) + "\n"
+
+def row (text: str) -> str:
+    return f" | {text:<38} | "
+
+def movesetText (names: List[Tuple[str, float]], rng: random.Random) -> str:
+    blocks = []
+    for name, _ in names:
+        moves = sorted((rng.uniform(1, 100) for _ in range(12)), reverse=True)
+        block = [SEPARATOR, row(name), SEPARATOR, row("Raw count: 1234"), row("Avg. weight: 0.5"), row("Viability Ceiling: 80"), SEPARATOR,
+                row("Abilities"), row(f"Ability {name} 0 70.000%"), row(f"Ability {name} 1 30.000%"), SEPARATOR,
+                row("Items")] + [row(f"Item {i} {p:.3f}%") for i, p in enumerate([50, 30, 10])] + [row("Other 10.000%"), SEPARATOR,
+                row("Spreads"), row("Jolly:0/252/0/0/4/252 40.000%"), row("Adamant:252/252/0/0/4/0 30.000%"), row("Other 30.000%"), SEPARATOR,
+                row("Moves")] + [row(f"Move {i} {p:.3f}%") for i, p in enumerate(moves)] + [row("Other 0.500%"), SEPARATOR,
+                row("Teammates"), row("Foo +5.000%"), SEPARATOR,
+                row("Checks and Counters"), row("Bar 50.000 (60.00±2.50)"), row("\t (20.0% KOed / 40.0% switched out)"), SEPARATOR]
+        blocks.append("\n".join(block))
+
+    return "\n".join(blocks) + "\n"
+
+def makeTiers (count: int, seed: int = 1) -> Dict[str, Tuple[str, str]]:
+    # Tier -> (usage file, moveset file) with count species each
+    rng = random.Random(seed)
+    tiers = {}
+    for i, tier in enumerate(TIERS):
+        names = makeNames(i, count, rng)
+        tiers[tier] = (usageText(names), movesetText(names, rng))
+
+    return tiers
+
+def useTempDir () -> str:
+    # Everything the server writes under data/ goes in a throwaway directory. Call before importing src.tournament_data,
+    # which makes its storage as soon as it's imported
+    directory = tempfile.mkdtemp(prefix="battle-factory-bench-")
+    os.makedirs(os.path.join(directory, "data"))
+    os.chdir(directory)
+
+    return directory
+
+def publishUsage (count: int) -> None:
+    # Serve count made up species per tier for the current month, as if they'd been fetched
+    from src.usage_cache import usage_cache
+    from src.usage_scraping import scrapeSpecies, usageMonth
+
+    speciesDicts = dict((tier, scrapeSpecies(usage, movesets)) for tier, (usage, movesets) in makeTiers(count).items())
+    usage_cache.publish(usageMonth(), speciesDicts)
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import time
+from typing import Tuple
+
+from benchmarks.fixtures import useTempDir
+
+# Latency of saving one change to one tournament as the number of tournaments grows, for both storages and for
+# rewriting one file with every tournament in it like before the journal
+#
+#   python -m benchmarks.journal_writes [writes]
+
+PLAYERS = 64
+# The whole file rewrite gets slow quickly, it's only timed this many times
+REWRITES = 20
+
+def makeTournaments (count: int):
+    from src.tournament import Player, Tournament, defaultSettings
+
+    tournaments = []
+    for i in range(count):
+        tour = Tournament(f"tour{i}", defaultSettings, i)
+        for j in range(PLAYERS):
+            tour.addPlayer(Player(f"p{j}"))
+        tournaments.append(tour.toJson())
+
+    return tournaments
+
+def changes (tourJson, writes: int):
+    # One player's record changing each write, like a battle result
+    for i in range(writes):
+        new = dict(tourJson, players=list(tourJson["players"]))
+        player = new["players"][i % PLAYERS]
+        new["players"][i % PLAYERS] = dict(player, wins=player["wins"] + 1)
+        yield tourJson, new
+        tourJson = new
+
+def timeWrites (save, tourJson, writes: int) -> Tuple[float, float]:
+    latencies = []
+    for old, new in changes(tourJson, writes):
+        start = time.perf_counter()
+        save(old, new)
+        latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[len(latencies) * 99 // 100]
+
+def main () -> None:
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    useTempDir()
+
+    from src.tournament_journal import TournamentJournal
+    from src.tournament_sqlite import SqliteStorage
+
+    for count in (10, 100, 1000):
+        tournaments = makeTournaments(count)
+
+        journal = TournamentJournal(f"data/journal{count}", 30, 1 << 20)
+        journal.loadIndex()
+        sqlite = SqliteStorage(f"data/tournaments{count}.db")
+        for storage in (journal, sqlite):
+            for i in tournaments:
+                storage.save(i["name"], None, i)
+
+        def rewrite (old, new):
+            tournaments[0] = new
+            with open("data/tournaments.json", "w") as f:
+                json.dump({"tournaments" : tournaments}, f)
+
+        for label, save, times in (("journal", lambda old, new: journal.save(old["name"], old, new), writes),
+                ("sqlite", lambda old, new: sqlite.save(old["name"], old, new), writes), ("whole file", rewrite, REWRITES)):
+            average, p99 = timeWrites(save, tournaments[0], times)
+            print(f"{count} tournaments {label}: average {average * 1000:.3f} ms, p99 {p99 * 1000:.3f} ms")
+
+        os.remove("data/tournaments.json")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import random
+import sys
+import threading
+import time
+
+from benchmarks.fixtures import useTempDir
+
+# Reads and writes per second with many threads spread over many tournaments, with a clear partway through, and how
+# long each kind of lock was waited for
+#
+#   python -m benchmarks.lock_contention [seconds] [tournaments]
+
+READERS = 32
+WRITERS = 16
+# Readers stand in for polling clients, without a pause between polls they'd just be fighting over the GIL
+POLL_INTERVAL = 0.001
+
+def main () -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tournaments = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    useTempDir()
+
+    from src.error import InputError, UnavailableError
+    from src.tournament_funcs import clearTournaments, createTournament, getLockStats, getTournamentInfo, registerPlayer
+
+    names = [f"locks{i}" for i in range(tournaments)]
+    for i in names:
+        createTournament(i, None, 1)
+
+    counts = dict((i, [0] * (READERS + WRITERS)) for i in ("reads", "writes", "timeouts"))
+    # Spinning readers hold up starting the rest of the threads, so nobody starts until they all have
+    go = threading.Event()
+    stop = 0.0
+
+    def reader (thread: int) -> None:
+        rng = random.Random(thread)
+        go.wait()
+        while time.monotonic() < stop:
+            try:
+                getTournamentInfo(rng.choice(names))
+                counts["reads"][thread] += 1
+                time.sleep(POLL_INTERVAL)
+            except UnavailableError:
+                counts["timeouts"][thread] += 1
+            except InputError:
+                # Cleared and not made again yet
+                pass
+
+    def writer (thread: int) -> None:
+        rng = random.Random(thread)
+        written = 0
+        go.wait()
+        while time.monotonic() < stop:
+            try:
+                registerPlayer(rng.choice(names), f"w{thread}-{written}")
+                written += 1
+                counts["writes"][thread] += 1
+            except UnavailableError:
+                counts["timeouts"][thread] += 1
+            except InputError:
+                pass
+
+    clearTime = []
+    def clearer () -> None:
+        go.wait()
+        time.sleep(seconds / 2)
+        start = time.monotonic()
+        clearTournaments()
+        clearTime.append(time.monotonic() - start)
+        for i in names:
+            createTournament(i, None, 1)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    threads += [threading.Thread(target=writer, args=(READERS + i,)) for i in range(WRITERS)]
+    threads.append(threading.Thread(target=clearer))
+    for i in threads:
+        i.start()
+    stop = time.monotonic() + seconds
+    go.set()
+    for i in threads:
+        i.join()
+
+    print(f"{READERS} readers, {WRITERS} writers, {tournaments} tournaments: {sum(counts['reads']) / seconds:.0f} reads/s, "
+            f"{sum(counts['writes']) / seconds:.0f} writes/s, {sum(counts['timeouts'])} timeouts, clear took {clearTime[0] * 1000:.1f} ms")
+    for kind, stats in getLockStats().items():
+        print(f"{kind} lock: {stats['acquired']} acquired, average wait {stats['average_wait'] * 1000:.3f} ms, max wait {stats['max_wait'] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
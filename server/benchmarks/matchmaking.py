@@ -0,0 +1,59 @@
+import random
+import sys
+import time
+
+# Simulates 5,000 players battling with automatic matchmaking, for each pairing policy. Battles finish one at a time in
+# a random order and both players go straight back in the queue, skipping stealing and swapping
+#
+#   python -m benchmarks.matchmaking [players] [battles per player]
+
+def simulate (policy: str, players: int, rounds: int) -> None:
+    from src.tournament import Player, Tournament, defaultSettings
+
+    tour = Tournament("matchmaking", dict(defaultSettings, matchmaking=policy), 1)
+    for i in range(players):
+        tour.addPlayer(Player(f"p{i}", status="waiting_battle"))
+    tour.started = True
+    rng = random.Random(1)
+
+    start = time.perf_counter()
+    # Battles going on, one is picked at random to finish next
+    active = tour.matchmake(*tour.players)
+    calls = 1
+    battles = len(active)
+    rematches = 0
+
+    while battles < players * rounds // 2 and len(active) > 0:
+        i = rng.randrange(len(active))
+        active[i], active[-1] = active[-1], active[i]
+        pair = [tour.getPlayer(j) for j in active.pop()]
+
+        won = rng.random() < 0.5
+        for player, result in zip(pair, (won, not won)):
+            if result:
+                player.wins += 1
+            else:
+                player.losses += 1
+            player.status = "waiting_battle"
+            player.battling = None
+
+        for player1, player2 in tour.matchmake(*pair):
+            battles += 1
+            if tour.getPlayer(player1).opponents.count(player2) > 1:
+                rematches += 1
+            active.append((player1, player2))
+        calls += 1
+
+    elapsed = time.perf_counter() - start
+    waiting = len([i for i in tour.players if i.status == "waiting_battle"])
+    print(f"{policy}: {battles} battles, {elapsed / calls * 1e6:.1f} us per matchmake, {rematches} rematches, {waiting} left waiting")
+
+def main () -> None:
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    for policy in ("fifo", "no_rematch", "swiss"):
+        simulate(policy, players, rounds)
+
+if __name__ == "__main__":
+    main()
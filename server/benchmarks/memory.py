@@ -0,0 +1,52 @@
+import sys
+import tracemalloc
+
+from benchmarks.fixtures import makeTiers, publishUsage, useTempDir
+
+# Memory held by a full four tier load of species and by a started tournament, measured with tracemalloc
+#
+#   python -m benchmarks.memory [species per tier] [players]
+
+def traced (make):
+    tracemalloc.start()
+    result = make()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return result, size
+
+def main () -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    useTempDir()
+
+    from src.tournament import Player, Tournament, defaultSettings, getScalings
+    from src.usage_scraping import DEFAULT_CUTOFF, getTierWeights, scrapeSpecies
+
+    tiers = makeTiers(count)
+    speciesDicts, size = traced(lambda: dict((tier, scrapeSpecies(usage, movesets)) for tier, (usage, movesets) in tiers.items()))
+    species = sum(len(i) for i in speciesDicts.values())
+    print(f"four tiers: {species} species, {size / 1e6:.1f} MB, {size / species:.0f} bytes per species")
+    del speciesDicts
+
+    publishUsage(count)
+    # Shared by every tournament, so it's left out
+    weights = getTierWeights(getScalings(defaultSettings), DEFAULT_CUTOFF)
+
+    def makeTournament () -> Tournament:
+        tour = Tournament("memory", defaultSettings, 1)
+        for i in range(players):
+            tour.addPlayer(Player(f"p{i}"))
+        tour.start(weights)
+        while tour.generatePending(64) > 0:
+            pass
+        for i in tour.players:
+            i.choosePokemon([j.species for j in i.generated[:tour.teamSize]], tour.teamSize)
+
+        return tour
+
+    tour, size = traced(makeTournament)
+    print(f"tournament: {len(tour.players)} players, {size / 1e6:.1f} MB, {size / len(tour.players):.0f} bytes per player")
+
+if __name__ == "__main__":
+    main()
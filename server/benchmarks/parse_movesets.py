@@ -0,0 +1,49 @@
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fixtures import makeTiers, useTempDir
+
+# Parse time and peak memory of scrapeSpecies on a saved moveset file, streamed a line at a time from the file against
+# the whole file read in first
+#
+#   python -m benchmarks.parse_movesets [species per tier]
+
+def measure (parse) -> tuple:
+    # Timed apart from the memory run, tracemalloc slows everything down a lot
+    start = time.perf_counter()
+    speciesDict = parse()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    parse()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return len(speciesDict), elapsed, peak
+
+def main () -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    useTempDir()
+
+    from src.usage_scraping import scrapeSpecies
+
+    for tier, (usage, movesets) in makeTiers(count).items():
+        filename = f"data/{tier}-moveset.txt"
+        with open(filename, "w") as f:
+            f.write(movesets)
+
+        def streamed ():
+            with open(filename) as f:
+                return scrapeSpecies(usage, f)
+
+        def whole ():
+            with open(filename) as f:
+                return scrapeSpecies(usage, f.read())
+
+        for label, parse in (("streamed", streamed), ("whole file", whole)):
+            species, elapsed, peak = measure(parse)
+            print(f"{tier} {label}: {species} species, {len(movesets) / 1e6:.1f} MB, {elapsed * 1000:.0f} ms, peak {peak / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
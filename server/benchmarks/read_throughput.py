@@ -0,0 +1,54 @@
+import sys
+import time
+from json import dumps
+
+from benchmarks.fixtures import publishUsage, useTempDir
+
+# Reads per second of a started 64 player tournament through the cached views, against building the tournament from
+# its json and serializing it again for every read like before
+#
+#   python -m benchmarks.read_throughput [seconds]
+
+PLAYERS = 64
+
+def rate (read, seconds: float) -> float:
+    reads = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        read(reads)
+        reads += 1
+
+    return reads / (time.perf_counter() - start)
+
+def main () -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    useTempDir()
+    publishUsage(200)
+
+    from src.tournament import Tournament
+    from src.tournament_data import tournament_data
+    from src.tournament_funcs import choosePokemon, createTournament, getPlayerInfo, getTournamentInfo, registerPlayer, startTournament
+
+    createTournament("reads", None, 1)
+    for i in range(PLAYERS):
+        registerPlayer("reads", f"p{i}")
+    startTournament("reads")
+
+    # Drawn here rather than by the background workers
+    with tournament_data.getTour("reads", True) as tour:
+        while tour.generatePending(PLAYERS) > 0:
+            pass
+    for i in tournament_data.getView("reads").json["players"]:
+        choosePokemon("reads", i["player_id"], [j["species"] for j in i["generated"][:6]])
+
+    def rebuilt (i: int) -> None:
+        tour = Tournament.fromJson(tournament_data.getView("reads").json)
+        dumps(tour.toJson())
+        dumps(tour.getPlayer(f"p{i % PLAYERS}").toJson(), indent=2)
+
+    print(f"tournament info: {rate(lambda i: getTournamentInfo('reads'), seconds):.0f} reads/s")
+    print(f"player info: {rate(lambda i: getPlayerInfo('reads', f'p{i % PLAYERS}'), seconds):.0f} reads/s")
+    print(f"tournament and player info rebuilt from json: {rate(rebuilt, seconds):.0f} reads/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from benchmarks.fixtures import publishUsage, useTempDir
+
+# How long starting a tournament takes at 16, 128 and 1,024 players: the start itself, drawing every player's pokemon
+# in batches like the background workers do, and the longest any one batch holds the tournament
+#
+#   python -m benchmarks.start_latency [players...]
+
+def main () -> None:
+    sizes = [int(i) for i in sys.argv[1:]] or [16, 128, 1024]
+    useTempDir()
+    # Enough made up species that every player can be dealt a full draw
+    publishUsage(2600)
+
+    import src.config
+    from src.tournament import Player, Tournament, defaultSettings, getScalings
+    from src.usage_scraping import DEFAULT_CUTOFF, getTierWeights
+
+    weights = getTierWeights(getScalings(defaultSettings), DEFAULT_CUTOFF)
+
+    for size in sizes:
+        tour = Tournament("start", defaultSettings, 1)
+        for i in range(size):
+            tour.addPlayer(Player(f"p{i}"))
+
+        start = time.perf_counter()
+        tour.start(weights)
+        started = time.perf_counter() - start
+
+        longest = 0.0
+        remaining = size
+        while remaining > 0:
+            batchStart = time.perf_counter()
+            remaining = tour.generatePending(src.config.draft_batch_size)
+            longest = max(longest, time.perf_counter() - batchStart)
+        drafted = time.perf_counter() - start
+
+        assert all(len(i.generated) == tour.drawSize for i in tour.players)
+        print(f"{size} players: start {started * 1000:.2f} ms, everyone drafted {drafted * 1000:.1f} ms, "
+                f"longest batch of {src.config.draft_batch_size} {longest * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
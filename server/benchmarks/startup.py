@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import useTempDir
+
+# Startup time and RSS with 10,000 stored tournaments, only the index is read at start and a tournament is loaded the
+# first time it's used. Loading every tournament up front like before is timed for comparison. Each start runs in its
+# own process
+#
+#   python -m benchmarks.startup [tournaments]
+
+PLAYERS = 16
+
+def getRss () -> int:
+    # Linux only
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def start (kind: str) -> None:
+    import src.tournament
+    before = getRss()
+
+    begin = time.perf_counter()
+    from src.tournament_data import tournament_data
+    started = time.perf_counter() - begin
+
+    if kind == "lazy":
+        begin = time.perf_counter()
+        tournament_data.getView("tour0")
+        print(f"lazy: {len(tournament_data.index)} tournaments, start {started * 1000:.0f} ms, rss +{(getRss() - before) / 1e6:.1f} MB, "
+                f"first load {(time.perf_counter() - begin) * 1000:.2f} ms")
+    else:
+        begin = time.perf_counter()
+        tournaments = tournament_data.storage.loadAll()
+        print(f"everything: {len(tournaments)} tournaments, start {(started + time.perf_counter() - begin) * 1000:.0f} ms, "
+                f"rss +{(getRss() - before) / 1e6:.1f} MB")
+
+def main () -> None:
+    if len(sys.argv) > 1 and sys.argv[1] in ("--lazy", "--everything"):
+        start(sys.argv[1][2:])
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    serverDir = os.getcwd()
+    directory = useTempDir()
+
+    import src.config
+    from src.tournament import Player, Tournament, defaultSettings
+    from src.tournament_journal import TournamentJournal
+
+    journal = TournamentJournal("data/tournaments", src.config.journal_compact_interval, src.config.journal_compact_bytes)
+    journal.loadIndex()
+    for i in range(count):
+        tour = Tournament(f"tour{i}", defaultSettings, i)
+        for j in range(PLAYERS):
+            tour.addPlayer(Player(f"p{j}"))
+        journal.save(tour.name, None, tour.toJson())
+    journal.compact()
+
+    for kind in ("lazy", "everything"):
+        subprocess.run([sys.executable, "-c", f"import sys; sys.path.insert(0, {serverDir!r}); sys.argv = ['', '--{kind}']; "
+                "from benchmarks.startup import main; main()"], cwd=directory, check=True)
+
+if __name__ == "__main__":
+    main()
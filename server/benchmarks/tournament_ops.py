@@ -0,0 +1,51 @@
+import sys
+import time
+from typing import Callable, List
+
+# Cost per operation on a tournament as it grows to 1,000 players and past it, it should stay flat. Teams are made up
+# rather than drawn so any number of players works
+#
+#   python -m benchmarks.tournament_ops [players...]
+
+def timePerOp (ops: List[Callable[[], None]]) -> float:
+    start = time.perf_counter()
+    for i in ops:
+        i()
+
+    return (time.perf_counter() - start) / len(ops)
+
+def main () -> None:
+    sizes = [int(i) for i in sys.argv[1:]] or [100, 1000, 4000]
+
+    from src.pokemon import Pokemon, PokemonSpread
+    from src.tournament import Player, Tournament, defaultSettings
+
+    spread = PokemonSpread("Jolly", [0, 252, 0, 0, 4, 252])
+    for size in sizes:
+        tour = Tournament("ops", dict(defaultSettings, matchmaking="manual"), 1)
+        for i in range(size):
+            tour.addPlayer(Player(f"p{i}"))
+        tour.started = True
+        for i in tour.players:
+            i.generated = [Pokemon(f"{i.playerId}-{j}", ["Tackle"], "Static", "Leftovers", spread) for j in range(tour.drawSize)]
+            i.reindex()
+            i.status = "choosing_pokemon"
+            tour.addUsed(i.generated)
+
+        players = tour.players
+        pairs = list(zip(players[::2], players[1::2]))
+        stats = {}
+
+        stats["getPlayer"] = timePerOp([lambda i=i: tour.getPlayer(i.playerId) for i in players])
+        stats["player in"] = timePerOp([lambda i=i: i.playerId in tour for i in players])
+        stats["species used"] = timePerOp([lambda i=i: i.generated[0].species in tour.usedSpecies for i in players])
+        stats["choosePokemon"] = timePerOp([lambda i=i: i.choosePokemon([j.species for j in i.generated[:tour.teamSize]], tour.teamSize) for i in players])
+        stats["startBattle"] = timePerOp([lambda i=i, j=j: tour.startBattle(i.playerId, j.playerId) for i, j in pairs])
+        stats["completeBattle"] = timePerOp([lambda i=i, won=won: i.completeBattle(won) for pair in pairs for i, won in zip(pair, (True, False))])
+        stats["stealPokemon"] = timePerOp([lambda i=i, j=j: i.stealPokemon(j, [j.team[0].species], [i.team[0].species], tour.stealSize) for i, j in pairs])
+        stats["swapPokemon"] = timePerOp([lambda j=j: j.swapPokemon([k.species for k in j.generated]) for _, j in pairs])
+
+        print(f"{size} players: " + ", ".join(f"{k} {v * 1e6:.2f} us" for k, v in stats.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import TIERS, makeTiers, useTempDir
+
+# Load time and memory of four tiers of usage caches, the packed format against the old json one. Each load runs in
+# its own process so their memory doesn't mix
+#
+#   python -m benchmarks.usage_cache [species per tier]
+
+def getRss () -> int:
+    # Linux only
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def load (kind: str, directory: str) -> None:
+    from src.pokemon import PokemonSpecies
+    from src.species_cache import PackedSpeciesDict
+
+    before = getRss()
+    start = time.perf_counter()
+    if kind == "json":
+        speciesDicts = {}
+        for tier in TIERS:
+            with open(os.path.join(directory, f"{tier}.json")) as f:
+                speciesDicts[tier] = dict((k, PokemonSpecies.fromJson(v)) for k, v in json.load(f).items())
+    else:
+        speciesDicts = dict((tier, PackedSpeciesDict(os.path.join(directory, f"{tier}.bin"))) for tier in TIERS)
+    loaded = time.perf_counter() - start
+    loadedRss = getRss() - before
+
+    # Every species built, which the packed caches only do when they're first used
+    start = time.perf_counter()
+    species = sum(len([speciesDict[i] for i in speciesDict]) for speciesDict in speciesDicts.values())
+    materialized = time.perf_counter() - start
+
+    print(f"{kind}: {species} species, load {loaded * 1000:.0f} ms and rss +{loadedRss / 1e6:.1f} MB, "
+            f"every species built {materialized * 1000:.0f} ms and rss +{(getRss() - before) / 1e6:.1f} MB")
+
+def main () -> None:
+    if len(sys.argv) > 2 and sys.argv[1] == "--load":
+        load(sys.argv[2], sys.argv[3])
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    serverDir = os.getcwd()
+    directory = useTempDir()
+
+    from src.species_cache import writeSpeciesCache
+    from src.usage_scraping import scrapeSpecies
+
+    for tier, (usage, movesets) in makeTiers(count).items():
+        speciesDict = scrapeSpecies(usage, movesets)
+        with open(f"{tier}.json", "w") as f:
+            json.dump(dict((k, v.getJson()) for k, v in speciesDict.items()), f)
+        writeSpeciesCache(f"{tier}.bin", speciesDict)
+
+        print(f"{tier}: json {os.path.getsize(tier + '.json') / 1e6:.1f} MB, packed {os.path.getsize(tier + '.bin') / 1e6:.1f} MB")
+
+    for kind in ("json", "bin"):
+        subprocess.run([sys.executable, "-m", "benchmarks.usage_cache", "--load", kind, directory], cwd=serverDir, check=True)
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,42 @@
-shiny_rate = 1 / 100
\ No newline at end of file
+import os
+
+shiny_rate = 1 / 100
+smogon_url = "https://www.smogon.com/stats"
+fetch_workers = 8
+# Seconds before a month that was missing on smogon is asked for again
+missing_month_ttl = 60 * 60
+
+# Prebuilt usage data, see src/data_pack.py
+data_pack = os.environ.get("BATTLE_FACTORY_DATA_PACK", "data/pack")
+# Seconds between checks for a new month of usage stats
+usage_refresh_interval = 60 * 60
+# Most sets a single batch request can ask for
+batch_max_count = 100000
+# Seconds between folding tournament journals into their snapshots, or sooner once a journal reaches this many bytes
+journal_compact_interval = 30
+journal_compact_bytes = 1 << 20
+# Where tournaments are kept, "json" for per tournament json journals or "sqlite"
+tournament_storage = os.environ.get("BATTLE_FACTORY_STORAGE", "json")
+tournament_db = os.environ.get("BATTLE_FACTORY_DB", "data/tournaments.db")
+# Tournament saves are written in batches every persist_interval seconds, or sooner once this many are queued
+persist_interval = 0.1
+persist_max_pending = 256
+# Requests wait for their changes to reach the storage before returning
+persist_wait_durable = os.environ.get("BATTLE_FACTORY_WAIT_DURABLE", "0") == "1"
+# fsync tournament data as it's written
+persist_fsync = os.environ.get("BATTLE_FACTORY_FSYNC", "0") == "1"
+# Seconds a request waits for a tournament lock before giving up with a 503
+lock_timeout = 10
+# Locks shared out between tournament names for bookkeeping
+lock_stripes = 64
+# Roughly how many bytes of tournaments are kept in memory before the least recently used are dropped
+tournament_memory_budget = 256 << 20
+# Tournaments unchanged for this many days are moved to the archive by /api/test/tournament/archive
+archive_dir = "data/archive"
+archive_idle_days = 30
+# Threads drawing pokemon for started tournaments, late registrations and swaps, and how many players each draws for
+# before letting other writes to the tournament in
+draft_workers = 2
+draft_batch_size = 64
+# Most seconds a long polling request waits for a change before returning what it has
+watch_timeout = 30
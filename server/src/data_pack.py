@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+from datetime import date, datetime
+from threading import Lock
+from typing import Dict, List, Mapping, Union
+
+import src.config
+from src.pokemon import PokemonSpecies
+from src.species_cache import PackedSpeciesDict, writeSpeciesCache
+from src.tournament import defaultSettings, getScalings
+from src.usage_cache import usage_cache
+from src.usage_refresher import usage_refresher
+from src.usage_scraping import scrapeTiers, usageMonth
+
+# A data pack is a directory with a manifest and one packed species cache (with alias tables) per tier and month, built
+# ahead of time so a fresh server never has to scrape or parse anything before it can serve requests.
+#
+#   python -m src.data_pack --out data/pack --months 2021-09 2021-10 --tiers gen8ou gen8uu
+PACK_VERSION = 1
+
+def monthStr (month: date) -> str:
+    return f"{month.year}.{month.month}"
+
+def parseMonth (s: str) -> date:
+    year, month = s.replace("-", ".").split(".")
+    return date(int(year), int(month), 1)
+
+def buildPack (packDir: str, tiers: List[str], months: List[date]) -> Dict:
+    os.makedirs(packDir, exist_ok=True)
+
+    manifest = {
+        "version" : PACK_VERSION,
+        "built" : datetime.now().isoformat(timespec="seconds"),
+        "months" : {}
+    }
+
+    for month in months:
+        speciesDicts = scrapeTiers(tiers, month)
+        manifest["months"][monthStr(month)] = {}
+
+        for tier in tiers:
+            filename = f"{monthStr(month)}-{tier}.bin"
+            writeSpeciesCache(os.path.join(packDir, filename), speciesDicts[tier])
+            manifest["months"][monthStr(month)][tier] = {
+                "file" : filename,
+                "species" : len(speciesDicts[tier])
+            }
+
+    tmpName = os.path.join(packDir, f"manifest.json.tmp{os.getpid()}")
+    with open(tmpName, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmpName, os.path.join(packDir, "manifest.json"))
+
+    return manifest
+
+def loadPack (packDir: str) -> date:
+    with open(os.path.join(packDir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    if manifest["version"] != PACK_VERSION:
+        raise ValueError(f"Data pack \"{packDir}\" has version {manifest['version']}, expected {PACK_VERSION}!")
+
+    # The month the server would ask for if the pack has it, otherwise the newest month in the pack
+    months = dict((parseMonth(i), i) for i in manifest["months"])
+    month = usageMonth() if usageMonth() in months else max(months)
+
+    tiers: Dict[str, Mapping[str, PokemonSpecies]] = {}
+    for tier, entry in manifest["months"][months[month]].items():
+        tiers[tier] = PackedSpeciesDict(os.path.join(packDir, entry["file"]))
+
+    usage_cache.publish(month, tiers)
+
+    return month
+
+packStateLock = Lock()
+packState: Dict = {
+    "pack" : None,
+    "pack_month" : None,
+    "started" : None
+}
+
+def startUsage (packDir: Union[str, None] = src.config.data_pack) -> None:
+    # Called once at server start, the pack is only mapped so this is quick. Anything the pack doesn't cover is loaded
+    # by the refresher in the background, readiness stays false until it's done
+    with packStateLock:
+        packState["started"] = datetime.now().isoformat(timespec="seconds")
+
+    if packDir != None and os.path.exists(os.path.join(packDir, "manifest.json")):
+        month = loadPack(packDir)
+        with packStateLock:
+            packState["pack"] = packDir
+            packState["pack_month"] = monthStr(month)
+
+    usage_refresher.start()
+
+def getReadiness () -> Dict:
+    snapshot = usage_cache.snapshot
+
+    with packStateLock:
+        state = packState.copy()
+
+    state["month"] = monthStr(snapshot.month) if snapshot.month != None else None
+    state["refresher"] = usage_refresher.stats()
+    state["ready"] = state["refresher"]["refreshed"] and all(i in snapshot.tiers for i in usage_refresher.tiers)
+
+    return state
+
+def main () -> None:
+    parser = argparse.ArgumentParser(description="Builds a usage data pack for the battle factory server")
+    parser.add_argument("--out", default=src.config.data_pack, help="directory to write the pack to")
+    parser.add_argument("--tiers", nargs="+", default=list(getScalings(defaultSettings)), help="tiers to include")
+    parser.add_argument("--months", nargs="+", type=parseMonth, default=[usageMonth()], help="months to include, e.g. 2021-09")
+    args = parser.parse_args()
+
+    manifest = buildPack(args.out, args.tiers, args.months)
+    for month in manifest["months"]:
+        for tier, entry in manifest["months"][month].items():
+            print(f"{month} {tier}: {entry['species']} species -> {entry['file']}")
+
+if __name__ == "__main__":
+    main()
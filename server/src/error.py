@@ -9,3 +9,8 @@ class AccessError(HTTPException):
 class InputError(HTTPException):
     code = 400
     message = 'No message specified'
+
+
+class UnavailableError(HTTPException):
+    code = 503
+    message = 'No message specified'
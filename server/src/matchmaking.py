@@ -0,0 +1,107 @@
+import heapq
+from typing import Dict, List, Tuple, Union
+
+from src.error import InputError
+
+# Players waiting for a battle are kept in a heap per tournament and paired as soon as two of them can battle. Which
+# player is in front and who they're allowed to battle is up to the tournament's pairing policy, "manual" leaves all
+# pairing to /api/battle/start like before.
+MANUAL = "manual"
+
+# How many players behind the first one are tried before it's left for the next time someone joins the queue
+LOOKAHEAD = 32
+
+class PairingPolicy:
+    def getKey (self, player) -> Tuple:
+        # Lower keys are paired first, players with the same key in the order they started waiting
+        return ()
+
+    def canPair (self, player1, player2) -> bool:
+        return True
+
+class FifoPolicy(PairingPolicy):
+    pass
+
+class NoRematchPolicy(PairingPolicy):
+    # Longest waiting first, but never against someone they've already battled
+    def canPair (self, player1, player2) -> bool:
+        return player2.playerId not in player1.opponents
+
+class SwissPolicy(NoRematchPolicy):
+    # Best records first, so the next player in the queue is the one with the closest record
+    def getKey (self, player) -> Tuple:
+        return (-player.wins, player.losses)
+
+POLICIES: Dict[str, PairingPolicy] = {
+    "fifo" : FifoPolicy(),
+    "no_rematch" : NoRematchPolicy(),
+    "swiss" : SwissPolicy()
+}
+
+def getPolicy (name: str) -> Union[PairingPolicy, None]:
+    if name == MANUAL:
+        return None
+
+    if name not in POLICIES:
+        raise InputError(description=f"Unknown matchmaking \"{name}\", expected one of {', '.join([MANUAL] + list(POLICIES))}!")
+
+    return POLICIES[name]
+
+class MatchmakingQueue:
+    def __init__ (self, policy: PairingPolicy):
+        self.policy = policy
+        # (policy key..., ticket, player id). Players that stopped waiting are left in and skipped when they come up
+        self.heap: List[Tuple] = []
+
+    def push (self, player) -> None:
+        heapq.heappush(self.heap, self.policy.getKey(player) + (player.queued, player.playerId))
+
+    def heapify (self, players: List) -> None:
+        self.heap = [self.policy.getKey(i) + (i.queued, i.playerId) for i in players]
+        heapq.heapify(self.heap)
+
+    def pop (self, players: Dict):
+        while len(self.heap) > 0:
+            entry = heapq.heappop(self.heap)
+            player = players.get(entry[-1], None)
+            if player != None and player.status == "waiting_battle" and player.queued == entry[-2]:
+                return player
+
+        return None
+
+    def pair (self, players: Dict) -> List[Tuple]:
+        # Takes every pair it can out of the queue, players nobody can battle right now go back in
+        pairs = []
+        unpaired = []
+        while True:
+            first = self.pop(players)
+            if first == None:
+                break
+
+            second = None
+            skipped = []
+            while len(skipped) < LOOKAHEAD:
+                candidate = self.pop(players)
+                if candidate == None:
+                    break
+
+                if self.policy.canPair(first, candidate):
+                    second = candidate
+                    break
+                skipped.append(candidate)
+
+            for i in skipped:
+                self.push(i)
+
+            if second == None:
+                unpaired.append(first)
+            else:
+                pairs.append((first, second))
+
+        for i in unpaired:
+            self.push(i)
+
+        return pairs
+
+    def __len__ (self) -> int:
+        return len(self.heap)
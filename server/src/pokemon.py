@@ -1,18 +1,45 @@
 import random
+import sys
 
-from typing import Dict, List, Tuple, TypeVar
+from typing import Dict, List, Sequence, Tuple, TypeVar
 
 import src.config
+from src.sampling import AliasTable
+
+# Move, item, ability, nature and species names repeat across every species and every generated pokemon, so they all go
+# through the interpreter's symbol table and are shared instead of being a fresh string per JSON parse
+intern = sys.intern
 
 class PokemonSpread:
-    def __init__ (self, nature: str, stats: List[int]):
-        self.nature = nature
-        self.hp = stats[0]
-        self.attack = stats[1]
-        self.defence = stats[2]
-        self.spattack = stats[3]
-        self.spdefence = stats[4]
-        self.speed = stats[5]
+    __slots__ = ("nature", "stats")
+
+    def __init__ (self, nature: str, stats: Sequence[int]):
+        self.nature = intern(nature)
+        self.stats: Tuple[int, ...] = tuple(stats)
+
+    @property
+    def hp (self) -> int:
+        return self.stats[0]
+
+    @property
+    def attack (self) -> int:
+        return self.stats[1]
+
+    @property
+    def defence (self) -> int:
+        return self.stats[2]
+
+    @property
+    def spattack (self) -> int:
+        return self.stats[3]
+
+    @property
+    def spdefence (self) -> int:
+        return self.stats[4]
+
+    @property
+    def speed (self) -> int:
+        return self.stats[5]
 
     @classmethod
     def fromStr (cls, spreadStr: str):
@@ -38,11 +65,13 @@ class PokemonSpread:
 
 
 class Pokemon:
-    def __init__ (self, species: str, moves: List[str], ability: str, item: str, spread: PokemonSpread, gender: str = None, shiny: bool = False):
-        self.species = species
-        self.moves = moves
-        self.ability = ability
-        self.item = item
+    __slots__ = ("species", "moves", "ability", "item", "spread", "gender", "shiny")
+
+    def __init__ (self, species: str, moves: Sequence[str], ability: str, item: str, spread: PokemonSpread, gender: str = None, shiny: bool = False):
+        self.species = intern(species)
+        self.moves: Tuple[str, ...] = tuple(intern(i) for i in moves)
+        self.ability = intern(ability)
+        self.item = intern(item)
         self.spread = spread
         self.gender = gender
         self.shiny = shiny
@@ -50,7 +79,7 @@ class Pokemon:
     def getJson (self) -> Dict:
         d = {
             "species" : self.species,
-            "moves" : self.moves,
+            "moves" : list(self.moves),
             "ability" : self.ability,
             "item" : self.item,
             "spread" : self.spread.getJson(),
@@ -67,31 +96,29 @@ class Pokemon:
                 shiny=data["shiny"], gender=data.get("gender", None))
 
 T = TypeVar("T")
-def getRandomChoice (choices: List[Tuple[float, T]]) -> T:
-    s = sum(i[0] for i in choices)
-    probabilities: List[Tuple[float, T]] = sorted(choices, key=lambda x: x[0], reverse=True)
-    probabilities = [(sum(j[0] for j in probabilities[0:i]) / s, t[1]) for i,t in enumerate(probabilities)]
-
-    #print(probabilities)
-
-    rand = random.random()
-    l = [i[1] for i in probabilities if rand >= i[0]]
-    '''while len(l) == 0:
-        rand = random.random()
-        l = [i[1] for i in probabilities if rand >= i[0]]'''
-    return l[-1]
+def getRandomChoice (choices: List[Tuple[float, T]], rng: random.Random = random) -> T:
+    return AliasTable(choices).draw(rng)
 
 class PokemonSpecies:
+    __slots__ = ("speciesName", "moves", "abilities", "items", "usage", "spreads", "moveTable", "abilityTable", "itemTable", "spreadTable")
+
     def __init__ (self, speciesName: str, moves: List[Tuple[float, str]], abilities: List[Tuple[float, str]], items: List[Tuple[float, str]], \
-            spreads: List[Tuple[float, PokemonSpread]], usage: float):
-        
-        self.speciesName = speciesName
-        self.moves = moves
-        self.abilities = abilities
-        self.items = items
+            spreads: List[Tuple[float, PokemonSpread]], usage: float, tables: Dict[str, AliasTable] = None):
+
+        self.speciesName = intern(speciesName)
+        self.moves = [(i[0], intern(i[1])) for i in moves]
+        self.abilities = [(i[0], intern(i[1])) for i in abilities]
+        self.items = [(i[0], intern(i[1])) for i in items]
         self.usage = usage
         self.spreads = spreads
 
+        # Tables can be handed in already built, e.g. from a data pack
+        tables = tables if tables != None else {}
+        self.moveTable = tables["moves"] if "moves" in tables else AliasTable(self.moves)
+        self.abilityTable = tables["abilities"] if "abilities" in tables else AliasTable(self.abilities)
+        self.itemTable = tables["items"] if "items" in tables else AliasTable(self.items)
+        self.spreadTable = tables["spreads"] if "spreads" in tables else AliasTable(self.spreads)
+
     @classmethod
     def fromJson (cls, jsonDict: Dict):
         name = jsonDict["name"]
@@ -104,17 +131,15 @@ class PokemonSpecies:
 
         return cls(name, moves, abilities, items, spreads, usage)
     
-    def generatePokemon (self) -> Pokemon:
-        ability = getRandomChoice(self.abilities)
-        item = getRandomChoice(self.items)
+    def generatePokemon (self, rng: random.Random = random) -> Pokemon:
+        ability = self.abilityTable.draw(rng)
+        item = self.itemTable.draw(rng)
 
-        spread = getRandomChoice(self.spreads)
+        spread = self.spreadTable.draw(rng)
 
-        moves: List[str] = []
-        while len(moves) < 4:
-            moves.append(getRandomChoice([i for i in self.moves if i[1] not in moves]))
+        moves = self.moveTable.sample(4, rng)
         
-        return Pokemon(self.speciesName, moves, ability, item, spread, shiny=random.random() <= src.config.shiny_rate)
+        return Pokemon(self.speciesName, moves, ability, item, spread, shiny=rng.random() <= src.config.shiny_rate)
 
     def getUsage (self) -> float:
         return self.usage
@@ -0,0 +1,155 @@
+import hashlib
+import heapq
+import random
+from json import dumps
+
+from typing import Generic, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def spawnRandom (seed: int, *path) -> random.Random:
+    # An independent stream for one use of a seed, like numpy's SeedSequence.spawn. The seed and the path to this use
+    # are hashed together, so a stream doesn't depend on how much was drawn from any other. The path is json so
+    # different paths can never come out as the same key
+    key = dumps([seed, *path])
+    return random.Random(int.from_bytes(hashlib.sha256(key.encode()).digest(), "big"))
+
+class AliasTable(Generic[T]):
+    # Vose's alias method, O(n) to build and O(1) per draw. Items with no weight are kept so indices line up with the
+    # choices they were built from, they just always hand off to their alias
+    def __init__ (self, choices: Sequence[Tuple[float, T]], prob: Sequence[float] = None, alias: Sequence[int] = None):
+        self.items: List[T] = [i[1] for i in choices]
+        self.weights: List[float] = [i[0] for i in choices]
+        self.live = len([i for i in self.weights if i > 0])
+
+        if prob != None and alias != None:
+            self.prob = list(prob)
+            self.alias = list(alias)
+            return
+
+        n = len(choices)
+        self.prob: List[float] = [1.0] * n
+        self.alias: List[int] = list(range(n))
+
+        total = sum(i for i in self.weights if i > 0)
+        if total <= 0:
+            return
+
+        scaled = [max(i, 0) * n / total for i in self.weights]
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+
+            scaled[l] = scaled[l] + scaled[s] - 1
+            if scaled[l] < 1:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Anything left over is only off from 1 by rounding error
+        heaviest = max(range(n), key=lambda i: self.weights[i])
+        for i in small + large:
+            if self.weights[i] > 0:
+                self.prob[i] = 1.0
+            else:
+                self.prob[i] = 0.0
+                self.alias[i] = heaviest
+
+    def __len__ (self) -> int:
+        return self.live
+
+    def drawIndex (self, rng: random.Random = random) -> int:
+        u = rng.random() * len(self.items)
+        i = min(int(u), len(self.items) - 1)
+
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def draw (self, rng: random.Random = random) -> T:
+        return self.items[self.drawIndex(rng)]
+
+    def sample (self, k: int, rng: random.Random = random) -> List[T]:
+        # Weighted sampling without replacement. Drawing from the full table and rejecting repeats gives the same
+        # distribution as renormalising over the remaining items after every pick
+        k = min(k, self.live)
+        chosen: List[int] = []
+        rejections = 0
+
+        while len(chosen) < k:
+            i = self.drawIndex(rng)
+            if i not in chosen:
+                chosen.append(i)
+            else:
+                rejections += 1
+                if rejections > 8 * k:
+                    # A few very heavy items, finish off with exponential keys over whatever is left
+                    remaining = [j for j in range(len(self.items)) if j not in chosen and self.weights[j] > 0]
+                    chosen += heapq.nlargest(k - len(chosen), remaining, key=lambda j: rng.random() ** (1 / self.weights[j]))
+
+        return [self.items[i] for i in chosen]
+
+class FenwickSampler:
+    # Weighted sampling without replacement over a fixed set of indices, O(n) to build and O(log n) per draw
+    def __init__ (self, weights: Sequence[float]):
+        self.n = len(weights)
+        self.weights = list(weights)
+        self.tree = [0.0] + self.weights
+        self.total = sum(self.weights)
+        self.live = len([i for i in self.weights if i > 0])
+
+        for i in range(1, self.n + 1):
+            parent = i + (i & -i)
+            if parent <= self.n:
+                self.tree[parent] += self.tree[i]
+
+        self.topBit = 1
+        while self.topBit * 2 <= self.n:
+            self.topBit *= 2
+
+    def __len__ (self) -> int:
+        return self.live
+
+    def remove (self, index: int) -> None:
+        weight = self.weights[index]
+        if weight <= 0:
+            return
+
+        self.weights[index] = 0.0
+        self.total -= weight
+        self.live -= 1
+
+        i = index + 1
+        while i <= self.n:
+            self.tree[i] -= weight
+            i += i & -i
+
+    def find (self, x: float) -> int:
+        # Index of the first item whose cumulative weight exceeds x
+        pos = 0
+        bit = self.topBit
+        while bit > 0:
+            if pos + bit <= self.n and self.tree[pos + bit] <= x:
+                pos += bit
+                x -= self.tree[pos]
+            bit //= 2
+
+        return pos
+
+    def pop (self, rng: random.Random = random) -> int:
+        if self.live == 0:
+            raise IndexError("pop from empty sampler")
+
+        index = self.find(rng.random() * max(self.total, 0.0))
+        if index >= self.n or self.weights[index] <= 0:
+            # Rounding left x past the last live item, take the closest one that is left
+            index = max(i for i in range(self.n) if self.weights[i] > 0)
+
+        self.remove(index)
+
+        return index
@@ -1,14 +1,18 @@
 import sys
 from typing import Dict
-from flask import Flask, request
+from flask import Flask, Response, request
 from flask_cors import CORS
 
 from json import dumps
 
 from werkzeug.exceptions import HTTPException
 
-from src.usage_scraping import getRandom, getUsage
-from src.tournament_funcs import createTournament, clearTournaments, getTournamentInfo, registerPlayer, getPlayerInfo, startTournament, choosePokemon, startBattle, battleResult, stealPokemon, swapPokemon
+from src.error import UnavailableError
+from src.usage_scraping import getRandom, getRandomBatch, getUsage, getCacheStats
+from src.data_pack import startUsage, getReadiness
+from src.usage_refresher import usage_refresher
+from src.tournament_drafts import draft_generator
+from src.tournament_funcs import createTournament, clearTournaments, getStorageStats, getLockStats, getDraftStats, archiveTournaments, getTournamentInfo, waitTournamentInfo, registerPlayer, getPlayerInfo, waitPlayerInfo, startTournament, choosePokemon, startBattle, battleResult, startBattles, battleResults, stealPokemon, swapPokemon
 
 def defaultHandler (err):
     response = err.get_response()
@@ -27,6 +31,17 @@ CORS(APP)
 APP.config["TRAP_HTTP_EXCEPTIONS"] = True
 APP.register_error_handler(HTTPException, defaultHandler)
 
+startUsage()
+draft_generator.start()
+
+@APP.route("/api/ready", methods=["GET"])
+def http_ready ():
+    readiness = getReadiness()
+    if not readiness["ready"]:
+        raise UnavailableError(description="Usage data is still loading!")
+
+    return dumps(readiness)
+
 @APP.route("/api/test/usage", methods=["GET"])
 def http_getUsage ():
     tier = request.args.get("tier", type=str)
@@ -41,19 +56,52 @@ def http_randomPokemon ():
 
     return dumps(getRandom(tier, species))
 
+@APP.route("/api/test/pokemon/batch", methods=["POST"])
+def http_randomPokemonBatch ():
+    data = request.get_json()
+
+    sets = getRandomBatch(data["tiers"], data["count"], data.get("species", None), data.get("seed", None))
+
+    return Response((dumps(i) + "\n" for i in sets), mimetype="application/x-ndjson")
+
+@APP.route("/api/test/usage/cache", methods=["GET"])
+def http_getCacheStats ():
+    stats = getCacheStats()
+    stats["refresher"] = usage_refresher.stats()
+
+    return dumps(stats)
+
 @APP.route("/api/tournament/create", methods=["POST"])
 def http_createTournament ():
     data = request.get_json()
     name = data["name"]
     settings = data["settings"] if "settings" in data else None
 
-    return dumps(createTournament(name, settings))
+    return dumps(createTournament(name, settings, data.get("seed", None)))
 
 @APP.route("/api/test/tournament/clear", methods=["POST"])
 def http_clearTournaments ():
     clearTournaments()
     return dumps({})
 
+@APP.route("/api/test/tournament/storage", methods=["GET"])
+def http_getStorageStats ():
+    return dumps(getStorageStats())
+
+@APP.route("/api/test/tournament/locks", methods=["GET"])
+def http_getLockStats ():
+    return dumps(getLockStats())
+
+@APP.route("/api/test/tournament/drafts", methods=["GET"])
+def http_getDraftStats ():
+    return dumps(getDraftStats())
+
+@APP.route("/api/test/tournament/archive", methods=["POST"])
+def http_archiveTournaments ():
+    data = request.get_json()
+
+    return dumps(archiveTournaments(data.get("days", None)))
+
 @APP.route("/api/player/register", methods=["POST"])
 def http_registerPlayer ():
     data = request.get_json()
@@ -65,15 +113,33 @@ def http_registerPlayer ():
 @APP.route("/api/tournament/info", methods=["GET"])
 def http_getTournamentInfo ():
     tournament = request.args.get("name", type=str)
+    since = request.args.get("since", None, type=int)
+
+    return getTournamentInfo(tournament, since)
+
+@APP.route("/api/tournament/wait", methods=["GET"])
+def http_waitTournamentInfo ():
+    tournament = request.args.get("name", type=str)
+    since = request.args.get("since", None, type=int)
+    timeout = request.args.get("timeout", None, type=float)
 
-    return dumps(getTournamentInfo(tournament))
+    return waitTournamentInfo(tournament, since, timeout)
 
 @APP.route("/api/player/info", methods=["GET"])
 def http_getPlayerInfo ():
     tournament = request.args.get("tournament", type=str)
     playerId = request.args.get("player_id", type=str)
 
-    return dumps(getPlayerInfo(tournament, playerId), indent=2)
+    return getPlayerInfo(tournament, playerId)
+
+@APP.route("/api/player/wait", methods=["GET"])
+def http_waitPlayerInfo ():
+    tournament = request.args.get("tournament", type=str)
+    playerId = request.args.get("player_id", type=str)
+    since = request.args.get("since", None, type=int)
+    timeout = request.args.get("timeout", None, type=float)
+
+    return waitPlayerInfo(tournament, playerId, since, timeout)
 
 @APP.route("/api/tournament/start", methods=["POST"])
 def http_tournamentStart ():
@@ -106,6 +172,18 @@ def http_battleResult ():
 
     return dumps({})
 
+@APP.route("/api/battle/start/batch", methods=["POST"])
+def http_battleStartBatch ():
+    data = request.get_json()
+
+    return dumps({"results" : startBattles(data["tournament"], data["battles"], data.get("atomic", True))})
+
+@APP.route("/api/battle/result/batch", methods=["POST"])
+def http_battleResultBatch ():
+    data = request.get_json()
+
+    return dumps({"results" : battleResults(data["tournament"], data["results"], data.get("atomic", True))})
+
 @APP.route("/api/player/steal", methods=["POST"])
 def http_stealPokemon ():
     data = request.get_json()
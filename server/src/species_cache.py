@@ -0,0 +1,247 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+
+from src.pokemon import PokemonSpecies, PokemonSpread
+from src.sampling import AliasTable
+
+# Columnar species cache. Every section is a flat array so the file can be memory mapped and shared between processes,
+# species are only turned into python objects when they are looked up.
+#
+# Header: magic, version, flags, section count, then (offset, length) in bytes for each section
+MAGIC = b"BFUC"
+VERSION = 2
+HEADER = struct.Struct("<4sHHI")
+SECTION = struct.Struct("<II")
+
+FLAG_BIG_ENDIAN = 1
+FLAG_WIDE_STATS = 2
+
+# Section name, array typecode
+SECTIONS: List[Tuple[str, str]] = [
+    ("stringOffsets", "I"),
+    ("stringData", "B"),
+    ("speciesNames", "I"),
+    ("speciesUsages", "f"),
+    ("moveOffsets", "I"),
+    ("moveNames", "I"),
+    ("moveUsages", "f"),
+    ("abilityOffsets", "I"),
+    ("abilityNames", "I"),
+    ("abilityUsages", "f"),
+    ("itemOffsets", "I"),
+    ("itemNames", "I"),
+    ("itemUsages", "f"),
+    ("spreadOffsets", "I"),
+    ("spreadNatures", "I"),
+    ("spreadStats", "B"),
+    ("spreadUsages", "f")
+]
+
+# Version 2 adds each species' alias tables, with alias indices relative to the start of the species' own entries
+ALIAS_SECTIONS: List[Tuple[str, str]] = [
+    ("moveAliasProbs", "f"),
+    ("moveAliases", "H"),
+    ("abilityAliasProbs", "f"),
+    ("abilityAliases", "H"),
+    ("itemAliasProbs", "f"),
+    ("itemAliases", "H"),
+    ("spreadAliasProbs", "f"),
+    ("spreadAliases", "H")
+]
+
+TABLE_SECTIONS = [("moves", "move"), ("abilities", "ability"), ("items", "item"), ("spreads", "spread")]
+
+def getSections (version: int) -> List[Tuple[str, str]]:
+    return SECTIONS + ALIAS_SECTIONS if version >= 2 else SECTIONS
+
+def unpackFloat (value: float) -> float:
+    # Usages are stored as float32, round back to the precision smogon gives them with
+    return float(f"{value:.7g}")
+
+class StringTable:
+    def __init__ (self):
+        self.ids: Dict[str, int] = {}
+        self.offsets = array("I", [0])
+        self.data = bytearray()
+
+    def add (self, s: str) -> int:
+        if s not in self.ids:
+            self.ids[s] = len(self.ids)
+            self.data += s.encode("utf-8")
+            self.offsets.append(len(self.data))
+
+        return self.ids[s]
+
+def writeSpeciesCache (filename: str, speciesDict: Mapping[str, PokemonSpecies]) -> None:
+    strings = StringTable()
+    sections = getSections(VERSION)
+    arrays: Dict[str, array] = dict((name, array(typecode)) for name, typecode in sections)
+    for i in ("moveOffsets", "abilityOffsets", "itemOffsets", "spreadOffsets"):
+        arrays[i].append(0)
+
+    stats: List[int] = []
+
+    for species in speciesDict.values():
+        arrays["speciesNames"].append(strings.add(species.speciesName))
+        arrays["speciesUsages"].append(species.usage)
+
+        for choices, section in ((species.moves, "move"), (species.abilities, "ability"), (species.items, "item")):
+            for usage, name in choices:
+                arrays[f"{section}Names"].append(strings.add(name))
+                arrays[f"{section}Usages"].append(usage)
+            arrays[f"{section}Offsets"].append(len(arrays[f"{section}Names"]))
+
+        for usage, spread in species.spreads:
+            arrays["spreadNatures"].append(strings.add(spread.nature))
+            arrays["spreadUsages"].append(usage)
+            stats += [spread.hp, spread.attack, spread.defence, spread.spattack, spread.spdefence, spread.speed]
+        arrays["spreadOffsets"].append(len(arrays["spreadNatures"]))
+
+        for table, section in ((species.moveTable, "move"), (species.abilityTable, "ability"), (species.itemTable, "item"), (species.spreadTable, "spread")):
+            arrays[f"{section}AliasProbs"].extend(table.prob)
+            arrays[f"{section}Aliases"].extend(table.alias)
+
+    flags = FLAG_BIG_ENDIAN if sys.byteorder == "big" else 0
+    if any(i > 255 for i in stats):
+        flags |= FLAG_WIDE_STATS
+        arrays["spreadStats"] = array("H", stats)
+    else:
+        arrays["spreadStats"] = array("B", stats)
+
+    arrays["stringOffsets"] = strings.offsets
+    arrays["stringData"] = array("B", bytes(strings.data))
+
+    sectionBytes = [arrays[name].tobytes() for name, _ in sections]
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    layout: List[Tuple[int, int]] = []
+    for i in sectionBytes:
+        # Keep every section 4 byte aligned so it can be cast in place
+        offset += -offset % 4
+        layout.append((offset, len(i)))
+        offset += len(i)
+
+    # Written to a temporary file and renamed so processes that have the old file mapped keep a consistent copy
+    tmpName = f"{filename}.tmp{os.getpid()}"
+    with open(tmpName, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(sections)))
+        for i in layout:
+            f.write(SECTION.pack(*i))
+
+        for (sectionOffset, _), data in zip(layout, sectionBytes):
+            f.write(b"\0" * (sectionOffset - f.tell()))
+            f.write(data)
+
+    os.replace(tmpName, filename)
+
+class PackedSpeciesDict(Mapping[str, PokemonSpecies]):
+    def __init__ (self, filename: str):
+        with open(filename, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, flags, sectionCount = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or self.version > VERSION or sectionCount != len(getSections(self.version)):
+            raise ValueError(f"\"{filename}\" is not a species cache this server can read!")
+        if bool(flags & FLAG_BIG_ENDIAN) != (sys.byteorder == "big"):
+            raise ValueError(f"\"{filename}\" was written on a machine with a different byte order!")
+
+        view = memoryview(self.buffer)
+        self.sections: Dict[str, memoryview] = {}
+        for i, (name, typecode) in enumerate(getSections(self.version)):
+            offset, length = SECTION.unpack_from(self.buffer, HEADER.size + SECTION.size * i)
+            if name == "spreadStats" and flags & FLAG_WIDE_STATS:
+                typecode = "H"
+            self.sections[name] = view[offset:offset + length].cast(typecode)
+
+        self.strings: List[Union[str, None]] = [None] * (len(self.sections["stringOffsets"]) - 1)
+        self.index: Dict[str, int] = dict((self.getString(j), i) for i, j in enumerate(self.sections["speciesNames"]))
+
+        self.speciesLock = Lock()
+        self.species: Dict[str, PokemonSpecies] = {}
+
+    def getString (self, stringId: int) -> str:
+        # Every species in the file shares the same decoded string objects
+        s = self.strings[stringId]
+        if s == None:
+            offsets = self.sections["stringOffsets"]
+            s = sys.intern(bytes(self.sections["stringData"][offsets[stringId]:offsets[stringId + 1]]).decode("utf-8"))
+            self.strings[stringId] = s
+
+        return s
+
+    def getChoices (self, section: str, index: int) -> List[Tuple[float, str]]:
+        start = self.sections[f"{section}Offsets"][index]
+        end = self.sections[f"{section}Offsets"][index + 1]
+        names = self.sections[f"{section}Names"]
+        usages = self.sections[f"{section}Usages"]
+
+        return [(unpackFloat(usages[i]), self.getString(names[i])) for i in range(start, end)]
+
+    def getSpreads (self, index: int) -> List[Tuple[float, PokemonSpread]]:
+        start = self.sections["spreadOffsets"][index]
+        end = self.sections["spreadOffsets"][index + 1]
+        natures = self.sections["spreadNatures"]
+        stats = self.sections["spreadStats"]
+        usages = self.sections["spreadUsages"]
+
+        return [(unpackFloat(usages[i]), PokemonSpread(self.getString(natures[i]), list(stats[6 * i:6 * i + 6]))) for i in range(start, end)]
+
+    def getTables (self, index: int, choices: Dict[str, List]) -> Dict[str, AliasTable]:
+        if self.version < 2:
+            return None
+
+        tables: Dict[str, AliasTable] = {}
+        for name, section in TABLE_SECTIONS:
+            start = self.sections[f"{section}Offsets"][index]
+            end = self.sections[f"{section}Offsets"][index + 1]
+            tables[name] = AliasTable(choices[name], self.sections[f"{section}AliasProbs"][start:end], self.sections[f"{section}Aliases"][start:end])
+
+        return tables
+
+    def materialize (self, index: int) -> PokemonSpecies:
+        choices = {
+            "moves" : self.getChoices("move", index),
+            "abilities" : self.getChoices("ability", index),
+            "items" : self.getChoices("item", index),
+            "spreads" : self.getSpreads(index)
+        }
+
+        return PokemonSpecies(self.getString(self.sections["speciesNames"][index]), choices["moves"], choices["abilities"], choices["items"],
+                choices["spreads"], unpackFloat(self.sections["speciesUsages"][index]), self.getTables(index, choices))
+
+    def __getitem__ (self, key: str) -> PokemonSpecies:
+        species = self.species.get(key, None)
+        if species != None:
+            return species
+
+        index = self.index[key]
+        with self.speciesLock:
+            if key not in self.species:
+                self.species[key] = self.materialize(index)
+
+            return self.species[key]
+
+    def __contains__ (self, key: object) -> bool:
+        return key in self.index
+
+    def __iter__ (self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__ (self) -> int:
+        return len(self.index)
+
+    def usageItems (self) -> Iterable[Tuple[str, float]]:
+        usages = self.sections["speciesUsages"]
+        return [(name, unpackFloat(usages[i])) for name, i in self.index.items()]
+
+def speciesUsages (speciesDict: Mapping[str, PokemonSpecies]) -> Iterable[Tuple[str, float]]:
+    # Usage of every species without building the ones that are packed
+    if isinstance(speciesDict, PackedSpeciesDict):
+        return speciesDict.usageItems()
+
+    return [(name, species.usage) for name, species in speciesDict.items()]
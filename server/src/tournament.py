@@ -1,8 +1,12 @@
-from typing import Dict, List
+import secrets
+from random import Random
+from typing import Dict, List, Set, Tuple, Union
 
 from src.pokemon import Pokemon
 from src.error import InputError
-from src.usage_scraping import generatePokemon
+from src.matchmaking import MANUAL, MatchmakingQueue, getPolicy
+from src.sampling import spawnRandom
+from src.usage_scraping import TierWeights, generateDrafts
 
 defaultSettings = {
     "team_size" : 6,
@@ -11,46 +15,101 @@ defaultSettings = {
     "ou_scale" : 0.6,
     "uu_scale" : 1.0,
     "ru_scale" : 0.90,
-    "nu_scale" : 0.6
+    "nu_scale" : 0.6,
+    "matchmaking" : MANUAL
 }
 
+# Only kept in storage and never sent out. Anyone with the seed could work out every draw still to come, updated is
+# when it was last changed for archiving
+privateFields = ("seed", "updated")
+
+def publicJson (tourJson: Dict) -> Dict:
+    return dict((k, v) for k, v in tourJson.items() if k not in privateFields)
+
+def newSeed () -> int:
+    return secrets.randbits(64)
+
+def getScalings (settings: Dict) -> Dict[str, float]:
+    return {
+        "gen8ou" : settings["ou_scale"],
+        "gen8uu" : settings["uu_scale"],
+        "gen8ru" : settings["ru_scale"],
+        "gen8nu" : settings["nu_scale"]
+    }
+
 class Player:
-    def __init__ (self, playerId: str, team=[], generated=[], status="waiting_start", battling=None):
+    def __init__ (self, playerId: str, team=[], generated=[], status="waiting_start", battling=None, wins=0, losses=0, opponents=[],
+            queued=None, refill=0):
         self.playerId = playerId
-        self.team: List[Pokemon] = team
-        self.generated: List[Pokemon] = generated
+        self.team: List[Pokemon] = list(team)
+        self.generated: List[Pokemon] = list(generated)
         self.status = status
         self.battling = battling
+        self.wins: int = wins
+        self.losses: int = losses
+        self.opponents: List[str] = list(opponents)
+        # Place in the matchmaking queue while waiting for a battle
+        self.queued: Union[int, None] = queued
+        # Pokemon still to be drawn for the team after a swap, a "generating" player without any is waiting on a draft
+        self.refill: int = refill
+        self.reindex()
+        # toJson is kept until the player changes, so unchanged players aren't serialized again on every save
+        self.json: Union[Dict, None] = None
+
+    def markChanged (self) -> None:
+        self.json = None
+
+    def reindex (self) -> None:
+        # Species -> slot in team / generated, rebuilt whenever either list changes
+        self.teamSlots: Dict[str, int] = dict((j.species, i) for i, j in enumerate(self.team))
+        self.generatedSlots: Dict[str, int] = dict((j.species, i) for i, j in enumerate(self.generated))
 
     @classmethod
     def fromJson (cls, data: Dict):
         return cls(data["player_id"], [Pokemon.fromJson(i) for i in data["team"]], [Pokemon.fromJson(i) for i in data["generated"]], data["status"],
-                data.get("battling", None))
+                data.get("battling", None), data.get("wins", 0), data.get("losses", 0), data.get("opponents", []), data.get("queued", None),
+                data.get("refill", 0))
     
     def toJson (self) -> Dict:
+        if self.json != None:
+            return self.json
+
         d = {
             "player_id" : self.playerId,
             "team" : [i.getJson() for i in self.team],
             "generated" : [i.getJson() for i in self.generated],
-            "status" : self.status
+            "status" : self.status,
+            "wins" : self.wins,
+            "losses" : self.losses,
+            "opponents" : list(self.opponents)
         }
 
         if self.battling:
             d["battling"] = self.battling
 
+        if self.queued != None:
+            d["queued"] = self.queued
+
+        if self.refill > 0:
+            d["refill"] = self.refill
+
+        self.json = d
         return d
     
     def choosePokemon (self, choices: List[str], teamSize: int) -> None:
         if self.status != "choosing_pokemon":
             raise InputError(description="Can't choose pokemon right now!")
 
-        if len(choices) != teamSize or not all(i in [j.species for j in self.generated] for i in choices):
+        if len(choices) != teamSize or len(set(choices)) != len(choices) or not all(i in self.generatedSlots for i in choices):
             raise InputError(description="Team choice incorrect!")
         
-        self.team = [i for i in self.generated if i.species in choices]
+        chosen = set(choices)
+        self.team = [i for i in self.generated if i.species in chosen]
         self.generated = []
+        self.reindex()
 
         self.status = "waiting_battle"
+        self.markChanged()
 
     def completeBattle (self, won: bool) -> None:
         if self.status != "battling":
@@ -58,8 +117,11 @@ class Player:
         
         if won:
             self.status = "stealing"
+            self.wins += 1
         else:
             self.status = "waiting_stolen"
+            self.losses += 1
+        self.markChanged()
 
     def stealPokemon (self, otherPlayer, pokemon: List[str], swapped: List[str], maxStolen: int) -> None:
         if self.status != "stealing" or otherPlayer.playerId != self.battling:
@@ -68,64 +130,78 @@ class Player:
         if len(pokemon) > maxStolen or len(pokemon) != len(swapped):
             raise InputError(description="Amounts stolen are incorrect!")
         
-        if not all(i in [j.species for j in otherPlayer.team] for i in pokemon) or not all(i in [j.species for j in self.team] for i in swapped):
+        if not all(i in otherPlayer.teamSlots for i in pokemon) or not all(i in self.teamSlots for i in swapped):
             raise InputError(description="Pokemon stolen or being swapped are incorrect!")
 
-        swappedPokemon = [i for i in self.team if i.species in swapped]
-        stolenPokemon = [i for i in otherPlayer.team if i.species in pokemon]
+        swappedSpecies = set(swapped)
+        stolenSpecies = set(pokemon)
+        swappedPokemon = [i for i in self.team if i.species in swappedSpecies]
+        stolenPokemon = [i for i in otherPlayer.team if i.species in stolenSpecies]
 
-        for i in swappedPokemon:
-            self.team.remove(i)
-        
-        for i in stolenPokemon:
-            otherPlayer.team.remove(i)
-        
-        self.team += stolenPokemon
-        otherPlayer.generated += swappedPokemon
+        self.team = [i for i in self.team if i.species not in swappedSpecies] + stolenPokemon
+        otherPlayer.team = [i for i in otherPlayer.team if i.species not in stolenSpecies]
+        otherPlayer.generated = otherPlayer.generated + swappedPokemon
+        self.reindex()
+        otherPlayer.reindex()
 
         self.status = "waiting_battle"
         self.battling = None
         otherPlayer.status = "swapping"
         otherPlayer.battling = None
+        self.markChanged()
+        otherPlayer.markChanged()
 
-    def swapPokemon (self, kept: List[str], tour) -> None:
+    def swapPokemon (self, kept: List[str]) -> None:
         if self.status != "swapping":
             raise InputError(description="Cannot swap pokemon!")
         
-        if not all(i in [j.species for j in self.generated] for i in kept):
+        if not all(i in self.generatedSlots for i in kept) or len(set(kept)) != len(kept):
             raise InputError(description="Kept pokemon are incorrect!")
         
-        for i in kept:
-            self.team.append(self.generated.pop([j for j, v in enumerate(self.generated) if v.species == i][0]))
-        
-        self.team += tour.genPokemon(len(self.generated))
+        self.team = self.team + [self.generated[self.generatedSlots[i]] for i in kept]
+        # The rest of the team is drawn in the background with everyone else waiting on pokemon
+        self.refill = len(self.generated) - len(kept)
 
         self.generated = []
+        self.reindex()
 
-        self.status = "waiting_battle"
+        self.status = "generating" if self.refill > 0 else "waiting_battle"
+        self.markChanged()
     
 class Tournament:
-    def __init__ (self, name: str, settings: Dict = defaultSettings):
+    def __init__ (self, name: str, settings: Dict = defaultSettings, seed: Union[int, None] = None):
         self.name = name
         self.players: List[Player] = []
+        self.playerIndex: Dict[str, Player] = {}
+        # The list keeps the json order, the set is what membership checks use
         self.usedPokemon: List[str] = []
+        self.usedSpecies: Set[str] = set()
         self.teamSize: int = settings["team_size"]
         self.drawSize: int = settings["draw_size"]
         self.stealSize: int = settings["steal_size"]
-        self.scalings: Dict[str, float] = {
-            "gen8ou" : settings["ou_scale"],
-            "gen8uu" : settings["uu_scale"],
-            "gen8ru" : settings["ru_scale"],
-            "gen8nu" : settings["nu_scale"]
-        }
+        self.scalings: Dict[str, float] = getScalings(settings)
         self.started = False
+
+        # Tournaments from before matchmaking was added are paired by hand
+        self.matchmaking: str = settings.get("matchmaking", MANUAL)
+        policy = getPolicy(self.matchmaking)
+        self.queue: Union[MatchmakingQueue, None] = MatchmakingQueue(policy) if policy != None else None
+        self.nextTicket = 0
+
+        # Every draw gets its own rng streams from the seed and how many draws came before it, so the same seed and
+        # the same actions give the same pokemon
+        self.seed: int = seed if seed != None else newSeed()
+        self.draws = 0
     
     def toJson (self) -> Dict:
         return {
             "name" : self.name,
             "players" : [i.toJson() for i in self.players],
             "started" : self.started,
-            "used_pokemon" : self.usedPokemon,
+            "generating" : len([i for i in self.players if i.status == "generating"]),
+            "used_pokemon" : list(self.usedPokemon),
+            "seed" : self.seed,
+            "draws" : self.draws,
             "settings" : {
                 "team_size" : self.teamSize,
                 "draw_size" : self.drawSize,
@@ -133,60 +209,114 @@ class Tournament:
                 "ou_scale" : self.scalings["gen8ou"],
                 "uu_scale" : self.scalings["gen8uu"],
                 "ru_scale" : self.scalings["gen8ru"],
-                "nu_scale" : self.scalings["gen8nu"]
+                "nu_scale" : self.scalings["gen8nu"],
+                "matchmaking" : self.matchmaking
             }
         }
 
     @classmethod
     def fromJson (cls, data: Dict):
-        tour = cls(data["name"], data["settings"])
+        # Tournaments from before seeds were saved are given one when they're loaded, see TournamentData.loadResident
+        tour = cls(data["name"], data["settings"], data.get("seed", None))
+        tour.draws = data.get("draws", 0)
         tour.players = [Player.fromJson(i) for i in data["players"]]
+        tour.playerIndex = dict((i.playerId, i) for i in tour.players)
         tour.started = data["started"]
-        tour.usedPokemon = data["used_pokemon"]
+        tour.usedPokemon = list(data["used_pokemon"])
+        tour.usedSpecies = set(tour.usedPokemon)
+
+        tickets = [i.queued for i in tour.players if i.queued != None]
+        tour.nextTicket = max(tickets) + 1 if len(tickets) > 0 else 0
+        if tour.queue != None:
+            tour.queue.heapify([i for i in tour.players if i.status == "waiting_battle" and i.queued != None])
+
         return tour
 
-    def addPlayer (self, player: Player) -> None:
+    def addPlayer (self, player: Player, weights: Union[TierWeights, None] = None) -> None:
         if player.playerId in self:
             raise InputError(description=f"Player \"{player.playerId}\" already exists in tournament \"{self.name}\"!")
         
         self.players.append(player)
+        self.playerIndex[player.playerId] = player
 
         if self.started:
-            self.genPlayerPokemon(player)
-
+            self.queueDraft(player)
+            self.checkPending(weights)
 
     def getPlayer (self, playerId: str) -> Player:
-        players = [i for i in self.players if i.playerId == playerId]
-
-        if len(players) == 0:
+        if playerId not in self.playerIndex:
             raise InputError(description=f"Player \"{playerId}\" does not exist in tournament \"{self.name}\"")
 
-        return players[0]
-
-    def genPlayerPokemon (self, player: Player):
-        genned = generatePokemon(self.drawSize, self.usedPokemon, self.scalings)
-
-        player.generated = genned
-
-        player.status = "choosing_pokemon"
-
-        self.usedPokemon += [i.species for i in genned]
-    
-    def genPokemon (self, num: int):
-        genned = generatePokemon(num, self.usedPokemon, self.scalings)
-
-        self.usedPokemon += [i.species for i in genned]
-
-        return genned
+        return self.playerIndex[playerId]
+
+    def nextDraw (self) -> int:
+        self.draws += 1
+        return self.draws
+
+    def getRandom (self, draw: int, *path) -> Random:
+        return spawnRandom(self.seed, draw, *path)
+
+    def queueDraft (self, player: Player) -> None:
+        # The pokemon themselves are drawn by generatePending
+        player.status = "generating"
+        player.markChanged()
+
+    def getDraftSize (self, player: Player) -> int:
+        return player.refill if player.refill > 0 else self.drawSize
+
+    def checkPending (self, weights: TierWeights) -> None:
+        # Drafts are drawn later on, so running out of pokemon is caught here while the request that queued them can
+        # still be rolled back. The weights are got by the caller before the tournament is locked
+        needed = sum(self.getDraftSize(i) for i in self.players if i.status == "generating")
+        available = weights.available(self.usedSpecies)
+        if needed > available:
+            raise InputError(description=f"Not enough pokemon left, {needed} are needed but only {available} are left!")
+
+    def generatePending (self, limit: int) -> int:
+        # Draws for up to limit "generating" players in one pass, in player order so the same seed, batch size and
+        # actions give the same pokemon whenever the batches happen to run. Returns how many players are still left
+        pending = [i for i in self.players if i.status == "generating"]
+        batch = pending[:limit]
+        if len(batch) == 0:
+            return 0
+
+        draw = self.nextDraw()
+        hands = generateDrafts([self.getDraftSize(i) for i in batch], self.usedSpecies, self.scalings,
+                self.getRandom(draw, "deal"), [self.getRandom(draw, "player", i.playerId) for i in batch])
+
+        refilled = []
+        for player, genned in zip(batch, hands):
+            if player.refill > 0:
+                player.team = player.team + genned
+                player.refill = 0
+                player.status = "waiting_battle"
+                refilled.append(player)
+            else:
+                player.generated = genned
+                player.status = "choosing_pokemon"
+
+            player.reindex()
+            player.markChanged()
+            self.addUsed(genned)
+
+        self.matchmake(*refilled)
+
+        return len(pending) - len(batch)
+
+    def addUsed (self, pokemon: List[Pokemon]) -> None:
+        self.usedPokemon += [i.species for i in pokemon]
+        self.usedSpecies.update(i.species for i in pokemon)
     
-    def start (self):
+    def start (self, weights: TierWeights):
         if self.started:
             raise InputError(description="Tournament already started!")
         
         self.started = True
 
         for i in self.players:
-            self.genPlayerPokemon(i)
+            self.queueDraft(i)
+
+        self.checkPending(weights)
 
     def startBattle (self, player1Id: str, player2Id: str) -> None:
         player1 = self.getPlayer(player1Id)
@@ -200,9 +330,34 @@ class Tournament:
 
         player1.status = "battling"
         player2.status = "battling"
+        player1.opponents.append(player2Id)
+        player2.opponents.append(player1Id)
+        player1.queued = None
+        player2.queued = None
+        player1.markChanged()
+        player2.markChanged()
+
+    def matchmake (self, *players: Player) -> List[Tuple[str, str]]:
+        # Queues any of the given players now waiting for a battle and starts every battle the policy can pair up,
+        # returns the pairs started
+        if self.queue == None:
+            return []
+
+        for player in players:
+            if player.status == "waiting_battle" and player.queued == None:
+                player.queued = self.nextTicket
+                player.markChanged()
+                self.nextTicket += 1
+                self.queue.push(player)
+
+        pairs = [(i.playerId, j.playerId) for i, j in self.queue.pair(self.playerIndex)]
+        for player1, player2 in pairs:
+            self.startBattle(player1, player2)
+
+        return pairs
 
     def __contains__ (self, key: str) -> bool:
-        return len([i for i in self.players if i.playerId == key]) != 0
+        return key in self.playerIndex
 
     def __str__ (self) -> str:
         return str(self.toJson())
\ No newline at end of file
@@ -0,0 +1,132 @@
+import argparse
+import gzip
+import json
+import os
+import time
+import urllib.request
+from threading import Lock
+from typing import Dict, Union
+from urllib.parse import quote, unquote
+
+import src.config
+from src.tournament_storage import getMetadata
+
+# Tournaments nobody has touched in a while are moved out of the active storage into one gzipped json file each, they
+# are still readable and are moved back the first time anything writes to them.
+#
+#   index.json          name -> metadata, plus when it was archived and the compressed size
+#   <name>.json.gz      the tournament's json
+#
+#   python -m src.tournament_archive --days 30 --url http://localhost:8080
+INDEX = "index.json"
+EXTENSION = ".json.gz"
+
+class TournamentArchive:
+    def __init__ (self, directory: str):
+        self.directory = directory
+        self.lock = Lock()
+        self.index: Dict[str, Dict] = {}
+
+    def getFilename (self, name: str) -> str:
+        return os.path.join(self.directory, f"{quote(name, safe='')}{EXTENSION}")
+
+    def loadIndex (self) -> Dict[str, Dict]:
+        try:
+            with open(os.path.join(self.directory, INDEX)) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        # Files written after the index was last saved are still archived, anything in the index without a file isn't
+        names = set()
+        if os.path.isdir(self.directory):
+            names = set(unquote(i[:-len(EXTENSION)]) for i in os.listdir(self.directory) if i.endswith(EXTENSION))
+
+        with self.lock:
+            self.index = dict((k, v) for k, v in index.items() if k in names)
+            for name in names - set(self.index):
+                self.index[name] = dict(getArchiveMetadata(self.load(name)), bytes=os.path.getsize(self.getFilename(name)))
+
+            return dict(self.index)
+
+    def writeIndex (self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            index = dict(self.index)
+
+        tmpName = os.path.join(self.directory, f"{INDEX}.tmp{os.getpid()}")
+        with open(tmpName, "w") as f:
+            json.dump(index, f)
+        os.replace(tmpName, os.path.join(self.directory, INDEX))
+
+    def __contains__ (self, name: str) -> bool:
+        return name in self.index
+
+    def load (self, name: str) -> Union[Dict, None]:
+        try:
+            with gzip.open(self.getFilename(name), "rt") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def add (self, name: str, tourJson: Dict) -> int:
+        # Returns the compressed size, the index is only written by writeIndex so bulk archiving writes it once
+        os.makedirs(self.directory, exist_ok=True)
+
+        filename = self.getFilename(name)
+        tmpName = f"{filename}.tmp{os.getpid()}"
+        with gzip.open(tmpName, "wt") as f:
+            json.dump(tourJson, f, separators=(",", ":"))
+        os.replace(tmpName, filename)
+
+        size = os.path.getsize(filename)
+        with self.lock:
+            self.index[name] = dict(getArchiveMetadata(tourJson), bytes=size)
+
+        return size
+
+    def remove (self, name: str) -> None:
+        try:
+            os.remove(self.getFilename(name))
+        except FileNotFoundError:
+            pass
+
+        with self.lock:
+            self.index.pop(name, None)
+
+        self.writeIndex()
+
+    def clear (self) -> None:
+        with self.lock:
+            names = list(self.index)
+            self.index = {}
+
+        for name in names:
+            try:
+                os.remove(self.getFilename(name))
+            except FileNotFoundError:
+                pass
+
+        self.writeIndex()
+
+def getArchiveMetadata (tourJson: Dict) -> Dict:
+    return dict(getMetadata(tourJson), archived=int(time.time()))
+
+def main () -> None:
+    # The running server does the archiving through /api/test/tournament/archive, moving tournaments from here behind
+    # its back would leave its index and cached tournaments stale
+    parser = argparse.ArgumentParser(description="Archives battle factory tournaments that haven't changed in a while")
+    parser.add_argument("--days", type=float, default=src.config.archive_idle_days, help="archive tournaments idle for this many days")
+    parser.add_argument("--url", default="http://localhost:8080", help="the battle factory server")
+    args = parser.parse_args()
+
+    archiveRequest = urllib.request.Request(f"{args.url}/api/test/tournament/archive", json.dumps({"days" : args.days}).encode(),
+            {"Content-Type" : "application/json"})
+    with urllib.request.urlopen(archiveRequest) as response:
+        result = json.loads(response.read())
+
+    print(f"Archived {result['archived']} tournaments, freed {result['freed']} bytes of active storage for {result['written']} "
+            f"bytes of archive ({result['freed'] - result['written']} bytes reclaimed)")
+
+if __name__ == "__main__":
+    main()
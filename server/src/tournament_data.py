@@ -1,185 +1,653 @@
-import json
-from typing import Dict, List, Tuple, Union
-from threading import Lock, RLock
-from src.error import InputError
-from src.tournament import Tournament
+import time
+from json import dumps
+from typing import Callable, Dict, List, Tuple, Union
+from threading import Condition, Lock
+import src.config
+from src.error import InputError, UnavailableError
+from src.tournament import Tournament, newSeed, privateFields
+from src.tournament_archive import TournamentArchive
+from src.tournament_journal import TournamentJournal
+from src.tournament_persist import WriteBehindStorage
+from src.tournament_sqlite import SqliteStorage
+from src.tournament_storage import TournamentStorage, getMetadata, importTournaments, loadLegacy
 
 class ReadWriteLock:
+    # Writer preferring, once a writer is waiting new readers queue up behind it so polling readers can't starve it
     def __init__ (self):
-        self.readerLock = Lock()
-        self.writerLock = Lock()
+        self.condition = Condition(Lock())
         self.readerCounter = 0
+        self.waitingWriters = 0
         self.writerLocked = False
     
-    def lockReader (self) -> None:
-        self.readerLock.acquire()
-        self.readerCounter += 1
-        if self.readerCounter == 1:
-            self.writerLock.acquire()
-        self.readerLock.release()
+    def lockReader (self, timeout: Union[float, None] = None) -> bool:
+        with self.condition:
+            if not self.condition.wait_for(lambda: not self.writerLocked and self.waitingWriters == 0, timeout):
+                return False
+
+            self.readerCounter += 1
+            return True
     
     def unlockReader (self) -> None:
-        self.readerLock.acquire()
-        self.readerCounter -= 1
-        if self.readerCounter == 0:
-            self.writerLock.release()
-        self.readerLock.release()
+        with self.condition:
+            self.readerCounter -= 1
+            if self.readerCounter == 0:
+                self.condition.notify_all()
     
-    def lockWriter (self) -> None:
-        self.writerLock.acquire()
-        self.writerLocked = True
+    def lockWriter (self, timeout: Union[float, None] = None) -> bool:
+        with self.condition:
+            self.waitingWriters += 1
+            try:
+                locked = self.condition.wait_for(lambda: not self.writerLocked and self.readerCounter == 0, timeout)
+            finally:
+                self.waitingWriters -= 1
+
+            if not locked:
+                # Readers held back for us can go ahead
+                self.condition.notify_all()
+                return False
+
+            self.writerLocked = True
+            return True
     
     def unlockWriter (self) -> None:
-        self.writerLocked = False
-        self.writerLock.release()
+        with self.condition:
+            self.writerLocked = False
+            self.condition.notify_all()
 
     def __bool__ (self):
         return self.writerLocked
 
+class LockStats:
+    # How long threads waited for each kind of lock
+    def __init__ (self):
+        self.lock = Lock()
+        self.stats: Dict[str, Dict] = {}
+
+    def record (self, kind: str, wait: float, acquired: bool) -> None:
+        with self.lock:
+            if kind not in self.stats:
+                self.stats[kind] = {
+                    "acquired" : 0,
+                    "timeouts" : 0,
+                    "total_wait" : 0.0,
+                    "max_wait" : 0.0
+                }
+
+            stats = self.stats[kind]
+            stats["acquired" if acquired else "timeouts"] += 1
+            stats["total_wait"] += wait
+            stats["max_wait"] = max(stats["max_wait"], wait)
+
+    def getJson (self) -> Dict:
+        with self.lock:
+            return dict((k, dict(v, average_wait=v["total_wait"] / max(v["acquired"] + v["timeouts"], 1))) for k, v in self.stats.items())
+
 class WriterTournament(Tournament):
     @classmethod
     def fromJson(cls, *args, **kwargs):
         return super(WriterTournament, cls).fromJson(*args, **kwargs)
 
+class TournamentView:
+    # One committed version of a tournament as readers see it. Never changed once made, the serialized json is filled
+    # in the first time it's asked for and kept until the next commit replaces the whole view. Each player and field
+    # remembers the version it last changed in, so pollers can ask for just the changes since the version they have
+    __slots__ = ("version", "json", "players", "text", "playerTexts", "compactTexts", "baseVersion", "playerVersions", "fieldVersions")
+
+    def __init__ (self, version: int, tourJson: Dict, previous = None):
+        self.version = version
+        self.json = tourJson
+        self.players: Dict[str, Dict] = dict((i["player_id"], i) for i in tourJson["players"])
+        self.text: Union[str, None] = None
+        self.playerTexts: Dict[str, str] = {}
+        self.compactTexts: Dict[str, str] = {}
+
+        if previous == None:
+            # Nothing is known about changes from before this was loaded
+            self.baseVersion = version
+            self.playerVersions: Dict[str, int] = dict((i, version) for i in self.players)
+            self.fieldVersions: Dict[str, int] = dict((k, version) for k in tourJson if k != "players" and k not in privateFields)
+            return
+
+        self.baseVersion = previous.baseVersion
+        self.playerVersions = dict(previous.playerVersions)
+        self.fieldVersions = dict((k, version if previous.json.get(k, None) != v else previous.fieldVersions[k])
+                for k, v in tourJson.items() if k != "players" and k not in privateFields)
+
+        # Unchanged players are normally the same dict as in the previous view, their text is reused as is
+        for playerId, player in self.players.items():
+            oldPlayer = previous.players.get(playerId, None)
+            if oldPlayer is not player and oldPlayer != player:
+                self.playerVersions[playerId] = version
+                continue
+
+            if playerId in previous.playerTexts:
+                self.playerTexts[playerId] = previous.playerTexts[playerId]
+            if playerId in previous.compactTexts:
+                self.compactTexts[playerId] = previous.compactTexts[playerId]
+
+    def getCompactText (self, player: Dict) -> str:
+        text = self.compactTexts.get(player["player_id"], None)
+        if text == None:
+            text = dumps(player)
+            self.compactTexts[player["player_id"]] = text
+
+        return text
+
+    def compose (self, fields: Dict) -> str:
+        # The same text dumps gives, put together from each player's cached text. Private fields are left out
+        parts = []
+        for k, v in fields.items():
+            if k in privateFields:
+                continue
+            elif k == "players":
+                parts.append(f"{dumps(k)}: [{', '.join(self.getCompactText(i) for i in v)}]")
+            else:
+                parts.append(f"{dumps(k)}: {dumps(v)}")
+
+        return f"{{{', '.join(parts)}}}"
+
+    def getText (self) -> str:
+        if self.text == None:
+            self.text = self.compose(dict(self.json, version=self.version))
+
+        return self.text
+
+    def getChangesText (self, since: int) -> str:
+        # Fields and players changed after version since. A version from before this tournament was loaded, or from
+        # before it was cleared and made again, gets everything back marked as full
+        full = since < self.baseVersion or since > self.version
+
+        changes = {
+            "name" : self.json["name"],
+            "version" : self.version,
+            "since" : since,
+            "full" : full
+        }
+        changes.update((k, v) for k, v in self.json.items() if k in self.fieldVersions and (full or self.fieldVersions[k] > since))
+        changes["players"] = [i for i in self.json["players"] if full or self.playerVersions[i["player_id"]] > since]
+
+        return self.compose(changes)
+
+    def getPlayer (self, playerId: str) -> Dict:
+        if playerId not in self.players:
+            raise InputError(description=f"Player \"{playerId}\" does not exist in tournament \"{self.json['name']}\"")
+
+        return self.players[playerId]
+
+    def getPlayerText (self, playerId: str) -> str:
+        text = self.playerTexts.get(playerId, None)
+        if text == None:
+            text = dumps(self.getPlayer(playerId), indent=2)
+            self.playerTexts[playerId] = text
+
+        return text
+
+    def getPlayerVersionText (self, playerId: str) -> str:
+        # The player with the version to wait on next
+        return dumps(dict(self.getPlayer(playerId), version=self.version))
+
 class TournamentContextManager:
-    def __init__ (self, tour: Tournament, lock: Union[Lock, None], data):
+    def __init__ (self, tour: Union[Tournament, None], data, key: Union[str, None] = None):
         self.tour = tour
-        self.lock = lock
         self.data = data
+        self.key = key
     
     def __enter__ (self) -> Tournament:
-        if self.lock != None:
-            self.lock.acquire()
+        if self.tour == None:
+            # Writers hold the data lock as readers for the whole write so clear waits for them, then the tournament lock
+            self.data.lockReader()
+            try:
+                self.data.lockTournament(self.key)
+            except:
+                self.data.personalLock.unlockReader()
+                raise
+
+            # Only looked up once the lock is held, a writer that failed before us may have dropped the old one
+            try:
+                self.tour = self.data.getLive(self.key)
+            except:
+                self.data.unlockTournament(self.key)
+                raise
         
         return self.tour
     
     def __exit__ (self, exc_type, exc_value, traceback):
-        if exc_type == None and isinstance(self.tour, WriterTournament):
-            #success
-            self.data.saveTour(self.tour)
-        if self.lock != None:
-            self.lock.release()
+        if not isinstance(self.tour, WriterTournament):
+            return False
+
+        try:
+            if exc_type == None:
+                #success
+                self.data.saveTour(self.tour)
+            else:
+                # The live tournament may be half changed, it's rebuilt from the last commit next time
+                self.data.dropLive(self.tour.name)
+        except:
+            self.data.dropLive(self.tour.name)
+            raise
+        finally:
+            self.data.unlockTournament(self.key)
 
         return False
 
+def makeStorage (backend: str) -> TournamentStorage:
+    if backend == "json":
+        storage = TournamentJournal("data/tournaments", src.config.journal_compact_interval, src.config.journal_compact_bytes, src.config.persist_fsync)
+    elif backend == "sqlite":
+        storage = SqliteStorage(src.config.tournament_db, src.config.persist_fsync)
+    else:
+        raise ValueError(f"Unknown tournament storage \"{backend}\"!")
+
+    return WriteBehindStorage(storage, src.config.persist_interval, src.config.persist_max_pending, src.config.persist_wait_durable,
+            src.config.lock_timeout)
+
+def estimateSize (tourJson: Dict) -> int:
+    # Rough bytes a resident tournament takes (json, view and live objects), only used against the memory budget
+    pokemon = sum(len(i["team"]) + len(i["generated"]) for i in tourJson["players"])
+    return 2048 + 512 * len(tourJson["players"]) + 512 * pokemon + 16 * len(tourJson["used_pokemon"])
+
 class TournamentData:
-    def __init__ (self, savefile: str):
+    def __init__ (self, storage: TournamentStorage, savefile: str, archive: TournamentArchive):
         self.savefile = savefile
-        tournamentJson: List[Dict] = []
-        try:
-            with open(savefile) as f:
-                tournamentJson = json.load(f)["tournaments"]
-        except:
-            pass
+        self.storage = storage
+        self.archive = archive
 
-        self.tournamentsJson: Dict[str, Dict] = {}
-        self.tournamentLocks: Dict[str, Lock] = {}
+        if not self.storage.exists():
+            importTournaments(self.storage, loadLegacy(savefile))
 
-        for i in tournamentJson:
-            self.tournamentsJson[i["name"]] = i
-            self.tournamentLocks[i["name"]] = Lock()
+        # Only names and metadata are read at start, a tournament is loaded the first time it's used
+        self.index: Dict[str, Dict] = self.storage.loadIndex()
+        for name, metadata in self.archive.loadIndex().items():
+            if name in self.index:
+                # Stopped partway through archiving it, the active copy is still there
+                self.archive.remove(name)
+            else:
+                self.index[name] = metadata
+        self.storage.start()
+
+        self.tournamentLocks: Dict[str, Lock] = {}
+        self.versions: Dict[str, int] = {}
+        # Readers are served from views, writers change the live tournament in place under its lock. Both only exist
+        # for resident tournaments
+        self.views: Dict[str, TournamentView] = {}
+        self.live: Dict[str, WriterTournament] = {}
+        # Long polling readers wait on these for the tournament's next commit, watched tournaments aren't evicted
+        self.watchers: Dict[str, Condition] = {}
+        self.watching: Dict[str, int] = {}
         
-        self.dataLock = RLock()
+        # Guards the dicts above for a single tournament name, so unrelated tournaments never wait on each other
+        self.stripes = [Lock() for _ in range(src.config.lock_stripes)]
         self.personalLock = ReadWriteLock()
+        self.lockStats = LockStats()
+
+        # Least recently used tournaments are dropped once the resident ones go over the memory budget
+        self.residentLock = Lock()
+        self.resident: Dict[str, int] = {}
+        self.residentBytes = 0
+        self.lastUsed: Dict[str, float] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def getStripe (self, key: str) -> Lock:
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def timedAcquire (self, acquire: Callable[[float], bool], kind: str, description: str) -> None:
+        start = time.monotonic()
+        acquired = acquire(src.config.lock_timeout)
+        self.lockStats.record(kind, time.monotonic() - start, acquired)
+
+        if not acquired:
+            raise UnavailableError(description=f"Timed out waiting for {description}, try again!")
+
+    def lockReader (self) -> None:
+        self.timedAcquire(self.personalLock.lockReader, "read", "tournament data")
+
+    def lockTournament (self, key: str) -> None:
+        with self.getStripe(key):
+            if key not in self.index:
+                raise InputError(description=f"Tournament \"{key}\" does not exist!")
+
+            if key not in self.tournamentLocks:
+                self.tournamentLocks[key] = Lock()
+            lock = self.tournamentLocks[key]
+
+        self.timedAcquire(lambda timeout: lock.acquire(timeout=timeout), "tournament", f"tournament \"{key}\"")
+
+    def unlockTournament (self, key: str) -> None:
+        self.tournamentLocks[key].release()
+        self.personalLock.unlockReader()
         
     def __contains__ (self, item: str) -> bool:
-        return item in self.tournamentsJson
+        return item in self.index
     
     def __getitem__ (self, key: Union[str, Tuple[str, bool]]) -> Tournament:
-        self.personalLock.lockReader()
+        # Item access never holds a lock after it returns, a tournament written back with tournament_data[name] = tour
+        # replaces anything committed in between. Changes that depend on the current state go through getTour
         if isinstance(key, str):
-            self.personalLock.unlockReader()
-            return self[key, False]
+            key = (key, False)
 
-        if not key[0] in self:
+        self.lockReader()
+        try:
+            return (WriterTournament if key[1] else Tournament).fromJson(self.getView(key[0]).json)
+        finally:
             self.personalLock.unlockReader()
-            raise InputError(description=f"Tournament \"{key[0]}\" does not exist!")
 
-        if key[1]:
-            self.tournamentLocks[key[0]].acquire()
-    
-        val = Tournament.fromJson(self.tournamentsJson[key[0]])
-        
-        self.personalLock.unlockReader()
+    def getTour (self, key: str, isWriter=False) -> TournamentContextManager:
+        if isWriter:
+            if not key in self:
+                raise InputError(description=f"Tournament \"{key}\" does not exist!")
 
-        return val
+            return TournamentContextManager(None, self, key)
 
-    def getTour (self, key: str, isWriter=False) -> TournamentContextManager:
-        self.personalLock.lockReader()
+        return TournamentContextManager(self[key], self, key)
 
-        if not key in self:
-            self.personalLock.unlockReader()
+    def loadResident (self, key: str) -> TournamentView:
+        # Called with the name's stripe held
+        view = self.views.get(key, None)
+        if view != None:
+            return view
+
+        tourJson = None
+        if key in self.index:
+            tourJson = self.archive.load(key) if "archived" in self.index[key] else self.storage.load(key)
+
+        if tourJson == None:
             raise InputError(description=f"Tournament \"{key}\" does not exist!")
 
-        if isWriter:
-            lock = self.tournamentLocks[key]
-            tour = WriterTournament.fromJson(self.tournamentsJson[key])
+        with self.residentLock:
+            self.loads += 1
+
+        if "seed" in tourJson:
+            return self.publish(key, tourJson, self.versions.get(key, 1))
+
+        # From before seeds were saved, it's given one now and that's saved straight away so its draws stay the same
+        # from here on. An archived one goes back into the active storage with it
+        seeded = dict(tourJson, seed=newSeed())
+        view = self.publish(key, seeded, self.versions.get(key, 1))
+        if "archived" in self.index[key]:
+            self.restore(key, view)
         else:
-            lock = None
-            tour = Tournament.fromJson(self.tournamentsJson[key])
-        
-        self.personalLock.unlockReader()
+            self.storage.save(key, tourJson, seeded)
+
+        return view
+
+    def publish (self, key: str, tourJson: Dict, version: int, previous: Union[TournamentView, None] = None) -> TournamentView:
+        # Called with the name's stripe held
+        view = TournamentView(version, tourJson, previous)
+        self.views[key] = view
+        self.versions[key] = version
+        self.lastUsed[key] = time.monotonic()
+
+        size = estimateSize(tourJson)
+        with self.residentLock:
+            self.residentBytes += size - self.resident.get(key, 0)
+            self.resident[key] = size
+
+        return view
+
+    def restore (self, key: str, view: TournamentView) -> None:
+        # Called with the name's stripe held before anything writes to it, an archived tournament goes back into the
+        # active storage first so its changes can be saved as usual
+        if "archived" not in self.index[key]:
+            return
+
+        self.storage.save(key, None, view.json)
+        self.storage.flush()
+        self.archive.remove(key)
+        self.index[key] = getMetadata(view.json)
+
+    def dropResident (self, key: str) -> None:
+        # Called with the name's stripe held
+        self.views.pop(key, None)
+        self.live.pop(key, None)
+        with self.residentLock:
+            self.residentBytes -= self.resident.pop(key, 0)
+
+    def evict (self) -> None:
+        with self.residentLock:
+            if self.residentBytes <= src.config.tournament_memory_budget:
+                return
+            names = sorted(self.resident, key=lambda i: self.lastUsed.get(i, 0))
+
+        for name in names:
+            if self.residentBytes <= src.config.tournament_memory_budget:
+                break
+
+            # Anything busy is skipped rather than waited on, it'll be used again soon anyway
+            stripe = self.getStripe(name)
+            if not stripe.acquire(blocking=False):
+                continue
+
+            try:
+                lock = self.tournamentLocks.get(name, None)
+                if (lock != None and lock.locked()) or self.watching.get(name, 0) > 0:
+                    continue
+
+                self.dropResident(name)
+                with self.residentLock:
+                    self.evictions += 1
+            finally:
+                stripe.release()
+
+    def getView (self, key: str) -> TournamentView:
+        # Views are swapped in whole, so polling readers never take a lock unless the tournament has to be loaded
+        view = self.views.get(key, None)
+        if view == None:
+            with self.getStripe(key):
+                view = self.loadResident(key)
+            self.evict()
+
+        self.lastUsed[key] = time.monotonic()
+
+        return view
+
+    def getLive (self, key: str) -> WriterTournament:
+        with self.getStripe(key):
+            tour = self.live.get(key, None)
+            if tour == None:
+                view = self.loadResident(key)
+                self.restore(key, view)
+                tour = WriterTournament.fromJson(view.json)
+                self.live[key] = tour
+
+        self.lastUsed[key] = time.monotonic()
+        self.evict()
+
+        return tour
+
+    def dropLive (self, key: str) -> None:
+        with self.getStripe(key):
+            self.live.pop(key, None)
+
+    def commit (self, key: str, tourJson: Dict) -> Union[Dict, None]:
+        # Called with the name's stripe held, returns the json from before for the storage
+        oldView = self.views.get(key, None)
+        # Saved for archiving, it's a private field so it's never served
+        tourJson["updated"] = int(time.time())
+
+        self.index[key] = getMetadata(tourJson)
+        self.publish(key, tourJson, self.versions.get(key, 0) + 1, oldView)
+
+        watcher = self.watchers.get(key, None)
+        if watcher != None:
+            with watcher:
+                watcher.notify_all()
+
+        return oldView.json if oldView != None else None
+
+    def waitForChange (self, key: str, changed: Callable[[TournamentView], bool], timeout: float) -> TournamentView:
+        # Returns the first view changed is true for, or the current one once timeout seconds have gone by
+        deadline = time.monotonic() + timeout
+        with self.getStripe(key):
+            if key not in self.watchers:
+                self.watchers[key] = Condition(Lock())
+            watcher = self.watchers[key]
+            self.watching[key] = self.watching.get(key, 0) + 1
 
-        return TournamentContextManager(tour, lock, self)
+        try:
+            while True:
+                view = self.getView(key)
+                remaining = deadline - time.monotonic()
+                if changed(view) or remaining <= 0:
+                    return view
 
+                # Only versions are looked at with the watcher held, commits take it with the stripe held. A view
+                # reloaded after eviction keeps its version, so that doesn't count as a change
+                with watcher:
+                    if self.versions.get(key, None) == view.version:
+                        watcher.wait(remaining)
+        finally:
+            with self.getStripe(key):
+                self.watching[key] -= 1
+                if self.watching[key] == 0:
+                    del self.watching[key]
 
     def saveTour (self, tour: Tournament) -> None:
-        with self.dataLock:
+        # Only the changes to this tournament are written, by the storage outside of the stripe
+        if not isinstance(tour, WriterTournament):
+            raise RuntimeError(f"Cannot save non-writable tournament!")
+
+        tourJson = tour.toJson()
+        with self.getStripe(tour.name):
             if tour.name not in self:
                 raise RuntimeError(f"Tournament \"{tour.name}\" does not exist!")
-            elif not isinstance(tour, WriterTournament):
-                raise RuntimeError(f"Cannot save non-writable tournament!")
 
-            self.tournamentsJson[tour.name] = tour.toJson()
-        
-            self.saveData()
+            oldJson = self.commit(tour.name, tourJson)
+
+        self.storage.save(tour.name, oldJson, tourJson)
+        self.evict()
     
 
     def addTour (self, tour: Tournament) -> None:
-        with self.dataLock:
-            if tour.name in self:
-                raise InputError(description=f"Tournament \"{tour.name}\" already exists!")
-            else:
-                self.tournamentLocks[tour.name] = Lock()
-                self.tournamentsJson[tour.name] = tour.toJson()
-            self.saveData()
-
-    def saveData (self) -> None:
-        with self.dataLock:
-            with open(self.savefile, "w") as f:
-                json.dump({
-                        "tournaments" : [self.tournamentsJson[i] for i in self.tournamentsJson]
-                    }, f)
-        
+        tourJson = tour.toJson()
+        self.lockReader()
+        try:
+            with self.getStripe(tour.name):
+                if tour.name not in self.tournamentLocks:
+                    self.tournamentLocks[tour.name] = Lock()
+                lock = self.tournamentLocks[tour.name]
+
+            # Held until it's queued for saving too, a writer that gets in as soon as it's committed saves after it
+            self.timedAcquire(lambda timeout: lock.acquire(timeout=timeout), "tournament", f"tournament \"{tour.name}\"")
+            try:
+                with self.getStripe(tour.name):
+                    if tour.name in self:
+                        raise InputError(description=f"Tournament \"{tour.name}\" already exists!")
+
+                    self.commit(tour.name, tourJson)
+
+                self.storage.save(tour.name, None, tourJson)
+            finally:
+                lock.release()
+        finally:
+            self.personalLock.unlockReader()
+
+        self.evict()
     
     def __setitem__ (self, key: str, item: Tournament) -> None:
-        with self.dataLock:
-            if key in self:
-                if not self.tournamentLocks[key].locked():
-                    raise RuntimeError("Reader incorrectly wrote / tried to write to data!")
-            
-                self.tournamentLocks[key].release()
-            else:
-                self.tournamentLocks[key] = Lock()
+        if key not in self:
+            self.addTour(item)
+            return
 
-            self.tournamentsJson[key] = item.toJson()
+        tourJson = item.toJson()
+        self.lockReader()
+        try:
+            self.lockTournament(key)
+        except:
+            self.personalLock.unlockReader()
+            raise
 
-            self.saveData()
-    
-    def closeWriter (self, key: str) -> None:
-        if self.tournamentLocks[key].locked():
-            self.tournamentLocks[key].release()
+        try:
+            with self.getStripe(key):
+                self.restore(key, self.loadResident(key))
+                oldJson = self.commit(key, tourJson)
+                self.live.pop(key, None)
+
+            self.storage.save(key, oldJson, tourJson)
+        finally:
+            self.unlockTournament(key)
+
+        self.evict()
     
     def clear (self):
-        self.personalLock.lockWriter()
-        with self.dataLock:
-            self.tournamentsJson.clear()
-            self.saveData()
-        
-        self.personalLock.unlockWriter()
+        self.timedAcquire(self.personalLock.lockWriter, "write", "tournament data")
+        try:
+            self.index.clear()
+            self.tournamentLocks.clear()
+            self.versions.clear()
+            self.views.clear()
+            self.live.clear()
+            self.lastUsed.clear()
+            for watcher in self.watchers.values():
+                with watcher:
+                    watcher.notify_all()
+            self.watchers.clear()
+            with self.residentLock:
+                self.resident.clear()
+                self.residentBytes = 0
+            self.storage.clear()
+            self.archive.clear()
+        finally:
+            self.personalLock.unlockWriter()
 
+    def archiveIdle (self, idleSeconds: float) -> Tuple[int, int, int]:
+        # Moves every tournament unchanged for idleSeconds into the archive, returns how many were moved, the bytes of
+        # active storage freed and the bytes of archive written. Tournaments from before changes were timestamped count
+        # as idle
+        cutoff = time.time() - idleSeconds
+        archived = 0
+        freed = 0
+        written = 0
 
+        self.lockReader()
+        try:
+            for name, metadata in list(self.index.items()):
+                if "archived" in metadata or (metadata.get("updated", None) or 0) >= cutoff:
+                    continue
+
+                with self.getStripe(name):
+                    if name not in self.tournamentLocks:
+                        self.tournamentLocks[name] = Lock()
+                    lock = self.tournamentLocks[name]
+
+                # Anything being written to right now obviously isn't idle
+                if not lock.acquire(blocking=False):
+                    continue
+
+                try:
+                    with self.getStripe(name):
+                        view = self.views.get(name, None)
+                        tourJson = view.json if view != None else self.storage.load(name)
+                        if tourJson == None:
+                            continue
+
+                        written += self.archive.add(name, tourJson)
+                        freed += self.storage.remove(name)
+                        self.index[name] = self.archive.index[name]
+                        self.dropResident(name)
+                        archived += 1
+                finally:
+                    lock.release()
+        finally:
+            self.archive.writeIndex()
+            self.personalLock.unlockReader()
+
+        return archived, freed, written
+
+    def getLockStats (self) -> Dict:
+        return self.lockStats.getJson()
+
+    def getMemoryStats (self) -> Dict:
+        with self.residentLock:
+            return {
+                "tournaments" : len(self.index),
+                "archived" : len(self.archive.index),
+                "resident" : len(self.resident),
+                "resident_bytes" : self.residentBytes,
+                "budget" : src.config.tournament_memory_budget,
+                "loads" : self.loads,
+                "evictions" : self.evictions
+            }
 
-        
 global tournament_data
-tournament_data = TournamentData("data/tournaments.json")
\ No newline at end of file
+tournament_data = TournamentData(makeStorage(src.config.tournament_storage), "data/tournaments.json", TournamentArchive(src.config.archive_dir))
\ No newline at end of file
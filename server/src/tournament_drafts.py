@@ -0,0 +1,136 @@
+import time
+import traceback
+from collections import deque
+from threading import Condition, Lock, Thread
+from typing import Deque, Dict, List, Set, Union
+
+import src.config
+from src.tournament import getScalings
+from src.tournament_data import TournamentData, tournament_data
+from src.usage_scraping import DEFAULT_CUTOFF, getTierWeights
+
+# How long a tournament waits before it's tried again after its draw failed
+RETRY_DELAY = 5
+
+class DraftGenerator:
+    # Draws pokemon for players left "generating" by a start, a late registration or a swap, so those requests return
+    # straight away. Each batch of players is drawn in its own writer context, other writes to the tournament get in
+    # between batches and readers see players move to choosing_pokemon as their batch is committed
+    def __init__ (self, data: TournamentData, workers: int, batchSize: int):
+        self.data = data
+        self.workers = workers
+        self.batchSize = batchSize
+
+        self.condition = Condition(Lock())
+        self.queue: Deque[str] = deque()
+        self.queued: Set[str] = set()
+        # Tournaments a worker has right now, only one worker draws for a tournament at a time
+        self.busy: Set[str] = set()
+        self.threads: List[Thread] = []
+
+        self.statsLock = Lock()
+        self.batches = 0
+        self.failures = 0
+        self.lastLatency: Union[float, None] = None
+        self.maxLatency = 0.0
+        self.lastError: Union[str, None] = None
+
+    def notify (self, name: str) -> None:
+        with self.condition:
+            if name not in self.queued:
+                self.queue.append(name)
+                self.queued.add(name)
+                self.condition.notify()
+
+    def take (self) -> str:
+        with self.condition:
+            while True:
+                for name in self.queue:
+                    if name not in self.busy:
+                        self.queue.remove(name)
+                        self.queued.discard(name)
+                        self.busy.add(name)
+                        return name
+
+                self.condition.wait()
+
+    def done (self, name: str) -> None:
+        with self.condition:
+            self.busy.discard(name)
+            self.condition.notify()
+
+    def generate (self, name: str) -> bool:
+        # One batch for the tournament, returns whether it has players left
+        start = time.monotonic()
+
+        # Getting a new month of usage data happens here rather than with the tournament locked
+        getTierWeights(getScalings(self.data.getView(name).json["settings"]), DEFAULT_CUTOFF)
+
+        with self.data.getTour(name, True) as tour:
+            remaining = tour.generatePending(self.batchSize)
+
+        latency = time.monotonic() - start
+        with self.statsLock:
+            self.batches += 1
+            self.lastLatency = latency
+            self.maxLatency = max(self.maxLatency, latency)
+
+        return remaining > 0
+
+    def run (self) -> None:
+        while True:
+            name = self.take()
+            retry = False
+            try:
+                more = self.generate(name)
+            except Exception:
+                if name not in self.data:
+                    # Gone, e.g. cleared
+                    more = False
+                else:
+                    with self.statsLock:
+                        self.failures += 1
+                        self.lastError = traceback.format_exc(limit=1)
+                    more = True
+                    retry = True
+
+            if retry:
+                time.sleep(RETRY_DELAY)
+
+            self.done(name)
+            if more:
+                self.notify(name)
+
+    def start (self) -> None:
+        if len(self.threads) > 0:
+            return
+
+        for i in range(self.workers):
+            thread = Thread(target=self.run, daemon=True, name=f"tournament-drafts-{i}")
+            thread.start()
+            self.threads.append(thread)
+
+        # Anything still generating when the server last stopped
+        for name, metadata in list(self.data.index.items()):
+            if metadata.get("generating", 0) > 0:
+                self.notify(name)
+
+    def stats (self) -> Dict:
+        with self.condition:
+            queued = len(self.queue)
+            busy = len(self.busy)
+
+        with self.statsLock:
+            return {
+                "workers" : len(self.threads),
+                "queued" : queued,
+                "busy" : busy,
+                "batches" : self.batches,
+                "failures" : self.failures,
+                "last_latency" : self.lastLatency,
+                "max_latency" : self.maxLatency,
+                "last_error" : self.lastError
+            }
+
+global draft_generator
+draft_generator = DraftGenerator(tournament_data, src.config.draft_workers, src.config.draft_batch_size)
@@ -1,13 +1,19 @@
 import json
-from typing import Dict, List
+import src.config
+from typing import Callable, Dict, List, Union
 from src.error import InputError
 from src.tournament_data import tournament_data
+from src.tournament_drafts import draft_generator
 
-from src.tournament import Tournament, Player, defaultSettings
+from src.tournament import Tournament, Player, defaultSettings, getScalings, publicJson
+from src.usage_scraping import DEFAULT_CUTOFF, TierWeights, getTierWeights
 
-def createTournament (name: str, settings: Dict):
+def createTournament (name: str, settings: Dict, seed: Union[int, None] = None):
     if name in tournament_data:
         raise InputError(description=f"Name \"{name}\" is already taken!")
+
+    if seed != None and not isinstance(seed, int):
+        raise InputError(description="Seed must be an integer!")
     
     tourSettings = defaultSettings.copy()
     if settings:
@@ -15,37 +21,114 @@ def createTournament (name: str, settings: Dict):
             if i in tourSettings:
                 tourSettings[i] = settings[i]
 
-    tour = Tournament(name, tourSettings)
+    tour = Tournament(name, tourSettings, seed)
 
     tournament_data.addTour(tour)
 
-    return tour.toJson()
+    return publicJson(tour.toJson())
 
 def clearTournaments ():
     tournament_data.clear()
 
-def getTournamentInfo (name: str) -> Dict:
-    return tournament_data[name].toJson()
+def getStorageStats () -> Dict:
+    stats = tournament_data.storage.stats()
+    stats["memory"] = tournament_data.getMemoryStats()
+
+    return stats
+
+def getLockStats () -> Dict:
+    return tournament_data.getLockStats()
+
+def getDraftStats () -> Dict:
+    return draft_generator.stats()
+
+def archiveTournaments (days: Union[float, None] = None) -> Dict:
+    # Done by the server itself, it's the only thing that can move tournaments without its index going stale
+    if days == None:
+        days = src.config.archive_idle_days
+
+    if isinstance(days, bool) or not isinstance(days, (int, float)) or days < 0:
+        raise InputError(description="Days must be a number of at least 0!")
+
+    archived, freed, written = tournament_data.archiveIdle(days * 24 * 60 * 60)
+
+    return {
+        "archived" : archived,
+        "freed" : freed,
+        "written" : written
+    }
+
+def getTournamentInfo (name: str, since: Union[int, None] = None) -> str:
+    view = tournament_data.getView(name)
+    if since != None:
+        return view.getChangesText(since)
+
+    return view.getText()
+
+def waitTournamentInfo (name: str, since: Union[int, None], timeout: Union[float, None]) -> str:
+    # Long polling version of getTournamentInfo, waits until there's something newer than since
+    timeout = min(max(timeout, 0), src.config.watch_timeout) if timeout != None else src.config.watch_timeout
+    if since == None:
+        return tournament_data.getView(name).getChangesText(0)
+
+    return tournament_data.waitForChange(name, lambda i: i.version != since, timeout).getChangesText(since)
+
+def getWeights (name: str) -> TierWeights:
+    # Got before the tournament is locked, so a new month of usage data is loaded without writers waiting on it
+    return getTierWeights(getScalings(tournament_data.getView(name).json["settings"]), DEFAULT_CUTOFF)
 
 def registerPlayer (tournament: str, playerId: str) -> Dict:
-    with tournament_data.getTour(tournament, True) as tour:
-        player = Player(playerId)
-        tour.addPlayer(player)
-        return player.toJson()
+    # Only late players need the weights. A start can get in before the lock is taken, it only happens once so this
+    # goes round at most twice
+    while True:
+        weights = getWeights(tournament) if tournament_data.getView(tournament).json["started"] else None
+        with tournament_data.getTour(tournament, True) as tour:
+            if tour.started and weights == None:
+                continue
 
+            player = Player(playerId)
+            tour.addPlayer(player, weights)
+            playerJson = player.toJson()
+            break
 
-def getPlayerInfo (tournament: str, playerId: str) -> Dict:
-    return tournament_data[tournament].getPlayer(playerId).toJson()
+    # Late players get their pokemon in the background like everyone else
+    if playerJson["status"] == "generating":
+        draft_generator.notify(tournament)
+
+    return playerJson
+
+
+def getPlayerInfo (tournament: str, playerId: str) -> str:
+    return tournament_data.getView(tournament).getPlayerText(playerId)
+
+def waitPlayerInfo (tournament: str, playerId: str, since: Union[int, None], timeout: Union[float, None]) -> str:
+    # Waits until the player has changed after version since, the player json comes back with the version to wait on
+    # next time
+    timeout = min(max(timeout, 0), src.config.watch_timeout) if timeout != None else src.config.watch_timeout
+    view = tournament_data.getView(tournament)
+    # Checked first so a wrong player id doesn't wait out the timeout
+    view.getPlayer(playerId)
+    if since != None:
+        view = tournament_data.waitForChange(tournament, lambda i: i.playerVersions.get(playerId, 0) > since or i.version < since, timeout)
+
+    return view.getPlayerVersionText(playerId)
 
 def startTournament (name: str) -> Dict:
+    weights = getWeights(name)
     with tournament_data.getTour(name, True) as tour:
-        tour.start()
-        return tour.toJson()
+        tour.start(weights)
+        tourJson = publicJson(tour.toJson())
+
+    draft_generator.notify(name)
+
+    return tourJson
 
 
 def choosePokemon (tournament: str, playerId: str, choices: List[str]) -> None:
     with tournament_data.getTour(tournament, True) as tour:
-        tour.getPlayer(playerId).choosePokemon(choices, tour.teamSize)
+        player = tour.getPlayer(playerId)
+        player.choosePokemon(choices, tour.teamSize)
+        tour.matchmake(player)
 
 
 def startBattle (tournament: str, player1: str, player2: str) -> None:
@@ -56,11 +139,59 @@ def battleResult (tournament: str, playerId: str, won: bool) -> None:
     with tournament_data.getTour(tournament, True) as tour:
         tour.getPlayer(playerId).completeBattle(won)
 
+def checkItem (item: Dict, fields: Dict[str, type]) -> None:
+    if not isinstance(item, dict):
+        raise InputError(description="Expected an object!")
+
+    for field, fieldType in fields.items():
+        if field not in item:
+            raise InputError(description=f"Missing \"{field}\"!")
+        if not isinstance(item[field], fieldType):
+            raise InputError(description=f"\"{field}\" must be a {fieldType.__name__}!")
+
+def applyBatch (items: List[Dict], fields: Dict[str, type], apply: Callable[[Dict], None], atomic: bool) -> List[Dict]:
+    # Run inside one writer context. Atomic batches fail as a whole, so nothing is saved, otherwise each item gets
+    # its own result and the ones that worked are saved together. Nothing is changed by an item before it's checked
+    if not isinstance(items, list):
+        raise InputError(description="Expected a list of items!")
+
+    results = []
+    for i, item in enumerate(items):
+        try:
+            checkItem(item, fields)
+            apply(item)
+        except InputError as e:
+            if atomic:
+                raise InputError(description=f"Item {i}: {e.description}")
+            results.append({"error" : e.description})
+        else:
+            results.append({})
+
+    return results
+
+def startBattles (tournament: str, battles: List[Dict], atomic: bool) -> List[Dict]:
+    with tournament_data.getTour(tournament, True) as tour:
+        return applyBatch(battles, {"player1_id" : str, "player2_id" : str}, lambda i: tour.startBattle(i["player1_id"], i["player2_id"]), atomic)
+
+def battleResults (tournament: str, results: List[Dict], atomic: bool) -> List[Dict]:
+    with tournament_data.getTour(tournament, True) as tour:
+        return applyBatch(results, {"player_id" : str, "result" : bool}, lambda i: tour.getPlayer(i["player_id"]).completeBattle(i["result"]), atomic)
+
 def stealPokemon (tournament: str, playerId: str, pokemon: List[str], swapped: List[str]) -> None:
     with tournament_data.getTour(tournament, True) as tour:
         player = tour.getPlayer(playerId)
         player.stealPokemon(tour.getPlayer(player.battling), pokemon, swapped, tour.stealSize)
+        tour.matchmake(player)
 
 def swapPokemon (tournament: str, playerId: str, kept: List[str]) -> None:
+    weights = getWeights(tournament)
     with tournament_data.getTour(tournament, True) as tour:
-        tour.getPlayer(playerId).swapPokemon(kept, tour)
\ No newline at end of file
+        player = tour.getPlayer(playerId)
+        player.swapPokemon(kept)
+        tour.matchmake(player)
+        generating = player.status == "generating"
+        if generating:
+            tour.checkPending(weights)
+
+    if generating:
+        draft_generator.notify(tournament)
\ No newline at end of file
@@ -0,0 +1,238 @@
+import json
+import os
+from threading import Event, Lock, Thread
+from typing import Dict, List, Union
+from urllib.parse import quote, unquote
+
+from src.tournament_storage import TournamentStorage, getDelta, getMetadata, isEmptyDelta
+
+# Each tournament is kept as a snapshot file plus an append-only log of the changes made since. Every save only appends
+# the fields and players that changed, a background compactor folds logs back into their snapshots.
+#
+#   index.json          name -> metadata for every tournament, so nothing has to be read until it's used
+#   tour-<name>.json    full tournament json as of the last compaction
+#   tour-<name>.log     one json record per line: {"fields" : {...}, "players" : [...]}
+INDEX = "index.json"
+
+def applyDelta (tourJson: Union[Dict, None], delta: Dict) -> Dict:
+    tourJson = dict(tourJson) if tourJson != None else {"players" : []}
+    tourJson.update(delta["fields"])
+
+    # Players are never removed, changed players replace their old entry and new players go on the end
+    players = list(tourJson["players"])
+    indices = dict((j["player_id"], i) for i, j in enumerate(players))
+    for i in delta["players"]:
+        if i["player_id"] in indices:
+            players[indices[i["player_id"]]] = i
+        else:
+            indices[i["player_id"]] = len(players)
+            players.append(i)
+    tourJson["players"] = players
+
+    return tourJson
+
+class TournamentJournal(TournamentStorage):
+    def __init__ (self, directory: str, compactInterval: float, compactBytes: int, fsync: bool = False):
+        self.directory = directory
+        self.fsync = fsync
+        self.compactInterval = compactInterval
+        self.compactBytes = compactBytes
+
+        # Per tournament, so appends to different tournaments never wait on each other
+        self.locksLock = Lock()
+        self.locks: Dict[str, Lock] = {}
+        # Tournaments with changes that haven't been compacted yet
+        self.current: Dict[str, Dict] = {}
+        self.logSizes: Dict[str, int] = {}
+        self.index: Dict[str, Dict] = {}
+        self.indexDirty = False
+
+        self.stopEvent = Event()
+        self.wakeEvent = Event()
+        self.compactor: Union[Thread, None] = None
+
+    def getFilename (self, name: str, extension: str) -> str:
+        return os.path.join(self.directory, f"tour-{quote(name, safe='')}.{extension}")
+
+    def getLock (self, name: str) -> Lock:
+        with self.locksLock:
+            if name not in self.locks:
+                self.locks[name] = Lock()
+            return self.locks[name]
+
+    def exists (self) -> bool:
+        return os.path.isdir(self.directory)
+
+    def readTour (self, name: str) -> Union[Dict, None]:
+        tourJson = None
+        try:
+            with open(self.getFilename(name, "json")) as f:
+                tourJson = json.load(f)
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(self.getFilename(name, "log")) as f:
+                for line in f:
+                    try:
+                        tourJson = applyDelta(tourJson, json.loads(line))
+                    except ValueError:
+                        # A torn write at the end of the log, everything before it is still good
+                        break
+        except FileNotFoundError:
+            pass
+
+        return tourJson
+
+    def writeIndex (self) -> None:
+        with self.locksLock:
+            if not self.indexDirty:
+                return
+            index = dict(self.index)
+            self.indexDirty = False
+
+        tmpName = os.path.join(self.directory, f"{INDEX}.tmp{os.getpid()}")
+        with open(tmpName, "w") as f:
+            json.dump(index, f)
+        os.replace(tmpName, os.path.join(self.directory, INDEX))
+
+    def loadIndex (self) -> Dict[str, Dict]:
+        os.makedirs(self.directory, exist_ok=True)
+
+        try:
+            with open(os.path.join(self.directory, INDEX)) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+
+        names = set()
+        logged = set()
+        for i in os.listdir(self.directory):
+            base, extension = os.path.splitext(i)
+            if base.startswith("tour-") and extension in (".json", ".log"):
+                names.add(unquote(base[len("tour-"):]))
+                if extension == ".log":
+                    logged.add(unquote(base[len("tour-"):]))
+
+        # The index is only written on compaction, so anything with a log (or missing from the index) is replayed and
+        # compacted now. Appending after a torn record would otherwise hide everything appended later
+        for name in names:
+            if name in logged or name not in index:
+                tourJson = self.readTour(name)
+                if tourJson != None:
+                    index[name] = getMetadata(tourJson)
+                    self.current[name] = tourJson
+                    self.compactTour(name)
+
+        with self.locksLock:
+            self.index = dict((k, v) for k, v in index.items() if k in names)
+            self.indexDirty = True
+        self.writeIndex()
+
+        return dict(self.index)
+
+    def load (self, name: str) -> Union[Dict, None]:
+        with self.getLock(name):
+            if name in self.current:
+                return self.current[name]
+
+            return self.readTour(name)
+
+    def save (self, name: str, old: Union[Dict, None], new: Dict) -> None:
+        delta = getDelta(old, new)
+        if old != None and isEmptyDelta(delta):
+            return
+
+        record = json.dumps(delta, separators=(",", ":")) + "\n"
+        with self.getLock(name):
+            with open(self.getFilename(name, "log"), "a") as f:
+                f.write(record)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            self.current[name] = new
+            self.logSizes[name] = self.logSizes.get(name, 0) + len(record)
+
+            if self.logSizes[name] >= self.compactBytes:
+                self.wakeEvent.set()
+
+        with self.locksLock:
+            self.index[name] = getMetadata(new)
+            self.indexDirty = True
+
+    def compactTour (self, name: str) -> None:
+        with self.getLock(name):
+            if name not in self.current:
+                return
+
+            tmpName = self.getFilename(name, f"json.tmp{os.getpid()}")
+            with open(tmpName, "w") as f:
+                json.dump(self.current[name], f)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmpName, self.getFilename(name, "json"))
+
+            try:
+                os.remove(self.getFilename(name, "log"))
+            except FileNotFoundError:
+                pass
+
+            # Only tournaments with a log are kept, everything else is read back from its snapshot
+            del self.current[name]
+            self.logSizes[name] = 0
+
+    def compact (self) -> None:
+        for name in [i for i, size in list(self.logSizes.items()) if size > 0]:
+            self.compactTour(name)
+
+        self.writeIndex()
+
+    def flush (self) -> None:
+        self.compact()
+
+    def runCompactor (self) -> None:
+        while not self.stopEvent.is_set():
+            self.wakeEvent.wait(self.compactInterval)
+            self.wakeEvent.clear()
+            self.compact()
+
+    def start (self) -> None:
+        if self.compactor == None:
+            self.compactor = Thread(target=self.runCompactor, daemon=True, name="journal-compactor")
+            self.compactor.start()
+
+    def removeFiles (self, name: str) -> int:
+        freed = 0
+        with self.getLock(name):
+            for extension in ("json", "log"):
+                try:
+                    freed += os.path.getsize(self.getFilename(name, extension))
+                    os.remove(self.getFilename(name, extension))
+                except FileNotFoundError:
+                    pass
+
+            self.current.pop(name, None)
+            self.logSizes.pop(name, None)
+
+        return freed
+
+    def remove (self, name: str) -> int:
+        freed = self.removeFiles(name)
+        with self.locksLock:
+            self.index.pop(name, None)
+            self.indexDirty = True
+
+        return freed
+
+    def clear (self) -> None:
+        with self.locksLock:
+            names = set(self.index) | set(self.current)
+            self.index = {}
+            self.indexDirty = True
+
+        for name in names:
+            self.removeFiles(name)
+
+        self.writeIndex()
@@ -0,0 +1,197 @@
+import atexit
+import time
+import traceback
+from threading import Condition, Event, Lock, Thread
+from typing import Dict, List, Tuple, Union
+
+from src.error import UnavailableError
+from src.tournament_storage import TournamentStorage
+
+class WriteBehindStorage(TournamentStorage):
+    # Saves are queued and written by one background thread. Repeated saves of the same tournament are coalesced, only
+    # the json from before the first queued save and after the last one are handed to the real storage
+    def __init__ (self, storage: TournamentStorage, interval: float, maxPending: int, waitDurable: bool, timeout: float):
+        self.storage = storage
+        self.interval = interval
+        self.maxPending = maxPending
+        self.waitDurable = waitDurable
+        # Saves are waited on with the tournament locked, so a stuck storage can't hold them forever
+        self.timeout = timeout
+
+        self.lock = Lock()
+        self.durable = Condition(self.lock)
+        # Tournament name -> (json before the first queued save, json after the last one)
+        self.pending: Dict[str, Tuple[Union[Dict, None], Dict]] = {}
+        self.pendingChanges = 0
+        # The batch being written right now, still read back from here until the storage has it
+        self.inflight: Dict[str, Tuple[Union[Dict, None], Dict]] = {}
+        self.queued = 0
+        self.flushed = 0
+
+        # Only one flush at a time, so a tournament's saves reach the storage in order
+        self.flushLock = Lock()
+        self.wakeEvent = Event()
+        self.thread: Union[Thread, None] = None
+
+        self.statsLock = Lock()
+        self.flushes = 0
+        self.flushedChanges = 0
+        self.lastLatency: Union[float, None] = None
+        self.maxLatency = 0.0
+        self.totalLatency = 0.0
+        self.maxDepth = 0
+        self.lastError: Union[str, None] = None
+
+    def exists (self) -> bool:
+        return self.storage.exists()
+
+    def loadIndex (self) -> Dict[str, Dict]:
+        return self.storage.loadIndex()
+
+    def load (self, name: str) -> Union[Dict, None]:
+        with self.lock:
+            if name in self.pending:
+                return self.pending[name][1]
+            if name in self.inflight:
+                return self.inflight[name][1]
+
+        return self.storage.load(name)
+
+    def loadAll (self) -> List[Dict]:
+        return self.storage.loadAll()
+
+    def save (self, name: str, old: Union[Dict, None], new: Dict) -> None:
+        with self.lock:
+            if name in self.pending:
+                old = self.pending[name][0]
+            self.pending[name] = (old, new)
+            self.pendingChanges += 1
+            self.queued += 1
+            sequence = self.queued
+
+            with self.statsLock:
+                self.maxDepth = max(self.maxDepth, self.pendingChanges)
+
+            if self.pendingChanges >= self.maxPending:
+                self.wakeEvent.set()
+
+        if self.waitDurable or self.thread == None:
+            self.waitFor(sequence)
+
+    def waitFor (self, sequence: int) -> None:
+        if self.thread == None:
+            # Nothing in the background yet (still loading), write it now
+            self.flushPending()
+            return
+
+        self.wakeEvent.set()
+        with self.durable:
+            if not self.durable.wait_for(lambda: self.flushed >= sequence, self.timeout):
+                raise UnavailableError(description="Timed out waiting for the tournament to be saved, the change is still queued!")
+
+    def flushPending (self) -> None:
+        with self.flushLock:
+            with self.lock:
+                batch = self.pending
+                changes = self.pendingChanges
+                sequence = self.queued
+                self.pending = {}
+                self.pendingChanges = 0
+                self.inflight = batch
+
+            if len(batch) == 0:
+                return
+
+            start = time.monotonic()
+            try:
+                for name, (old, new) in batch.items():
+                    self.storage.save(name, old, new)
+            except Exception:
+                # Put the batch back in front of anything queued since, it's tried again next interval
+                with self.lock:
+                    for name, (old, new) in batch.items():
+                        if name in self.pending:
+                            new = self.pending[name][1]
+                        self.pending[name] = (old, new)
+                    self.pendingChanges += changes
+                    self.inflight = {}
+
+                with self.statsLock:
+                    self.lastError = traceback.format_exc(limit=1)
+                raise
+
+            latency = time.monotonic() - start
+
+            with self.durable:
+                self.inflight = {}
+                self.flushed = max(self.flushed, sequence)
+                self.durable.notify_all()
+
+            with self.statsLock:
+                self.flushes += 1
+                self.flushedChanges += changes
+                self.lastLatency = latency
+                self.maxLatency = max(self.maxLatency, latency)
+                self.totalLatency += latency
+                self.lastError = None
+
+    def remove (self, name: str) -> int:
+        # Anything still queued for it is written first so it can't land after the removal
+        self.flushPending()
+        with self.flushLock:
+            return self.storage.remove(name)
+
+    def flush (self) -> None:
+        self.flushPending()
+        self.storage.flush()
+
+    def run (self) -> None:
+        while True:
+            self.wakeEvent.wait(self.interval)
+            self.wakeEvent.clear()
+
+            try:
+                self.flushPending()
+            except Exception:
+                pass
+
+    def start (self) -> None:
+        self.storage.start()
+
+        if self.thread == None:
+            self.thread = Thread(target=self.run, daemon=True, name="tournament-persist")
+            self.thread.start()
+            atexit.register(self.flush)
+
+    def clear (self) -> None:
+        with self.flushLock:
+            with self.lock:
+                self.pending = {}
+                self.pendingChanges = 0
+
+            with self.durable:
+                # Anything waiting on a save that was just dropped can stop
+                self.flushed = self.queued
+                self.durable.notify_all()
+
+            self.storage.clear()
+
+    def stats (self) -> Dict:
+        with self.lock:
+            depth = {
+                "tournaments" : len(self.pending),
+                "changes" : self.pendingChanges
+            }
+
+        with self.statsLock:
+            return {
+                "queue" : depth,
+                "max_queue" : self.maxDepth,
+                "flushes" : self.flushes,
+                "flushed_changes" : self.flushedChanges,
+                "last_latency" : self.lastLatency,
+                "max_latency" : self.maxLatency,
+                "average_latency" : self.totalLatency / self.flushes if self.flushes > 0 else None,
+                "wait_durable" : self.waitDurable,
+                "last_error" : self.lastError
+            }
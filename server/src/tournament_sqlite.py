@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import sqlite3
+from threading import Lock
+from typing import Dict, List, Union
+
+import src.config
+from src.tournament_journal import TournamentJournal
+from src.tournament_storage import TournamentStorage, getDelta, importTournaments, isEmptyDelta, loadLegacy
+
+# Tournaments, players and the pokemon in each player's team / generated slots are separate rows, so a change to one
+# player only touches that player's rows. Fields without a column of their own are kept as json in "extra".
+#
+#   python -m src.tournament_sqlite --source data/tournaments.json --db data/tournaments.db
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tournaments (
+    name TEXT PRIMARY KEY,
+    started INTEGER NOT NULL,
+    settings TEXT NOT NULL,
+    used_pokemon TEXT NOT NULL,
+    extra TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    tournament TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    battling TEXT,
+    extra TEXT NOT NULL,
+    PRIMARY KEY (tournament, player_id)
+);
+CREATE TABLE IF NOT EXISTS slots (
+    tournament TEXT NOT NULL,
+    player_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    pokemon TEXT NOT NULL,
+    PRIMARY KEY (tournament, player_id, kind, position)
+);
+"""
+
+TOURNAMENT_COLUMNS = ("name", "players", "started", "used_pokemon", "settings")
+PLAYER_COLUMNS = ("player_id", "team", "generated", "status", "battling")
+SLOT_KINDS = ("team", "generated")
+
+def dumps (value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+def getExtra (data: Dict, columns) -> str:
+    return dumps(dict((k, v) for k, v in data.items() if k not in columns))
+
+class SqliteStorage(TournamentStorage):
+    def __init__ (self, filename: str, fsync: bool = False):
+        self.filename = filename
+        self.fsync = fsync
+        self.connection: Union[sqlite3.Connection, None] = None
+        # One connection shared by every request thread, sqlite only has one writer at a time anyway
+        self.lock = Lock()
+
+    def connect (self) -> sqlite3.Connection:
+        if self.connection == None:
+            directory = os.path.dirname(self.filename)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+
+            self.connection = sqlite3.connect(self.filename, check_same_thread=False, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # NORMAL only syncs at checkpoints in WAL mode, FULL syncs every commit
+            self.connection.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            self.connection.executescript(SCHEMA)
+
+        return self.connection
+
+    def exists (self) -> bool:
+        return os.path.exists(self.filename)
+
+    def readTournaments (self, name: Union[str, None] = None) -> List[Dict]:
+        # Every tournament, or just the one given
+        params = (name,) if name != None else ()
+        with self.lock:
+            connection = self.connect()
+
+            tournaments: Dict[str, Dict] = {}
+            for tourName, started, settings, usedPokemon, extra in connection.execute(
+                    f"SELECT name, started, settings, used_pokemon, extra FROM tournaments {'WHERE name = ?' if name != None else ''} ORDER BY rowid", params):
+                tournaments[tourName] = {
+                    "name" : tourName,
+                    "players" : [],
+                    "started" : bool(started),
+                    "used_pokemon" : json.loads(usedPokemon),
+                    "settings" : json.loads(settings),
+                    **json.loads(extra)
+                }
+
+            players: Dict[tuple, Dict] = {}
+            for tournament, playerId, status, battling, extra in connection.execute(
+                    f"SELECT tournament, player_id, status, battling, extra FROM players {'WHERE tournament = ?' if name != None else ''} ORDER BY tournament, position", params):
+                player = {
+                    "player_id" : playerId,
+                    "team" : [],
+                    "generated" : [],
+                    "status" : status
+                }
+                if battling != None:
+                    player["battling"] = battling
+                player.update(json.loads(extra))
+
+                players[(tournament, playerId)] = player
+                tournaments[tournament]["players"].append(player)
+
+            for tournament, playerId, kind, pokemon in connection.execute(
+                    f"SELECT tournament, player_id, kind, pokemon FROM slots {'WHERE tournament = ?' if name != None else ''} ORDER BY tournament, player_id, kind, position", params):
+                players[(tournament, playerId)][kind].append(json.loads(pokemon))
+
+        return list(tournaments.values())
+
+    def loadAll (self) -> List[Dict]:
+        return self.readTournaments()
+
+    def loadIndex (self) -> Dict[str, Dict]:
+        with self.lock:
+            rows = self.connect().execute(
+                    "SELECT name, started, extra, (SELECT COUNT(*) FROM players WHERE tournament = name) FROM tournaments ORDER BY rowid").fetchall()
+
+        index: Dict[str, Dict] = {}
+        for name, started, extra, players in rows:
+            extra = json.loads(extra)
+            index[name] = {
+                "started" : bool(started),
+                "players" : players,
+                "generating" : extra.get("generating", 0),
+                "updated" : extra.get("updated", None)
+            }
+
+        return index
+
+    def load (self, name: str) -> Union[Dict, None]:
+        tournaments = self.readTournaments(name)
+        return tournaments[0] if len(tournaments) > 0 else None
+
+    def writeTournament (self, connection: sqlite3.Connection, tourJson: Dict) -> None:
+        connection.execute("INSERT OR REPLACE INTO tournaments (name, started, settings, used_pokemon, extra) VALUES (?, ?, ?, ?, ?)",
+                (tourJson["name"], int(tourJson["started"]), dumps(tourJson["settings"]), dumps(tourJson["used_pokemon"]),
+                getExtra(tourJson, TOURNAMENT_COLUMNS)))
+
+    def writePlayer (self, connection: sqlite3.Connection, name: str, position: int, player: Dict, old: Union[Dict, None]) -> None:
+        playerId = player["player_id"]
+        connection.execute("INSERT OR REPLACE INTO players (tournament, player_id, position, status, battling, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, playerId, position, player["status"], player.get("battling", None), getExtra(player, PLAYER_COLUMNS)))
+
+        # Slots are only rewritten for the lists that changed, most updates are just a status change
+        for kind in SLOT_KINDS:
+            if old != None and old[kind] == player[kind]:
+                continue
+
+            connection.execute("DELETE FROM slots WHERE tournament = ? AND player_id = ? AND kind = ?", (name, playerId, kind))
+            connection.executemany("INSERT INTO slots (tournament, player_id, kind, position, pokemon) VALUES (?, ?, ?, ?, ?)",
+                    [(name, playerId, kind, i, dumps(j)) for i, j in enumerate(player[kind])])
+
+    def save (self, name: str, old: Union[Dict, None], new: Dict) -> None:
+        delta = getDelta(old, new)
+        if old != None and isEmptyDelta(delta):
+            return
+
+        oldPlayers = dict((i["player_id"], i) for i in old["players"]) if old != None else {}
+        changed = set(i["player_id"] for i in delta["players"])
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if old == None:
+                    # Anything left under this name is from an earlier import
+                    connection.execute("DELETE FROM slots WHERE tournament = ?", (name,))
+                    connection.execute("DELETE FROM players WHERE tournament = ?", (name,))
+
+                if len(delta["fields"]) > 0:
+                    self.writeTournament(connection, new)
+
+                for position, player in enumerate(new["players"]):
+                    if player["player_id"] in changed:
+                        self.writePlayer(connection, name, position, player, oldPlayers.get(player["player_id"], None))
+            except:
+                connection.execute("ROLLBACK")
+                raise
+
+            connection.execute("COMMIT")
+
+    def remove (self, name: str) -> int:
+        with self.lock:
+            connection = self.connect()
+            freed = connection.execute("SELECT COALESCE(SUM(LENGTH(pokemon)), 0) FROM slots WHERE tournament = ?", (name,)).fetchone()[0]
+
+            connection.execute("BEGIN IMMEDIATE")
+            for table, column in (("slots", "tournament"), ("players", "tournament"), ("tournaments", "name")):
+                connection.execute(f"DELETE FROM {table} WHERE {column} = ?", (name,))
+            connection.execute("COMMIT")
+
+        return freed
+
+    def clear (self) -> None:
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+            for table in ("slots", "players", "tournaments"):
+                connection.execute(f"DELETE FROM {table}")
+            connection.execute("COMMIT")
+
+def main () -> None:
+    # Imports tournaments into a sqlite database, either from the old tournaments.json or from a journal directory
+    parser = argparse.ArgumentParser(description="Imports battle factory tournaments into a sqlite database")
+    parser.add_argument("--source", default="data/tournaments.json", help="tournaments.json file or journal directory to import")
+    parser.add_argument("--db", default=src.config.tournament_db, help="sqlite database to write to")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        tournamentJson = TournamentJournal(args.source, src.config.journal_compact_interval, src.config.journal_compact_bytes).loadAll()
+    else:
+        tournamentJson = loadLegacy(args.source)
+
+    storage = SqliteStorage(args.db)
+    importTournaments(storage, tournamentJson)
+
+    print(f"Imported {len(tournamentJson)} tournaments from \"{args.source}\" into \"{args.db}\"")
+
+if __name__ == "__main__":
+    main()
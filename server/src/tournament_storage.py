@@ -0,0 +1,84 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Dict, List, Union
+
+from src.tournament import newSeed
+
+# Where tournaments are kept between restarts. TournamentData holds the live json and hands every change to its storage
+# with the json from before the change, so a backend can write only the parts that are different.
+
+def getDelta (old: Union[Dict, None], new: Dict) -> Dict:
+    if old == None:
+        return {"fields" : dict((k, v) for k, v in new.items() if k != "players"), "players" : new["players"]}
+
+    oldPlayers = dict((i["player_id"], i) for i in old["players"])
+
+    return {
+        "fields" : dict((k, v) for k, v in new.items() if k != "players" and old.get(k, None) != v),
+        # Unchanged players are usually the same dict as before, so most don't need comparing
+        "players" : [i for i in new["players"] if oldPlayers.get(i["player_id"], None) is not i and oldPlayers.get(i["player_id"], None) != i]
+    }
+
+def isEmptyDelta (delta: Dict) -> bool:
+    return len(delta["fields"]) == 0 and len(delta["players"]) == 0
+
+def getMetadata (tourJson: Dict) -> Dict:
+    return {
+        "started" : tourJson["started"],
+        "players" : len(tourJson["players"]),
+        "generating" : tourJson.get("generating", 0),
+        "updated" : tourJson.get("updated", None)
+    }
+
+class TournamentStorage(ABC):
+    @abstractmethod
+    def exists (self) -> bool:
+        # False if nothing has been stored yet, so old data can be imported
+        pass
+
+    @abstractmethod
+    def loadIndex (self) -> Dict[str, Dict]:
+        # Name -> metadata for every stored tournament, without loading any of them
+        pass
+
+    @abstractmethod
+    def load (self, name: str) -> Union[Dict, None]:
+        pass
+
+    def loadAll (self) -> List[Dict]:
+        return [i for i in (self.load(name) for name in self.loadIndex()) if i != None]
+
+    @abstractmethod
+    def save (self, name: str, old: Union[Dict, None], new: Dict) -> None:
+        pass
+
+    @abstractmethod
+    def remove (self, name: str) -> int:
+        # Returns roughly how many bytes were freed
+        pass
+
+    def flush (self) -> None:
+        pass
+
+    def start (self) -> None:
+        # Starts any background work, called once everything is loaded
+        pass
+
+    @abstractmethod
+    def clear (self) -> None:
+        pass
+
+def loadLegacy (savefile: str) -> List[Dict]:
+    # Data from before pluggable storage was one file with every tournament in it
+    try:
+        with open(savefile) as f:
+            return json.load(f)["tournaments"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return []
+
+def importTournaments (storage: TournamentStorage, tournamentJson: List[Dict]) -> None:
+    storage.loadAll()
+    for i in tournamentJson:
+        # Seeds are picked once here rather than every time the tournament is loaded
+        storage.save(i["name"], None, i if "seed" in i else dict(i, seed=newSeed()))
+    storage.flush()
@@ -0,0 +1,133 @@
+from datetime import date
+from threading import Lock
+from typing import Callable, Dict, List, Mapping, Tuple, Union
+
+from src.error import UnavailableError
+from src.pokemon import PokemonSpecies
+
+SpeciesDict = Mapping[str, PokemonSpecies]
+
+class UsageSnapshot:
+    # Immutable view of every tier loaded for a single month, replaced as a whole when anything changes
+    def __init__ (self, month: Union[date, None], tiers: Dict[str, SpeciesDict]):
+        self.month = month
+        self.tiers = tiers
+
+    def get (self, tier: str, month: date) -> Union[SpeciesDict, None]:
+        if self.month != month:
+            return None
+
+        return self.tiers.get(tier, None)
+
+class UsageCache:
+    def __init__ (self):
+        self.snapshot = UsageSnapshot(None, {})
+        # Set while something in the background keeps the snapshot up to date, requests then keep using the snapshot's
+        # month after a rollover instead of loading the new one themselves
+        self.serveStale = False
+        # Set along with it, tiers requests ask for that aren't in the snapshot are handed to this to load rather than
+        # being loaded on the request path. It raises for tiers it knows don't exist
+        self.requestLoad: Union[Callable[[List[str]], None], None] = None
+        self.swapLock = Lock()
+        self.keyLocksLock = Lock()
+        self.keyLocks: Dict[Tuple[str, date], Lock] = {}
+
+        self.statsLock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def servingMonth (self, month: date) -> date:
+        snapshot = self.snapshot
+        if self.serveStale and snapshot.month != None:
+            return snapshot.month
+
+        return month
+
+    def get (self, tier: str, month: date, loader: Callable[[str, date], SpeciesDict]) -> SpeciesDict:
+        return self.getMany([tier], month, lambda tiers, m: {tier : loader(tier, m)})[tier]
+
+    def getMany (self, tiers: List[str], month: date, loader: Callable[[List[str], date], Dict[str, SpeciesDict]]) -> Dict[str, SpeciesDict]:
+        snapshot = self.snapshot
+        speciesDicts = dict((i, snapshot.get(i, month)) for i in tiers)
+        missing = [i for i in tiers if speciesDicts[i] == None]
+
+        self.count(hits=len(tiers) - len(missing), misses=len(missing))
+        if len(missing) == 0:
+            return speciesDicts
+
+        if self.requestLoad != None:
+            self.requestLoad(missing)
+            raise UnavailableError(description=f"Usage data for {', '.join(missing)} is still loading, try again!")
+
+        # Only one thread loads a given (tier, month), everyone else waits for it and then reads the snapshot.
+        # Locks are always taken in sorted order so threads loading overlapping tiers can't deadlock
+        keyLocks = [self.getKeyLock(i, month) for i in sorted(set(missing))]
+        for i in keyLocks:
+            i.acquire()
+
+        try:
+            snapshot = self.snapshot
+            for i in missing:
+                speciesDicts[i] = snapshot.get(i, month)
+            missing = [i for i in missing if speciesDicts[i] == None]
+
+            if len(missing) > 0:
+                loaded = loader(missing, month)
+                self.count(loads=len(loaded))
+                self.publish(month, loaded)
+                speciesDicts.update(loaded)
+        finally:
+            for i in keyLocks:
+                i.release()
+
+        return speciesDicts
+
+    def getKeyLock (self, tier: str, month: date) -> Lock:
+        with self.keyLocksLock:
+            if (tier, month) not in self.keyLocks:
+                self.keyLocks[(tier, month)] = Lock()
+            return self.keyLocks[(tier, month)]
+
+    def publish (self, month: date, tiers: Dict[str, SpeciesDict]) -> None:
+        with self.swapLock:
+            current = self.snapshot
+            if current.month == month:
+                newTiers = current.tiers.copy()
+                newTiers.update(tiers)
+                self.snapshot = UsageSnapshot(month, newTiers)
+            elif current.month == None or month > current.month:
+                # Month rolled over, drop everything from the old month
+                self.snapshot = UsageSnapshot(month, tiers.copy())
+                self.count(evictions=len(current.tiers))
+                with self.keyLocksLock:
+                    self.keyLocks = dict((k, v) for k, v in self.keyLocks.items() if k[1] >= month)
+            # Data for an older month than the current snapshot is returned to the caller but never published
+
+    def clear (self) -> None:
+        with self.swapLock:
+            self.count(evictions=len(self.snapshot.tiers))
+            self.snapshot = UsageSnapshot(None, {})
+
+    def count (self, hits: int = 0, misses: int = 0, loads: int = 0, evictions: int = 0) -> None:
+        with self.statsLock:
+            self.hits += hits
+            self.misses += misses
+            self.loads += loads
+            self.evictions += evictions
+
+    def stats (self) -> Dict:
+        snapshot = self.snapshot
+        with self.statsLock:
+            return {
+                "month" : f"{snapshot.month.year}.{snapshot.month.month}" if snapshot.month != None else None,
+                "tiers" : sorted(snapshot.tiers.keys()),
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "loads" : self.loads,
+                "evictions" : self.evictions
+            }
+
+global usage_cache
+usage_cache = UsageCache()
@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from threading import Lock, local
+from typing import Callable, Dict, Iterable, List, Tuple, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import src.config
+
+T = TypeVar("T")
+
+class MissingMonthError(Exception):
+    pass
+
+class UsageFetcher:
+    def __init__ (self, baseUrl: str, workers: int, missingTtl: float):
+        self.baseUrl = baseUrl
+        self.workers = workers
+        self.missingTtl = missingTtl
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="usage-fetch")
+        self.sessions = local()
+
+        self.missingLock = Lock()
+        self.missing: Dict[Tuple[str, date], float] = {}
+
+    def getSession (self) -> requests.Session:
+        # Each worker thread keeps its own keep-alive session
+        session = getattr(self.sessions, "session", None)
+        if session == None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self.sessions.session = session
+
+        return session
+
+    def monthUrl (self, month: date) -> str:
+        return f"{self.baseUrl}/{month.year}-{month.month:02}"
+
+    def isMissing (self, tier: str, month: date) -> bool:
+        with self.missingLock:
+            missingTime = self.missing.get((tier, month), None)
+            if missingTime != None and time.monotonic() - missingTime > self.missingTtl:
+                del self.missing[(tier, month)]
+                missingTime = None
+
+        return missingTime != None
+
+    def markMissing (self, tier: str, month: date) -> None:
+        with self.missingLock:
+            self.missing[(tier, month)] = time.monotonic()
+
+    def fetchUsage (self, tier: str, month: date) -> str:
+        response = self.getSession().get(f"{self.monthUrl(month)}/{tier}-1500.txt")
+        if response.status_code != 200:
+            raise MissingMonthError(response.status_code)
+
+        return response.text
+
+    def fetchSets (self, tier: str, month: date, parseSets: Callable[[Iterable[str]], T]) -> T:
+        with self.getSession().get(f"{self.monthUrl(month)}/moveset/{tier}-1500.txt", stream=True) as response:
+            if response.status_code != 200:
+                raise MissingMonthError(response.status_code)
+
+            response.encoding = response.encoding or "utf-8"
+            return parseSets(response.iter_lines(decode_unicode=True))
+
+    def fetchMonth (self, tiers: List[str], month: date, parseSets: Callable[[Iterable[str]], T]) -> Dict[str, Tuple[str, T]]:
+        # Fetches the usage and moveset files for every tier at once, tiers that are not on smogon for this month are left out
+        futures: Dict[str, Tuple[Future, Future]] = {}
+        for i in tiers:
+            if self.isMissing(i, month):
+                continue
+
+            print(f"Scraping data from smogon for {i} from {month.year}/{month.month}!")
+            futures[i] = (self.executor.submit(self.fetchUsage, i, month), self.executor.submit(self.fetchSets, i, month, parseSets))
+
+        results: Dict[str, Tuple[str, T]] = {}
+        for i in futures:
+            try:
+                results[i] = (futures[i][0].result(), futures[i][1].result())
+            except MissingMonthError as e:
+                if e.args[0] == 404:
+                    self.markMissing(i, month)
+
+        return results
+
+global usage_fetcher
+usage_fetcher = UsageFetcher(src.config.smogon_url, src.config.fetch_workers, src.config.missing_month_ttl)
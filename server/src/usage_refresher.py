@@ -0,0 +1,149 @@
+import time
+import traceback
+from datetime import date, datetime
+from threading import Event, Lock, Thread
+from typing import Dict, List, Set, Union
+
+import src.config
+from src.error import InputError
+from src.tournament import defaultSettings, getScalings
+from src.usage_cache import usage_cache
+from src.usage_scraping import DEFAULT_CUTOFF, getTierWeights, scrapeTiers, usageMonth
+
+class UsageRefresher:
+    # Keeps the usage cache on the newest smogon month from a background thread. New data is published with a single
+    # snapshot swap, generations that already have the old snapshot finish on it
+    def __init__ (self, tiers: List[str], scalings: List[Dict[str, float]], interval: float):
+        self.tiers = tiers
+        self.scalings = scalings
+        self.interval = interval
+        self.thread: Union[Thread, None] = None
+        self.stopEvent = Event()
+        self.refreshEvent = Event()
+
+        self.statsLock = Lock()
+        self.refreshed = False
+        self.lastCheck: Union[datetime, None] = None
+        self.lastRefresh: Union[datetime, None] = None
+        self.lastDuration: Union[float, None] = None
+        self.lastError: Union[str, None] = None
+        self.sourceMonths: Dict[str, date] = {}
+        # Tiers requests asked for that are waiting to be loaded, and ones smogon turned out not to have
+        self.requested: Set[str] = set()
+        self.unknown: Set[str] = set()
+
+    def start (self) -> None:
+        if self.thread != None:
+            return
+
+        usage_cache.serveStale = True
+        usage_cache.requestLoad = self.request
+        self.thread = Thread(target=self.run, daemon=True, name="usage-refresher")
+        self.thread.start()
+
+    def stop (self) -> None:
+        self.stopEvent.set()
+        self.refreshEvent.set()
+
+    def requestRefresh (self) -> None:
+        self.refreshEvent.set()
+
+    def request (self, tiers: List[str]) -> None:
+        # Called by requests for tiers that aren't in the snapshot
+        with self.statsLock:
+            unknown = [i for i in tiers if i in self.unknown]
+            if len(unknown) > 0:
+                raise InputError(description=f"Could not find tier \"{unknown[0]}\"!")
+
+            new = [i for i in tiers if i not in self.requested and i not in self.unknown]
+            self.requested.update(new)
+
+        if len(new) > 0:
+            self.refreshEvent.set()
+
+    def run (self) -> None:
+        while not self.stopEvent.is_set():
+            try:
+                self.refresh()
+                self.loadRequested()
+            except Exception:
+                with self.statsLock:
+                    self.lastError = traceback.format_exc(limit=1)
+
+            self.refreshEvent.wait(self.interval)
+            self.refreshEvent.clear()
+
+    def isCurrent (self, month: date) -> bool:
+        snapshot = usage_cache.snapshot
+        with self.statsLock:
+            # Tiers that fell back to an older month are fetched again until smogon has the real one, tiers that came
+            # from somewhere else (a data pack, a request) are trusted
+            return snapshot.month == month and all(i in snapshot.tiers and self.sourceMonths.get(i, month) == month for i in self.tiers)
+
+    def warm (self) -> None:
+        for i in self.scalings:
+            getTierWeights(i, DEFAULT_CUTOFF)
+
+    def refresh (self) -> None:
+        month = usageMonth()
+        with self.statsLock:
+            self.lastCheck = datetime.now()
+
+        if self.isCurrent(month):
+            if not self.refreshed:
+                self.warm()
+                with self.statsLock:
+                    self.refreshed = True
+            return
+
+        start = time.monotonic()
+
+        # Anything requests have pulled into the snapshot is carried over to the new month too
+        tiers = sorted(set(self.tiers) | set(usage_cache.snapshot.tiers))
+        sourceMonths: Dict[str, date] = {}
+        speciesDicts = scrapeTiers(tiers, month, sourceMonths)
+
+        usage_cache.publish(month, speciesDicts)
+        self.warm()
+
+        with self.statsLock:
+            self.refreshed = True
+            self.sourceMonths = sourceMonths
+            self.lastRefresh = datetime.now()
+            self.lastDuration = time.monotonic() - start
+            self.lastError = None
+
+    def loadRequested (self) -> None:
+        # Each on its own, so a tier smogon doesn't have doesn't hold up the rest. Once loaded they're carried over to
+        # new months with everything else in the snapshot
+        month = usage_cache.snapshot.month or usageMonth()
+        with self.statsLock:
+            tiers = sorted(self.requested)
+
+        for tier in tiers:
+            try:
+                if tier not in usage_cache.snapshot.tiers:
+                    usage_cache.publish(month, scrapeTiers([tier], month))
+            except InputError:
+                with self.statsLock:
+                    self.unknown.add(tier)
+            finally:
+                with self.statsLock:
+                    self.requested.discard(tier)
+
+    def stats (self) -> Dict:
+        with self.statsLock:
+            return {
+                "running" : self.thread != None and self.thread.is_alive(),
+                "refreshed" : self.refreshed,
+                "last_check" : self.lastCheck.isoformat(timespec="seconds") if self.lastCheck != None else None,
+                "last_refresh" : self.lastRefresh.isoformat(timespec="seconds") if self.lastRefresh != None else None,
+                "last_duration" : self.lastDuration,
+                "last_error" : self.lastError,
+                "requested" : sorted(self.requested),
+                "unknown" : sorted(self.unknown),
+                "source_months" : dict((i, f"{m.year}.{m.month}") for i, m in self.sourceMonths.items())
+            }
+
+global usage_refresher
+usage_refresher = UsageRefresher(list(getScalings(defaultSettings)), [getScalings(defaultSettings)], src.config.usage_refresh_interval)
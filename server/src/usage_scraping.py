@@ -1,11 +1,17 @@
-from random import randint, random
-from typing import Dict, List, Tuple, TypeVar, Union
+import random
+from random import Random, randint
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple, Union
 from datetime import date, timedelta
-import requests
 import json
 
+import src.config
 from src.error import InputError
 from src.pokemon import Pokemon, PokemonSpecies, PokemonSpread
+from src.sampling import FenwickSampler
+from src.species_cache import PackedSpeciesDict, speciesUsages, writeSpeciesCache
+from src.usage_cache import usage_cache
+from src.usage_fetch import usage_fetcher
 
 
 def scrapeUsages (usageStr: str) -> Dict[str, float]:
@@ -21,172 +27,336 @@ def scrapeUsages (usageStr: str) -> Dict[str, float]:
     
     return usageDict
 
-def scrapeSpecies (usageStr: str, setStr: str)-> Dict[str, PokemonSpecies]:
+SECTION_SEPARATOR = "+----------------------------------------+"
+USED_SECTIONS = ("Abilities", "Items", "Spreads", "Moves")
+
+def parseMovesets (lines: Iterable[str], usages: Dict[str, float] = {}) -> Iterator[PokemonSpecies]:
+    # Blocks are boxed sections separated by single separator lines, each pokemon is separated by two in a row.
+    # Sections per pokemon: name, stats, abilities, items, spreads, moves, teammates, checks and counters
+    name: Union[str, None] = None
+    sections: Dict[str, List] = {}
+    section: Union[List, None] = None
+    sectionName: Union[str, None] = None
+
+    expectName = True
+    expectHeader = False
+    lastSeparator = True
+
+    for line in lines:
+        line = line.strip(" |\t\r\n")
+        if line == "":
+            continue
+
+        if line == SECTION_SEPARATOR:
+            if lastSeparator:
+                expectName = True
+            expectHeader = True
+            lastSeparator = True
+            section = None
+            continue
+
+        lastSeparator = False
+
+        if section != None:
+            head, _, percent = line.rpartition(" ")
+            if head.split(" ", 1)[0] == "Other":
+                continue
+
+            usage = float(percent[:-1]) / 100
+            section.append((usage, PokemonSpread.fromStr(head) if sectionName == "Spreads" else head.strip()))
+        elif expectName:
+            if name != None:
+                yield makeSpecies(name, sections, usages)
+
+            name = line
+            sections = dict((i, []) for i in USED_SECTIONS)
+            expectName = False
+            expectHeader = False
+        elif expectHeader:
+            sectionName = line
+            section = sections.get(line, None)
+            expectHeader = False
+
+    if name != None:
+        yield makeSpecies(name, sections, usages)
+
+def makeSpecies (name: str, sections: Dict[str, List], usages: Dict[str, float]) -> PokemonSpecies:
+    return PokemonSpecies(name, sections["Moves"], sections["Abilities"], sections["Items"], sections["Spreads"], usages.get(name, 0) / 100)
+
+def scrapeSpecies (usageStr: str, setLines: Union[str, Iterable[str]]) -> Dict[str, PokemonSpecies]:
     usages = scrapeUsages(usageStr)
-    newSpecies: Dict[str, PokemonSpecies] = {}
-
-    for i in setStr.strip().split(" +----------------------------------------+ \n +----------------------------------------+ "):
-        # Areas: pokemon, stats, abilities, items, spreads, moves
-        areas = [j.strip() for j in i.strip().split(" +----------------------------------------+ ")]
-        areaDict: Dict[str, Union[str, List[str]]] = {"pokemon" : areas[0].strip(" |+-\n")}
-        for j in areas[1:]:
-            lines = [i.strip(" |\n").strip() for i in j.split("\n")]
-            #print(lines)
-            areaDict[lines[0]] = lines[1:]
-        #print(areaDict)
-        
-        moves = [(float(i.strip().split(" ")[-1][:-1]) / 100, " ".join(i.strip().split(" ")[:-1]).strip()) for i in areaDict["Moves"] if i.strip().split(" ")[0] != "Other"]
-        abilities = [(float(i.strip().split(" ")[-1][:-1]) / 100, " ".join(i.strip().split(" ")[:-1]).strip()) for i in areaDict["Abilities"] if i.strip().split(" ")[0] != "Other"]
-        items = [(float(i.strip().split(" ")[-1][:-1]) / 100, " ".join(i.strip().split(" ")[:-1]).strip()) for i in areaDict["Items"] if i.strip().split(" ")[0] != "Other"]
-        spreads = [(float(i.strip().split(" ")[-1][:-1]) / 100, PokemonSpread.fromStr(i.strip().split(" ")[0])) for i in areaDict["Spreads"] if i.strip().split(" ")[0] != "Other"]
-
-        newSpecies[areaDict["pokemon"]] = PokemonSpecies(areaDict["pokemon"], moves, abilities, items, spreads, usages[areaDict["pokemon"]] / 100)
-
-    return newSpecies
-
-def tryOpenCache (tier: str, scrapeDate: date) -> Dict[str, PokemonSpecies]:
+
+    if isinstance(setLines, str):
+        setLines = setLines.splitlines()
+
+    return dict((i.speciesName, i) for i in parseMovesets(setLines, usages))
+
+def cacheFilename (tier: str, scrapeDate: date, extension: str) -> str:
+    return f"data/cache-{scrapeDate.year}.{scrapeDate.month}-{tier}.{extension}"
+
+def tryOpenCache (tier: str, scrapeDate: date) -> Mapping[str, PokemonSpecies]:
+    try:
+        return PackedSpeciesDict(cacheFilename(tier, scrapeDate, "bin"))
+    except:
+        pass
+
+    # Caches from before the packed format are still read, and converted for next time
     try:
-        with open(f"data/cache-{scrapeDate.year}.{scrapeDate.month}-{tier}.json") as f:
+        with open(cacheFilename(tier, scrapeDate, "json")) as f:
             jsonDict = json.load(f)
 
             speciesDict: Dict[str, PokemonSpecies] = {}
             for key in jsonDict:
                 speciesDict[key] = PokemonSpecies.fromJson(jsonDict[key])
-        return speciesDict
 
     except:
         return None
 
-def cacheSpeciesDict (tier: str, scrapeDate: date, speciesDict: Dict[str, PokemonSpecies]) -> None:
-    with open(f"data/cache-{scrapeDate.year}.{scrapeDate.month}-{tier}.json", "w") as f:
-        jsonDict = {}
-        for key in speciesDict:
-            jsonDict[key] = speciesDict[key].getJson()
-
-
-        json.dump(jsonDict, f)
-
-def scrapeUsageTime (tier: str, scrapeDate: date) -> Dict[str, PokemonSpecies]:
-    #global speciesDict
-    if scrapeDate.year < 2020:
-        raise InputError(f"Could not find tier \"{tier}\"!")
-
-    speciesDict = tryOpenCache(tier, scrapeDate)
-    if speciesDict != None:
-        return speciesDict
-    
-    print(f"Scraping data from smogon for {tier} from {scrapeDate.year}/{scrapeDate.month}!")
-    usageResponse = requests.get(f"https://www.smogon.com/stats/{scrapeDate.year}-{scrapeDate.month}/{tier}-1500.txt")
-    if usageResponse.status_code != 200:
-        scrapeUsageTime(tier, (scrapeDate - timedelta(days=1)).replace(day=1))
-        return
-
-    setResponse = requests.get(f"https://www.smogon.com/stats/{scrapeDate.year}-{scrapeDate.month}/moveset/{tier}-1500.txt")
-    speciesDict = scrapeSpecies(usageResponse.text, setResponse.text)
-    
     cacheSpeciesDict(tier, scrapeDate, speciesDict)
 
     return speciesDict
 
-def scrapeUsage (tier: str) -> Dict[str, PokemonSpecies]:
-    return scrapeUsageTime(tier, (date.today().replace(day=1) - timedelta(days=1)).replace(day=1))
+def cacheSpeciesDict (tier: str, scrapeDate: date, speciesDict: Mapping[str, PokemonSpecies]) -> None:
+    writeSpeciesCache(cacheFilename(tier, scrapeDate, "bin"), speciesDict)
 
+def previousMonth (month: date) -> date:
+    return (month - timedelta(days=1)).replace(day=1)
 
+def scrapeTiers (tiers: List[str], scrapeDate: date, sourceMonths: Dict[str, date] = None) -> Dict[str, Mapping[str, PokemonSpecies]]:
+    # Falls back a month at a time for any tier that smogon doesn't have stats for yet, the month each tier actually came
+    # from is put in sourceMonths
+    sourceMonths = sourceMonths if sourceMonths != None else {}
+    speciesDicts: Dict[str, Mapping[str, PokemonSpecies]] = {}
+    pending = list(tiers)
 
-def getUsage (tier: str, species: str) -> Dict:
-    #if currentTier != tier:
-        #scrapeUsage(tier, date.today().replace(day=1))
-    speciesDict = scrapeUsage(tier)
-    if species not in speciesDict:
-        raise InputError(description=f"Species \"{species}\" not in {tier}!")
-    
-    return speciesDict[species].getJson()
+    while len(pending) > 0:
+        if scrapeDate.year < 2020:
+            raise InputError(description=f"Could not find tier \"{pending[0]}\"!")
 
-def getRandom (tier: str, species) -> Dict:
-    speciesDict = scrapeUsage(tier)
+        for i in pending:
+            speciesDict = tryOpenCache(i, scrapeDate)
+            if speciesDict != None:
+                speciesDicts[i] = speciesDict
+                sourceMonths[i] = scrapeDate
 
-    if species == None:
-        return speciesDict[list(speciesDict.keys())[randint(0, len(speciesDict) - 1)]].generatePokemon().getJson()
-    elif species not in speciesDict:
-        raise InputError(description=f"Species \"{species}\" not in {tier}!")
-    else:
-        return speciesDict[species].generatePokemon().getJson()
+        pending = [i for i in pending if i not in speciesDicts]
 
-def getChoice (probabilities: List[float]):
-    cumulative = [sum(probabilities[:i - 1]) for i in range(0, len(probabilities))]
-    mul = sum(probabilities)
+        fetched = usage_fetcher.fetchMonth(pending, scrapeDate, lambda lines: list(parseMovesets(lines)))
+        for i in fetched:
+            usages = scrapeUsages(fetched[i][0])
+            speciesDict = dict((j.speciesName, j) for j in fetched[i][1])
+            for j in speciesDict.values():
+                j.usage = usages.get(j.speciesName, 0) / 100
 
-    x = mul * random()
-
-    w = len(cumulative)
-    off = 0
-
-    while w > 1:
-        if cumulative[off + w // 2] < x:
-            off += w // 2
-            w -= w // 2
-        else:
-            w //= 2
-    
-    return off - 1 if cumulative[off] > x and off > 0 else off
+            cacheSpeciesDict(i, scrapeDate, speciesDict)
+            speciesDicts[i] = speciesDict
+            sourceMonths[i] = scrapeDate
 
-T = TypeVar('T')
-def getChoices (probabilities: List[float], items: List[T], n: int) -> List[T]:
-    choices = []
+        pending = [i for i in pending if i not in speciesDicts]
+        scrapeDate = previousMonth(scrapeDate)
 
-    for _ in range(0, n):
-        x = getChoice(probabilities)
-        choices.append(items.pop(x))
+    return speciesDicts
 
-        probabilities.pop(x)
+def scrapeUsageTime (tier: str, scrapeDate: date) -> Mapping[str, PokemonSpecies]:
+    return scrapeTiers([tier], scrapeDate)[tier]
 
-    return choices
+def usageMonth () -> date:
+    # Smogon publishes stats for a month at the start of the next one
+    return (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
 
+def scrapeUsage (tier: str) -> Mapping[str, PokemonSpecies]:
+    return usage_cache.get(tier, usage_cache.servingMonth(usageMonth()), scrapeUsageTime)
 
-def generatePokemon (num: int, usedPokemon: List[str], scaling: Dict[str, float], cutoff: float = 0.03) -> List[Pokemon]:
-    tiers = [i for i in scaling]
-    usages = dict((i, scrapeUsage(i)) for i in scaling)
+def scrapeTierUsages (tiers: Iterable[str]) -> Dict[str, Mapping[str, PokemonSpecies]]:
+    return usage_cache.getMany(list(tiers), usage_cache.servingMonth(usageMonth()), scrapeTiers)
 
-    species: List[Tuple[float, PokemonSpecies]] = []
+def getCacheStats () -> Dict:
+    return usage_cache.stats()
 
-    numPokemon: Dict[str, int] = {}
 
-    for i in tiers:
-        tierPokemon = []
-        tierDict = usages[i]
-        for j in tierDict:
-            if tierDict[j].usage > cutoff:
-                tierPokemon.append((tierDict[j].usage, tierDict[j]))
-        
-        numPokemon[i] = len(tierPokemon)
 
-        species += tierPokemon
+def getUsage (tier: str, species: str) -> Dict:
+    #if currentTier != tier:
+        #scrapeUsage(tier, date.today().replace(day=1))
+    speciesDict = scrapeUsage(tier)
+    if species not in speciesDict:
+        raise InputError(description=f"Species \"{species}\" not in {tier}!")
     
-    species = [(1 / (val[0]), val[1]) if i < len(species) // 2 else val for i, val in enumerate(species)]
-
-    sumPokemon = 0
-
-    for i in tiers:
-        sumProb = sum(j[0] for j in species[sumPokemon:sumPokemon + numPokemon[i]])
-        species = [(val[0] * scaling[i] / sumProb, val[1]) if sumPokemon <= j < sumPokemon + numPokemon[i] else val for j, val in enumerate(species)]
+    return speciesDict[species].getJson()
 
-        sumPokemon += numPokemon[i]
+tierNames: Dict[str, Tuple[Mapping[str, PokemonSpecies], Tuple[str, ...]]] = {}
 
-    species = [val for val in species if val[1].speciesName not in usedPokemon]
+def getSpeciesNames (tier: str, speciesDict: Mapping[str, PokemonSpecies]) -> Tuple[str, ...]:
+    # Kept until the tier's data is swapped out
+    cached = tierNames.get(tier, None)
+    if cached == None or cached[0] is not speciesDict:
+        cached = (speciesDict, tuple(speciesDict))
+        tierNames[tier] = cached
 
-    scalingSum = sum(i[0] for i in species)
+    return cached[1]
 
-    species = [(val[0] / scalingSum, val[1]) for val in species]
+def getRandom (tier: str, species) -> Dict:
+    speciesDict = scrapeUsage(tier)
 
-    if usedPokemon == []:
-        f = open("data/usage.txt", "w")
-        sumT = 0
-        f.write("Tier\tSpecies\tWeight\n")
-        for i in tiers:
-            for j in species[sumT:sumT + numPokemon[i]]:
-                f.write(f"{i}\t{j[1].speciesName}\t{j[0]}\n")
-            sumT += numPokemon[i]
+    if species == None:
+        names = getSpeciesNames(tier, speciesDict)
+        return speciesDict[names[randint(0, len(names) - 1)]].generatePokemon().getJson()
+    elif species not in speciesDict:
+        raise InputError(description=f"Species \"{species}\" not in {tier}!")
+    else:
+        return speciesDict[species].generatePokemon().getJson()
 
-    chosenSpecies = getChoices([i[0] for i in species if i[1].speciesName not in usedPokemon], [i[1] for i in species if i[1].speciesName not in usedPokemon], num)
+def getRandomBatch (tiers: List[str], count: int, species: Union[List[str], None] = None, seed: Union[int, None] = None) -> Iterator[Dict]:
+    # Everything is checked before the first set is generated so errors are still proper responses, sets are then
+    # produced one at a time for streaming
+    if not isinstance(tiers, list) or len(tiers) == 0 or not all(isinstance(i, str) for i in tiers):
+        raise InputError(description="At least one tier is needed!")
+    if isinstance(count, bool) or not isinstance(count, int) or not 0 <= count <= src.config.batch_max_count:
+        raise InputError(description=f"Count must be between 0 and {src.config.batch_max_count}!")
+    if species != None and (not isinstance(species, list) or not all(isinstance(i, str) for i in species)):
+        raise InputError(description="Species must be a list of names!")
+    if seed != None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        raise InputError(description="Seed must be an integer!")
+
+    # Only tiers already loaded can be used, nothing is fetched inside the request. The refresher is asked to load the
+    # rest for next time if it's running
+    missing = [i for i in tiers if i not in usage_cache.snapshot.tiers]
+    if len(missing) > 0:
+        if usage_cache.requestLoad != None:
+            usage_cache.requestLoad(missing)
+        raise InputError(description=f"Tier \"{missing[0]}\" is not loaded!")
+
+    speciesDicts = scrapeTierUsages(tiers)
 
-    return [i.generatePokemon() for i in chosenSpecies]
\ No newline at end of file
+    if species == None:
+        pool = [(i, j) for i in tiers for j in getSpeciesNames(i, speciesDicts[i])]
+    else:
+        pool = [(i, j) for i in tiers for j in species if j in speciesDicts[i]]
+        missing = set(species) - set(j for _, j in pool)
+        if len(missing) > 0:
+            raise InputError(description=f"Species {', '.join(sorted(missing))} not in {', '.join(tiers)}!")
+
+    if len(pool) == 0 and count > 0:
+        raise InputError(description="No species to generate from!")
+
+    rng = Random(seed)
+
+    def generate () -> Iterator[Dict]:
+        for _ in range(count):
+            tier, name = pool[rng.randrange(len(pool))]
+            pokemon = speciesDicts[tier][name].generatePokemon(rng).getJson()
+            pokemon["tier"] = tier
+            yield pokemon
+
+    return generate()
+
+DEFAULT_CUTOFF = 0.03
+
+class TierWeights:
+    def __init__ (self, usages: Dict[str, Mapping[str, PokemonSpecies]], scaling: Dict[str, float], cutoff: float):
+        self.sources = usages
+        self.names: List[str] = []
+        self.tiers: List[str] = []
+        weights: List[float] = []
+
+        for i in scaling:
+            tierPokemon = [j for j in speciesUsages(usages[i]) if j[1] > cutoff]
+            self.names += [j[0] for j in tierPokemon]
+            self.tiers += [i] * len(tierPokemon)
+            weights += [j[1] for j in tierPokemon]
+
+        # The first half of the pool (the higher tiers) is weighted towards its less used pokemon
+        weights = [1 / w if i < len(weights) // 2 else w for i, w in enumerate(weights)]
+
+        for i in scaling:
+            tierIndices = [j for j, t in enumerate(self.tiers) if t == i]
+            sumProb = sum(weights[j] for j in tierIndices)
+            for j in tierIndices:
+                weights[j] = weights[j] * scaling[i] / sumProb
+
+        self.weights = weights
+
+        # A species can show up in more than one tier's stats, every copy is masked when it is used
+        self.indices: Dict[str, List[int]] = {}
+        for i, val in enumerate(self.names):
+            self.indices.setdefault(val, []).append(i)
+        # Species that can be drawn at all
+        self.drawable = frozenset(i for i, j in self.indices.items() if any(self.weights[k] > 0 for k in j))
+
+    def isCurrent (self, usages: Dict[str, Mapping[str, PokemonSpecies]]) -> bool:
+        return all(self.sources.get(i, None) is usages[i] for i in usages)
+
+    def writeWeights (self, filename: str) -> None:
+        scalingSum = sum(self.weights)
+        with open(filename, "w") as f:
+            f.write("Tier\tSpecies\tWeight\n")
+            for i, val in enumerate(self.names):
+                f.write(f"{self.tiers[i]}\t{val}\t{self.weights[i] / scalingSum}\n")
+
+    def draw (self, num: int, usedPokemon: Iterable[str], rng: Random = random) -> List[PokemonSpecies]:
+        return self.deal([num], usedPokemon, rng)[0]
+
+    def available (self, usedPokemon: Iterable[str]) -> int:
+        # How many different species can still be drawn
+        return len(self.drawable.difference(usedPokemon))
+
+    def deal (self, counts: List[int], usedPokemon: Iterable[str], rng: Random = random) -> List[List[PokemonSpecies]]:
+        # Draws counts[i] species for each hand from one sampler, without replacement across all of them. Hands are
+        # dealt round robin so the first ones don't get first pick of the heaviest species
+        used = set(usedPokemon)
+        available = self.available(used)
+        if sum(counts) > available:
+            raise InputError(description=f"Not enough pokemon left, {sum(counts)} are needed but only {available} are left!")
+
+        sampler = FenwickSampler(self.weights)
+        for i in used:
+            for j in self.indices.get(i, []):
+                sampler.remove(j)
+
+        hands: List[List[PokemonSpecies]] = [[] for _ in counts]
+        for step in range(max(counts, default=0)):
+            for hand, count in zip(hands, counts):
+                if step >= count:
+                    continue
+
+                i = sampler.pop(rng)
+                for j in self.indices[self.names[i]]:
+                    sampler.remove(j)
+
+                hand.append(self.sources[self.tiers[i]][self.names[i]])
+
+        return hands
+
+tierWeightsLock = Lock()
+tierWeights: Dict[Tuple[Tuple[str, float], ...], TierWeights] = {}
+
+def getTierWeights (scaling: Dict[str, float], cutoff: float) -> TierWeights:
+    usages = scrapeTierUsages(scaling)
+    key = tuple(scaling.items()) + (("cutoff", cutoff),)
+
+    weights = tierWeights.get(key, None)
+    if weights != None and weights.isCurrent(usages):
+        return weights
+
+    with tierWeightsLock:
+        weights = tierWeights.get(key, None)
+        if weights == None or not weights.isCurrent(usages):
+            weights = TierWeights(usages, scaling, cutoff)
+            weights.writeWeights("data/usage.txt")
+            tierWeights[key] = weights
+
+    return weights
+
+def generateSets (species: List[PokemonSpecies], rng: Random = random) -> List[Pokemon]:
+    # Each hand's sets only depend on its species and its own rng, so hands can be generated separately once dealt
+    return [i.generatePokemon(rng) for i in species]
+
+def generatePokemon (num: int, usedPokemon: Iterable[str], scaling: Dict[str, float], cutoff: float = DEFAULT_CUTOFF, rng: Random = random) -> List[Pokemon]:
+    return generateSets(getTierWeights(scaling, cutoff).draw(num, usedPokemon, rng), rng)
+
+def generateDrafts (counts: List[int], usedPokemon: Iterable[str], scaling: Dict[str, float], rng: Random, handRngs: List[Random],
+        cutoff: float = DEFAULT_CUTOFF) -> List[List[Pokemon]]:
+    # One draw for many players at once, the weights and used pokemon are only gone through once. rng deals the
+    # species, handRngs generate each hand's sets
+    hands = getTierWeights(scaling, cutoff).deal(counts, usedPokemon, rng)
+    return [generateSets(i, j) for i, j in zip(hands, handRngs)]
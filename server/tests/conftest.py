@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import src.config
+
+@pytest.fixture
+def makeData (tmp_path, monkeypatch):
+    # Importing tournament_data makes the server's own instance under data/, so that goes in the temporary directory too
+    monkeypatch.chdir(tmp_path)
+    from src.tournament_archive import TournamentArchive
+    from src.tournament_data import TournamentData
+    from src.tournament_journal import TournamentJournal
+    from src.tournament_persist import WriteBehindStorage
+
+    def make () -> TournamentData:
+        storage = TournamentJournal(str(tmp_path / "tournaments"), 30, 1 << 20)
+        return TournamentData(WriteBehindStorage(storage, 0.01, 256, False, src.config.lock_timeout), str(tmp_path / "tournaments.json"),
+                TournamentArchive(str(tmp_path / "archive")))
+
+    return make
+
+SPECIES = 10
+
+@pytest.fixture
+def usage (tmp_path, monkeypatch):
+    # SPECIES made up species for every tier tournaments draw from, published as the current month's usage data
+    from src.pokemon import PokemonSpecies, PokemonSpread
+    from src.tournament import defaultSettings, getScalings
+    from src.usage_cache import usage_cache
+    from src.usage_scraping import usageMonth
+
+    # The drawn weights are written out under data/
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(tmp_path / "data", exist_ok=True)
+
+    spread = PokemonSpread("Jolly", [0, 252, 0, 0, 4, 252])
+    moves = [(50.0 - i, f"Move {i}") for i in range(8)]
+    speciesDicts = {}
+    for tier in getScalings(defaultSettings):
+        names = [f"{tier}-{i}" for i in range(SPECIES)]
+        speciesDicts[tier] = dict((j, PokemonSpecies(j, moves, [(1.0, "Static")], [(1.0, "Leftovers")], [(1.0, spread)], 0.05 + i / 100))
+                for i, j in enumerate(names))
+
+    usage_cache.clear()
+    usage_cache.publish(usageMonth(), speciesDicts)
+    yield speciesDicts
+    usage_cache.clear()
@@ -0,0 +1,47 @@
+import random
+from collections import Counter
+
+from src.pokemon import PokemonSpecies, PokemonSpread
+
+DRAWS = 20000
+
+def makeSpecies () -> PokemonSpecies:
+    moves = [(60.0, "Earthquake"), (45.0, "Stone Edge"), (30.0, "Swords Dance"), (25.0, "Stealth Rock"), (20.0, "Roar"),
+            (10.0, "Protect"), (5.0, "Rest"), (0.0, "Splash")]
+    abilities = [(70.0, "Sand Stream"), (30.0, "Unnerve")]
+    items = [(50.0, "Leftovers"), (25.0, "Choice Band"), (15.0, "Life Orb"), (10.0, "Focus Sash")]
+    spreads = [(40.0, PokemonSpread("Adamant", [252, 252, 0, 0, 4, 0])), (35.0, PokemonSpread("Careful", [252, 0, 4, 0, 252, 0])),
+            (25.0, PokemonSpread("Jolly", [0, 252, 0, 0, 4, 252]))]
+
+    return PokemonSpecies("Tyranitar", moves, abilities, items, spreads, 10.0)
+
+def checkFrequencies (counts: Counter, choices, draws: int) -> None:
+    # Within 5 standard deviations of the usage share, so a correct sampler basically never fails
+    total = sum(i[0] for i in choices)
+    for weight, value in choices:
+        expected = weight / total
+        deviation = (expected * (1 - expected) / draws) ** 0.5
+        assert abs(counts[value] / draws - expected) <= 5 * deviation + 1e-9, value
+
+def test_generate_pokemon_matches_usage ():
+    species = makeSpecies()
+    rng = random.Random(2)
+    pokemon = [species.generatePokemon(rng) for _ in range(DRAWS)]
+
+    checkFrequencies(Counter(i.ability for i in pokemon), species.abilities, DRAWS)
+    checkFrequencies(Counter(i.item for i in pokemon), species.items, DRAWS)
+    checkFrequencies(Counter(i.spread.nature for i in pokemon), [(i[0], i[1].nature) for i in species.spreads], DRAWS)
+
+def test_generate_pokemon_moves ():
+    species = makeSpecies()
+    rng = random.Random(3)
+    counts = Counter()
+    for _ in range(DRAWS):
+        moves = species.generatePokemon(rng).moves
+        assert len(moves) == 4 and len(set(moves)) == 4
+        counts.update(moves)
+
+    # Heavier moves turn up in more sets, moves nobody uses never do
+    used = [i[1] for i in species.moves if i[0] > 0]
+    assert [counts[i] for i in used] == sorted((counts[i] for i in used), reverse=True)
+    assert counts["Splash"] == 0
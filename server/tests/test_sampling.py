@@ -0,0 +1,132 @@
+import random
+from collections import Counter
+from itertools import permutations
+from typing import Dict, List, Tuple
+
+import pytest
+
+from src.error import InputError
+from src.pokemon import PokemonSpecies
+from src.sampling import AliasTable, FenwickSampler
+from src.usage_scraping import TierWeights
+
+DRAWS = 40000
+
+def exactSamples (weights: List[float], k: int) -> Dict[Tuple[int, ...], float]:
+    # Probability of every ordered pick when each pick is drawn in proportion to the weights of what's left
+    live = [i for i, w in enumerate(weights) if w > 0]
+    probabilities = {}
+    for picks in permutations(live, k):
+        p = 1.0
+        remaining = sum(weights[i] for i in live)
+        for i in picks:
+            p *= weights[i] / remaining
+            remaining -= weights[i]
+        probabilities[picks] = p
+
+    return probabilities
+
+def checkSets (counts: Counter, exact: Dict[Tuple[int, ...], float], draws: int) -> None:
+    # Picked sets against the exact probabilities, within 5 standard deviations
+    expected = Counter()
+    for picks, p in exact.items():
+        expected[frozenset(picks)] += p
+
+    assert set(counts) <= set(expected)
+    for picks, p in expected.items():
+        deviation = (p * (1 - p) / draws) ** 0.5
+        assert abs(counts[picks] / draws - p) <= 5 * deviation + 1e-9, sorted(picks)
+
+def test_alias_table_draw ():
+    weights = [5.0, 1.0, 0.0, 3.0, 1.0]
+    table = AliasTable([(w, i) for i, w in enumerate(weights)])
+    rng = random.Random(1)
+    counts = Counter(table.draw(rng) for _ in range(DRAWS))
+
+    checkSets(Counter(frozenset([i]) for i in counts.elements()), exactSamples(weights, 1), DRAWS)
+
+def test_alias_table_sample ():
+    weights = [8.0, 4.0, 2.0, 1.0, 1.0, 0.0]
+    table = AliasTable([(w, i) for i, w in enumerate(weights)])
+    rng = random.Random(2)
+    counts = Counter()
+    for _ in range(DRAWS):
+        picks = table.sample(3, rng)
+        assert len(set(picks)) == 3
+        counts[frozenset(picks)] += 1
+
+    checkSets(counts, exactSamples(weights, 3), DRAWS)
+
+def test_alias_table_sample_heavy ():
+    # Two items with nearly all the weight make repeats common enough to finish off with exponential keys
+    weights = [1000.0, 1000.0, 1.0, 1.0, 1.0]
+    table = AliasTable([(w, i) for i, w in enumerate(weights)])
+    rng = random.Random(3)
+    counts = Counter(frozenset(table.sample(3, rng)) for _ in range(DRAWS))
+
+    checkSets(counts, exactSamples(weights, 3), DRAWS)
+
+def test_alias_table_sample_more_than_live ():
+    table = AliasTable([(1.0, "a"), (0.0, "b"), (2.0, "c")])
+
+    assert sorted(table.sample(4, random.Random(4))) == ["a", "c"]
+
+def test_fenwick_sampler_pop ():
+    weights = [3.0, 0.0, 1.0, 2.0, 4.0]
+    rng = random.Random(5)
+    counts = Counter()
+    for _ in range(DRAWS):
+        sampler = FenwickSampler(weights)
+        counts[frozenset([sampler.pop(rng), sampler.pop(rng)])] += 1
+
+    checkSets(counts, exactSamples(weights, 2), DRAWS)
+
+def test_fenwick_sampler_remove ():
+    sampler = FenwickSampler([1.0, 2.0, 0.0, 3.0])
+    sampler.remove(3)
+    rng = random.Random(6)
+
+    assert len(sampler) == 2
+    assert sorted(sampler.pop(rng) for _ in range(2)) == [0, 1]
+    assert len(sampler) == 0
+
+def makeTierWeights () -> TierWeights:
+    def makeTier (usages: Dict[str, float]) -> Dict[str, PokemonSpecies]:
+        return dict((name, PokemonSpecies(name, [], [], [], [], usage)) for name, usage in usages.items())
+
+    usages = {
+        "gen8ou" : makeTier({"Landorus" : 30.0, "Heatran" : 20.0, "Toxapex" : 10.0}),
+        "gen8uu" : makeTier({"Hydreigon" : 15.0, "Heatran" : 5.0, "Mew" : 0.001})
+    }
+
+    return TierWeights(usages, {"gen8ou" : 2.0, "gen8uu" : 1.0}, 1.0)
+
+def test_tier_weights_deal ():
+    tierWeights = makeTierWeights()
+    # Species under the cutoff are left out, the rest of each tier shares its scaling
+    assert sorted(set(tierWeights.names)) == ["Heatran", "Hydreigon", "Landorus", "Toxapex"]
+    assert abs(sum(tierWeights.weights) - 3.0) < 1e-9
+
+    rng = random.Random(7)
+    counts = Counter()
+    for _ in range(DRAWS):
+        hand, = tierWeights.deal([2], ["Toxapex"], rng)
+        assert len(set(i.speciesName for i in hand)) == 2
+        counts[frozenset(i.speciesName for i in hand)] += 1
+
+    # Heatran is in both tiers, drawing either copy uses it up
+    weights: Dict[str, float] = {}
+    for name, weight in zip(tierWeights.names, tierWeights.weights):
+        if name != "Toxapex":
+            weights[name] = weights.get(name, 0.0) + weight
+    names = list(weights)
+    exact = exactSamples([weights[i] for i in names], 2)
+
+    checkSets(Counter(frozenset(names.index(j) for j in i) for i in counts.elements()), exact, DRAWS)
+
+def test_tier_weights_deal_too_many ():
+    tierWeights = makeTierWeights()
+
+    assert tierWeights.available(["Landorus"]) == 3
+    with pytest.raises(InputError):
+        tierWeights.deal([2, 2], ["Landorus"], random.Random(8))
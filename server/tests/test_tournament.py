@@ -0,0 +1,220 @@
+import json
+
+import pytest
+
+from src.error import InputError
+from src.pokemon import Pokemon, PokemonSpread
+from src.tournament import Player, Tournament, defaultSettings, getScalings
+from src.usage_scraping import DEFAULT_CUTOFF, getTierWeights
+
+SETTINGS = dict(defaultSettings, team_size=2, draw_size=3, steal_size=1)
+SPREAD = PokemonSpread("Jolly", [0, 252, 0, 0, 4, 252])
+
+def giveDraft (tour: Tournament, player: Player) -> None:
+    # Made up pokemon so nothing has to be drawn
+    player.generated = [Pokemon(f"{player.playerId}-{i}", ["Tackle"], "Static", "Leftovers", SPREAD) for i in range(tour.drawSize)]
+    player.reindex()
+    player.status = "choosing_pokemon"
+    player.markChanged()
+    tour.addUsed(player.generated)
+
+def checkIndexes (tour: Tournament) -> None:
+    assert tour.playerIndex == dict((i.playerId, i) for i in tour.players)
+    assert tour.usedSpecies == set(tour.usedPokemon)
+    for i in tour.players:
+        assert i.teamSlots == dict((j.species, k) for k, j in enumerate(i.team))
+        assert i.generatedSlots == dict((j.species, k) for k, j in enumerate(i.generated))
+
+def test_indexes_follow_every_change (makeData):
+    data = makeData()
+    data.addTour(Tournament("indexes", SETTINGS, 1))
+
+    with data.getTour("indexes", True) as tour:
+        tour.addPlayer(Player("a"))
+        tour.addPlayer(Player("b"))
+        tour.started = True
+        for i in tour.players:
+            giveDraft(tour, i)
+            i.choosePokemon([j.species for j in i.generated[:tour.teamSize]], tour.teamSize)
+        checkIndexes(tour)
+
+        tour.startBattle("a", "b")
+        tour.getPlayer("a").completeBattle(True)
+        tour.getPlayer("b").completeBattle(False)
+        tour.getPlayer("a").stealPokemon(tour.getPlayer("b"), ["b-0"], ["a-0"], tour.stealSize)
+        checkIndexes(tour)
+        assert "b-0" in tour.getPlayer("a").teamSlots and "a-0" in tour.getPlayer("b").generatedSlots
+
+        tour.getPlayer("b").swapPokemon(["a-0"])
+        checkIndexes(tour)
+        assert tour.getPlayer("b").refill == 0 and tour.getPlayer("b").status == "waiting_battle"
+
+    # Rebuilt from the saved json the same way
+    data.storage.flush()
+    rebuilt = makeData()["indexes"]
+    checkIndexes(rebuilt)
+    assert sorted(rebuilt.getPlayer("b").teamSlots) == ["a-0", "b-1"]
+
+def test_choose_rejects_bad_teams ():
+    tour = Tournament("choose", SETTINGS, 1)
+    tour.addPlayer(Player("a"))
+    player = tour.getPlayer("a")
+    giveDraft(tour, player)
+
+    for choices in (["a-0", "a-0"], ["a-0"], ["a-0", "x"]):
+        with pytest.raises(InputError):
+            player.choosePokemon(choices, tour.teamSize)
+    assert player.status == "choosing_pokemon" and player.team == []
+
+    with pytest.raises(InputError):
+        tour.getPlayer("missing")
+    with pytest.raises(InputError):
+        tour.addPlayer(Player("a"))
+
+def makeWaiting (matchmaking: str, records) -> Tournament:
+    # Players already waiting for a battle with the given (wins, losses, opponents), not queued yet
+    tour = Tournament("matchmaking", dict(SETTINGS, matchmaking=matchmaking), 1)
+    for i, (wins, losses, opponents) in enumerate(records):
+        tour.addPlayer(Player(f"p{i}", status="waiting_battle", wins=wins, losses=losses, opponents=opponents))
+    tour.started = True
+
+    return tour
+
+def test_manual_never_pairs ():
+    tour = makeWaiting("manual", [(0, 0, [])] * 4)
+    assert tour.matchmake(*tour.players) == []
+    assert all(i.status == "waiting_battle" and i.queued == None for i in tour.players)
+
+def test_fifo_pairs_in_queue_order ():
+    tour = makeWaiting("fifo", [(0, 0, [])] * 6)
+    assert tour.matchmake(*tour.players[:5]) == [("p0", "p1"), ("p2", "p3")]
+    assert tour.getPlayer("p0").battling == "p1" and tour.getPlayer("p0").status == "battling"
+    assert tour.getPlayer("p4").status == "waiting_battle" and tour.getPlayer("p4").queued != None
+
+    # The one left over battles whoever joins next
+    assert tour.matchmake(tour.getPlayer("p5")) == [("p4", "p5")]
+
+def test_no_rematch_skips_past_opponents ():
+    tour = makeWaiting("no_rematch", [(1, 0, ["p1"]), (0, 1, ["p0"]), (0, 0, []), (0, 0, [])])
+    assert tour.matchmake(*tour.players) == [("p0", "p2"), ("p1", "p3")]
+
+    # Nobody else to battle, so they're left waiting rather than paired again
+    tour = makeWaiting("no_rematch", [(1, 0, ["p1"]), (0, 1, ["p0"])])
+    assert tour.matchmake(*tour.players) == []
+    assert all(i.status == "waiting_battle" for i in tour.players)
+
+def test_swiss_pairs_closest_records ():
+    tour = makeWaiting("swiss", [(0, 2, []), (2, 0, []), (1, 1, []), (2, 0, []), (0, 2, []), (1, 1, [])])
+    assert tour.matchmake(*tour.players) == [("p1", "p3"), ("p2", "p5"), ("p0", "p4")]
+
+def test_queue_survives_a_rebuild (makeData):
+    data = makeData()
+    data.addTour(Tournament("queue", dict(SETTINGS, matchmaking="fifo"), 1))
+    with data.getTour("queue", True) as tour:
+        tour.addPlayer(Player("first", status="waiting_battle"))
+        tour.addPlayer(Player("second", status="waiting_battle"))
+        tour.started = True
+        assert tour.matchmake(tour.getPlayer("first")) == []
+
+    data.storage.flush()
+    data = makeData()
+    with data.getTour("queue", True) as tour:
+        assert tour.matchmake(tour.getPlayer("second")) == [("first", "second")]
+
+def test_unknown_matchmaking_is_rejected ():
+    with pytest.raises(InputError):
+        Tournament("unknown", dict(SETTINGS, matchmaking="random"), 1)
+
+def getWeights ():
+    return getTierWeights(getScalings(SETTINGS), DEFAULT_CUTOFF)
+
+def addPlayers (data, name: str, players: int) -> None:
+    data.addTour(Tournament(name, SETTINGS, 1))
+    with data.getTour(name, True) as tour:
+        for i in range(players):
+            tour.addPlayer(Player(f"p{i}"))
+
+def test_start_checks_the_pool (makeData, usage):
+    data = makeData()
+    fits = sum(len(i) for i in usage.values()) // SETTINGS["draw_size"]
+
+    addPlayers(data, "too_many", fits + 1)
+    with pytest.raises(InputError):
+        with data.getTour("too_many", True) as tour:
+            tour.start(getWeights())
+    # Rolled back, nobody was left generating
+    assert not data.getView("too_many").json["started"] and data.getView("too_many").json["generating"] == 0
+
+    addPlayers(data, "pool", fits)
+    with data.getTour("pool", True) as tour:
+        tour.start(getWeights())
+        assert tour.generatePending(fits) == 0
+
+    tour = data["pool"]
+    drawn = [j.species for i in tour.players for j in i.generated]
+    assert all(len(i.generated) == tour.drawSize for i in tour.players)
+    assert len(drawn) == len(set(drawn)) == len(tour.usedSpecies)
+
+def test_late_players_check_the_pool (makeData, usage):
+    data = makeData()
+    data.addTour(Tournament("late", SETTINGS, 1))
+    with data.getTour("late", True) as tour:
+        tour.addPlayer(Player("first"))
+        tour.start(getWeights())
+
+    # Players left generating count against what's left too, not just the ones drawn already
+    left = getWeights().available(set())
+    joined = 0
+    while True:
+        try:
+            with data.getTour("late", True) as tour:
+                tour.addPlayer(Player(f"late{joined}"), getWeights())
+            joined += 1
+        except InputError:
+            break
+
+    assert joined == left // SETTINGS["draw_size"] - 1
+    assert len(data.getView("late").players) == joined + 1
+
+    with pytest.raises(InputError):
+        getWeights().deal([left + 1], set())
+
+def drawAll (seed: int, rebuild: bool = False):
+    # Every player's draft in batches of two, optionally rebuilding the tournament from its json between batches
+    tour = Tournament("seeded", SETTINGS, seed)
+    for i in range(5):
+        tour.addPlayer(Player(f"p{i}"))
+    tour.start(getWeights())
+    while tour.generatePending(2) > 0:
+        if rebuild:
+            tour = Tournament.fromJson(tour.toJson())
+
+    return [[i.getJson() for i in player.generated] for player in tour.players]
+
+def test_same_seed_same_pokemon (usage):
+    drafts = drawAll(7)
+    assert drawAll(7) == drafts
+    assert drawAll(7, True) == drafts
+    assert drawAll(8) != drafts
+
+def test_legacy_tournaments_keep_one_seed (tmp_path, makeData):
+    # Imported from the old single file format
+    legacy = Tournament("imported", SETTINGS).toJson()
+    del legacy["seed"]
+    with open(tmp_path / "tournaments.json", "w") as f:
+        json.dump({"tournaments" : [legacy]}, f)
+
+    data = makeData()
+    seed = data["imported"].seed
+    data.storage.flush()
+    assert makeData()["imported"].seed == seed
+
+    # Stored before seeds were saved
+    stored = dict(legacy, name="stored")
+    data.storage.save("stored", None, stored)
+    data.storage.flush()
+    data = makeData()
+    seed = data["stored"].seed
+    assert data["stored"].seed == seed
+    data.storage.flush()
+    assert makeData()["stored"].seed == seed
@@ -0,0 +1,295 @@
+import json
+import random
+import threading
+import time
+
+import pytest
+
+import src.config
+from src.error import InputError
+from src.tournament import Player, Tournament, defaultSettings
+
+TOURNAMENTS = 8
+WRITERS = 16
+READERS = 16
+WRITES = 50
+
+def runThreads (threads):
+    for i in threads:
+        i.start()
+    for i in threads:
+        i.join()
+
+def test_concurrent_writers_and_readers (makeData):
+    data = makeData()
+    names = [f"stress{i}" for i in range(TOURNAMENTS)]
+    for i in names:
+        data.addTour(Tournament(i, defaultSettings, 1))
+
+    errors = []
+    written = dict((i, []) for i in names)
+    writersDone = threading.Event()
+
+    def writer (writerId: int):
+        rng = random.Random(writerId)
+        try:
+            for i in range(WRITES):
+                name = rng.choice(names)
+                playerId = f"w{writerId}-{i}"
+                with data.getTour(name, True) as tour:
+                    tour.addPlayer(Player(playerId))
+                written[name].append(playerId)
+        except Exception as e:
+            errors.append(e)
+
+    def reader (readerId: int):
+        rng = random.Random(-readerId)
+        try:
+            while not writersDone.is_set():
+                view = data.getView(rng.choice(names))
+                # A view never changes once it's handed out
+                assert len(view.players) == len(view.json["players"])
+                assert view.getText() != None
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+    for i in readers:
+        i.start()
+
+    runThreads([threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)])
+    writersDone.set()
+    for i in readers:
+        i.join()
+
+    assert errors == []
+    for name in names:
+        assert sorted(data.getView(name).players) == sorted(written[name])
+
+    stats = data.getLockStats()
+    assert stats["tournament"]["acquired"] == TOURNAMENTS + WRITERS * WRITES
+    assert all(i["timeouts"] == 0 for i in stats.values())
+
+    # Every write reaches the storage
+    data.storage.flush()
+    reloaded = makeData()
+    for name in names:
+        assert sorted(reloaded.getView(name).players) == sorted(written[name])
+
+def test_add_and_write_race (makeData):
+    # A writer getting in straight after a tournament is made must not have its save replaced by the first one
+    data = makeData()
+
+    def register (name: str):
+        while True:
+            try:
+                with data.getTour(name, True) as tour:
+                    tour.addPlayer(Player("first"))
+                return
+            except InputError:
+                pass
+
+    for i in range(50):
+        name = f"race{i}"
+        thread = threading.Thread(target=register, args=(name,))
+        thread.start()
+        data.addTour(Tournament(name, defaultSettings, 1))
+        thread.join()
+
+    data.storage.flush()
+    reloaded = makeData()
+    assert all(list(reloaded.getView(f"race{i}").players) == ["first"] for i in range(50))
+
+def test_clear_with_polling_readers (makeData):
+    # Writer preferring, a steady stream of readers can't keep clear waiting
+    data = makeData()
+    data.addTour(Tournament("polled", defaultSettings, 1))
+    stop = threading.Event()
+
+    def poll ():
+        # Readers overlapping each other so the lock is never free of them
+        while not stop.is_set():
+            data.lockReader()
+            try:
+                time.sleep(0.005)
+            finally:
+                data.personalLock.unlockReader()
+
+    readers = [threading.Thread(target=poll) for _ in range(READERS)]
+    for i in readers:
+        i.start()
+
+    start = time.monotonic()
+    data.clear()
+    elapsed = time.monotonic() - start
+    stop.set()
+    for i in readers:
+        i.join()
+
+    assert elapsed < src.config.lock_timeout
+    assert "polled" not in data
+
+def test_since_returns_only_changes (makeData):
+    data = makeData()
+    data.addTour(Tournament("since", defaultSettings, 1))
+    with data.getTour("since", True) as tour:
+        tour.addPlayer(Player("a"))
+        tour.addPlayer(Player("b"))
+    before = data.getView("since")
+
+    with data.getTour("since", True) as tour:
+        tour.getPlayer("a").wins += 1
+        tour.getPlayer("a").markChanged()
+    after = data.getView("since")
+
+    changes = json.loads(after.getChangesText(before.version))
+    assert changes["version"] == after.version and changes["since"] == before.version and not changes["full"]
+    assert [i["player_id"] for i in changes["players"]] == ["a"] and changes["players"][0]["wins"] == 1
+    # Nothing else changed, and private fields never go out
+    assert set(changes) == {"name", "version", "since", "full", "players"}
+    assert json.loads(after.getChangesText(after.version))["players"] == []
+
+    # The unchanged player's json is the same object as before, so it wasn't serialized again
+    assert after.players["b"] is before.players["b"]
+    assert after.players["a"] is not before.players["a"]
+
+    full = json.loads(after.getText())
+    assert "seed" not in full and "updated" not in full and full["version"] == after.version
+
+def test_since_from_unknown_version_is_full (makeData):
+    data = makeData()
+    data.addTour(Tournament("full", defaultSettings, 1))
+    with data.getTour("full", True) as tour:
+        tour.addPlayer(Player("a"))
+    version = data.getView("full").version
+
+    # Newer than anything committed, e.g. from before a clear
+    changes = json.loads(data.getView("full").getChangesText(version + 5))
+    assert changes["full"] and [i["player_id"] for i in changes["players"]] == ["a"] and "started" in changes
+
+    # Versions start again after a restart
+    data.storage.flush()
+    reloaded = makeData()
+    assert json.loads(reloaded.getView("full").getChangesText(version))["full"]
+
+def test_player_json_is_cached_until_changed ():
+    player = Player("cached", status="battling")
+    first = player.toJson()
+    assert player.toJson() is first
+
+    player.completeBattle(True)
+    second = player.toJson()
+    assert second is not first and second["status"] == "stealing" and second["wins"] == 1
+
+def addWaiting (data, name: str, players: int) -> None:
+    data.addTour(Tournament(name, defaultSettings, 1))
+    with data.getTour(name, True) as tour:
+        for i in range(players):
+            tour.addPlayer(Player(f"p{i}", status="waiting_battle"))
+        tour.started = True
+
+def test_atomic_batch_changes_nothing_on_error (makeData):
+    from src.tournament_funcs import applyBatch
+
+    data = makeData()
+    addWaiting(data, "atomic", 4)
+    before = data.getView("atomic")
+    fields = {"player1_id" : str, "player2_id" : str}
+    battles = [{"player1_id" : "p0", "player2_id" : "p1"}, {"player1_id" : "p2", "player2_id" : 3}]
+
+    with pytest.raises(InputError) as error:
+        with data.getTour("atomic", True) as tour:
+            applyBatch(battles, fields, lambda i: tour.startBattle(i["player1_id"], i["player2_id"]), True)
+    assert error.value.description.startswith("Item 1: ")
+
+    # The first battle had already started on the live tournament, none of it was committed
+    assert data.getView("atomic") is before
+    assert all(i.status == "waiting_battle" for i in data["atomic"].players)
+
+def test_batch_reports_each_item (makeData):
+    from src.tournament_funcs import applyBatch
+
+    data = makeData()
+    addWaiting(data, "items", 4)
+    fields = {"player1_id" : str, "player2_id" : str}
+    battles = [{"player1_id" : "p0", "player2_id" : "p1"}, {"player1_id" : "p0", "player2_id" : "p2"}, {"player1_id" : "p2"},
+            "p2", {"player1_id" : "p2", "player2_id" : "p3"}]
+
+    with data.getTour("items", True) as tour:
+        results = applyBatch(battles, fields, lambda i: tour.startBattle(i["player1_id"], i["player2_id"]), False)
+
+    assert results[0] == {} and results[4] == {}
+    assert results[1]["error"] == "Cannot start battle!"
+    assert results[2]["error"] == "Missing \"player2_id\"!"
+    assert results[3]["error"] == "Expected an object!"
+
+    # The ones that worked are saved together
+    tour = data["items"]
+    assert [i.battling for i in tour.players] == ["p1", "p0", "p3", "p2"]
+
+    with pytest.raises(InputError):
+        applyBatch({"player1_id" : "p0"}, fields, lambda i: None, False)
+
+def test_long_poll_wakes_on_commit (makeData):
+    data = makeData()
+    data.addTour(Tournament("watched", defaultSettings, 1))
+    since = data.getView("watched").version
+
+    def write ():
+        time.sleep(0.2)
+        with data.getTour("watched", True) as tour:
+            tour.addPlayer(Player("a"))
+
+    writer = threading.Thread(target=write)
+    start = time.monotonic()
+    writer.start()
+    view = data.waitForChange("watched", lambda i: i.version != since, 10)
+    elapsed = time.monotonic() - start
+    writer.join()
+
+    assert view.version == since + 1 and "a" in view.players
+    assert 0.2 <= elapsed < 5
+    # Nobody is left watching
+    assert "watched" not in data.watching
+
+def test_long_poll_times_out (makeData):
+    data = makeData()
+    data.addTour(Tournament("quiet", defaultSettings, 1))
+    since = data.getView("quiet").version
+
+    start = time.monotonic()
+    view = data.waitForChange("quiet", lambda i: i.version != since, 0.3)
+    elapsed = time.monotonic() - start
+
+    # The current view comes back unchanged once the timeout is up
+    assert view.version == since
+    assert 0.3 <= elapsed < 5
+
+def test_long_poll_wakes_on_clear (makeData):
+    data = makeData()
+    data.addTour(Tournament("cleared", defaultSettings, 1))
+    since = data.getView("cleared").version
+    threading.Timer(0.2, data.clear).start()
+
+    start = time.monotonic()
+    with pytest.raises(InputError):
+        data.waitForChange("cleared", lambda i: i.version != since, 10)
+    assert time.monotonic() - start < 5
+
+def test_watched_tournaments_stay_resident (makeData, monkeypatch):
+    data = makeData()
+    data.addTour(Tournament("watched", defaultSettings, 1))
+    data.addTour(Tournament("other", defaultSettings, 1))
+    monkeypatch.setattr(src.config, "tournament_memory_budget", 0)
+    since = data.getView("watched").version
+
+    waiter = threading.Thread(target=data.waitForChange, args=("watched", lambda i: i.version != since, 0.5))
+    waiter.start()
+    time.sleep(0.1)
+    data.evict()
+    assert "watched" in data.views and "other" not in data.views
+    waiter.join()
+
+    # Evicted like anything else once nobody is watching
+    data.evict()
+    assert "watched" not in data.views
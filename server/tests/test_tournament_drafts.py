@@ -0,0 +1,72 @@
+import time
+
+from src.tournament import Player, Tournament, defaultSettings, getScalings
+from src.usage_scraping import DEFAULT_CUTOFF, getTierWeights
+
+SETTINGS = dict(defaultSettings, team_size=2, draw_size=3)
+PLAYERS = 7
+BATCH = 2
+
+def startTournament (data, name: str) -> None:
+    data.addTour(Tournament(name, SETTINGS, 1))
+    with data.getTour(name, True) as tour:
+        for i in range(PLAYERS):
+            tour.addPlayer(Player(f"p{i}"))
+        tour.start(getTierWeights(getScalings(SETTINGS), DEFAULT_CUTOFF))
+
+def waitDrafted (data, name: str):
+    deadline = time.monotonic() + 10
+    while data.getView(name).json["generating"] > 0:
+        assert time.monotonic() < deadline, "drafts never finished"
+        time.sleep(0.01)
+
+    return data[name]
+
+def makeGenerator (data):
+    # Imported here, it makes the server's own generator when it's imported
+    from src.tournament_drafts import DraftGenerator
+
+    return DraftGenerator(data, 2, BATCH)
+
+def test_start_is_drafted_in_batches (makeData, usage):
+    data = makeData()
+    generator = makeGenerator(data)
+    startTournament(data, "drafts")
+    assert all(i["status"] == "generating" for i in data.getView("drafts").json["players"])
+
+    generator.start()
+    generator.notify("drafts")
+    tour = waitDrafted(data, "drafts")
+
+    assert all(i.status == "choosing_pokemon" and len(i.generated) == tour.drawSize for i in tour.players)
+    assert len(tour.usedSpecies) == PLAYERS * tour.drawSize
+    stats = generator.stats()
+    assert stats["batches"] == -(-PLAYERS // BATCH) and stats["failures"] == 0
+
+def test_restart_picks_up_unfinished_drafts (makeData, usage):
+    # Started but the server stopped before anything was drawn
+    data = makeData()
+    startTournament(data, "unfinished")
+    data.storage.flush()
+
+    data = makeData()
+    assert data.index["unfinished"]["generating"] == PLAYERS
+    makeGenerator(data).start()
+    tour = waitDrafted(data, "unfinished")
+    assert all(i.status == "choosing_pokemon" for i in tour.players)
+
+def test_cleared_tournaments_are_dropped (makeData, usage):
+    data = makeData()
+    generator = makeGenerator(data)
+    startTournament(data, "cleared")
+    data.clear()
+
+    generator.start()
+    generator.notify("cleared")
+    deadline = time.monotonic() + 10
+    while generator.stats()["queued"] > 0 or generator.stats()["busy"] > 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    # Gone rather than failed, so it isn't tried again
+    assert generator.stats()["failures"] == 0 and "cleared" not in generator.queued
@@ -0,0 +1,127 @@
+import os
+import shutil
+import threading
+import time
+from datetime import date
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import src.config
+import src.usage_scraping
+from src.usage_fetch import UsageFetcher
+from src.usage_scraping import parseMovesets, scrapeTiers
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "smogon")
+MONTH = date(2021, 9, 1)
+PREVIOUS = date(2021, 8, 1)
+# Each file takes this long to serve, so fetching one after the other shows up in how many are in flight at once
+DELAY = 0.2
+
+class FixtureServer:
+    # Serves <month>/<tier>-1500.txt and <month>/moveset/<tier>-1500.txt like smogon, counting requests
+    def __init__ (self, directory: str):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.inFlight = 0
+        self.maxInFlight = 0
+        server = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__ (self, *args, **kwargs):
+                super().__init__(*args, directory=directory, **kwargs)
+
+            def do_GET (self):
+                with server.lock:
+                    server.requests.append(self.path)
+                    server.inFlight += 1
+                    server.maxInFlight = max(server.maxInFlight, server.inFlight)
+                try:
+                    time.sleep(DELAY)
+                    super().do_GET()
+                finally:
+                    with server.lock:
+                        server.inFlight -= 1
+
+            def log_message (self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def count (self, tier: str, month: date) -> int:
+        with self.lock:
+            return len([i for i in self.requests if i.startswith(f"/{month.year}-{month.month:02}/") and tier in i])
+
+    def close (self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def addMonth (directory, month: date, tiers) -> None:
+    monthDir = directory / f"{month.year}-{month.month:02}"
+    os.makedirs(monthDir / "moveset", exist_ok=True)
+    for tier in tiers:
+        shutil.copy(os.path.join(FIXTURES, f"{tier}-1500.txt"), monthDir)
+        shutil.copy(os.path.join(FIXTURES, "moveset", f"{tier}-1500.txt"), monthDir / "moveset")
+
+@pytest.fixture
+def smogon (tmp_path, monkeypatch):
+    # gen8uu's newest month isn't out yet, so it's only on the server for the month before
+    served = tmp_path / "smogon"
+    addMonth(served, MONTH, ["gen8ou"])
+    addMonth(served, PREVIOUS, ["gen8ou", "gen8uu"])
+    server = FixtureServer(str(served))
+
+    # Parsed tiers are cached under data/
+    os.makedirs(tmp_path / "data")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(src.config, "smogon_url", server.url)
+    monkeypatch.setattr(src.config, "missing_month_ttl", 1.0)
+    fetcher = UsageFetcher(src.config.smogon_url, src.config.fetch_workers, src.config.missing_month_ttl)
+    monkeypatch.setattr(src.usage_scraping, "usage_fetcher", fetcher)
+
+    yield server, fetcher, served
+    server.close()
+
+def parseSets (lines):
+    return list(parseMovesets(lines))
+
+def test_fetch_month_is_concurrent (smogon):
+    server, fetcher, served = smogon
+
+    fetched = fetcher.fetchMonth(["gen8ou", "gen8uu"], PREVIOUS, parseSets)
+
+    assert sorted(fetched) == ["gen8ou", "gen8uu"]
+    assert [i.speciesName for i in fetched["gen8ou"][1]] == ["Mon0-3", "Mon0-2", "Mon0-1", "Mon0-0"]
+    # Usage and moveset files for both tiers all at once
+    assert server.maxInFlight == 4
+
+def test_missing_tier_falls_back_a_month (smogon):
+    server, fetcher, served = smogon
+
+    sourceMonths = {}
+    speciesDicts = scrapeTiers(["gen8ou", "gen8uu"], MONTH, sourceMonths)
+
+    assert sourceMonths == {"gen8ou" : MONTH, "gen8uu" : PREVIOUS}
+    assert sorted(speciesDicts["gen8uu"]) == ["Mon1-0", "Mon1-1", "Mon1-2", "Mon1-3"]
+    # gen8ou already came from the newer month, it's not fetched again for the older one
+    assert server.count("gen8ou", PREVIOUS) == 0
+
+def test_missing_month_is_not_asked_for_again_until_ttl (smogon):
+    server, fetcher, served = smogon
+
+    assert fetcher.fetchMonth(["gen8uu"], MONTH, parseSets) == {}
+    assert server.count("gen8uu", MONTH) == 2
+
+    # Remembered as missing, nothing goes to the server
+    assert fetcher.fetchMonth(["gen8uu"], MONTH, parseSets) == {}
+    assert server.count("gen8uu", MONTH) == 2
+
+    # Out now, it's picked up once the ttl is over
+    addMonth(served, MONTH, ["gen8uu"])
+    assert fetcher.fetchMonth(["gen8uu"], MONTH, parseSets) == {}
+    time.sleep(src.config.missing_month_ttl + 0.1)
+    assert sorted(fetcher.fetchMonth(["gen8uu"], MONTH, parseSets)) == ["gen8uu"]
+    assert server.count("gen8uu", MONTH) == 4
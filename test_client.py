@@ -1,5 +1,4 @@
 import sys
-import time
 import requests
 
 def runGetRequest (url, args, printFail = True):
@@ -292,10 +291,9 @@ def swapPokemon (url, tourId, playerId):
 
 
 def nextPlayerAction (req, url, tourId, playerId, hasPrinted):
-    if req["status"] == "waiting_battle" or req["status"] == "waiting_stolen" or req["status"] == "waiting_start":
+    if req["status"] == "waiting_battle" or req["status"] == "waiting_stolen" or req["status"] == "waiting_start" or req["status"] == "generating":
         if not hasPrinted:
             print("Waiting...")
-        time.sleep(5)
         return True
     elif req["status"] == "choosing_pokemon":
         #print(url + "*")
@@ -344,13 +342,21 @@ def runPlayerClient (url):
             print("Player registration failed!")
             return
     hasPrinted = False
+    version = None
     while req:
         hasPrinted = nextPlayerAction(req, url, tourId, playerId, hasPrinted)
 
-        req = runGetRequest(f"{url}/api/player/info", {
+        # Waits on the server until something about this player changes instead of polling
+        args = {
             "tournament" : tourId,
             "player_id" : playerId
-        })
+        }
+        if version != None:
+            args["since"] = version
+
+        req = runGetRequest(f"{url}/api/player/wait", args)
+        if req:
+            version = req["version"]
 
 
 def runManageClient (url):